@@ -14,6 +14,14 @@ class Settings(BaseSettings):
     whatsapp_access_token: str = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
     whatsapp_phone_number_id: str = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
     whatsapp_verify_token: str = os.getenv("WHATSAPP_VERIFY_TOKEN", "")
+    whatsapp_app_secret: str = os.getenv("WHATSAPP_APP_SECRET", "")  # signs webhook POSTs (X-Hub-Signature-256)
+    
+    # Messaging pipeline Configuration
+    default_channel: str = os.getenv("DEFAULT_CHANNEL", "telegram")  # channel of bare (pre-namespacing) chat ids
+    send_workers: int = int(os.getenv("SEND_WORKERS", "8"))  # send queue shards (per-chat order is kept)
+    dedup_window: int = int(os.getenv("DEDUP_WINDOW", "10000"))  # recent message ids remembered
+    outbox_max_attempts: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))  # per message before it is dead-lettered
+    outbox_drain_batch: int = int(os.getenv("OUTBOX_DRAIN_BATCH", "64"))  # sends acked per outbox write
     
     # OpenAI Configuration
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
@@ -23,22 +31,104 @@ class Settings(BaseSettings):
     smtp_port: int = int(os.getenv("SMTP_PORT", "587"))
     smtp_username: str = os.getenv("SMTP_USERNAME", "")
     smtp_password: str = os.getenv("SMTP_PASSWORD", "")
+    email_template_dir: str = os.getenv("EMAIL_TEMPLATE_DIR", "app/templates/email")
+    email_attachment_max_mb: float = float(os.getenv("EMAIL_ATTACHMENT_MAX_MB", "15"))  # bigger files go as a link
+    
+    # Attachment Configuration
+    attachment_dir: str = os.getenv("ATTACHMENT_DIR", "data/attachments")  # downloaded Telegram documents
+    public_base_url: str = os.getenv("PUBLIC_BASE_URL", "")  # e.g. https://bot.example.com, for download links
+    file_link_secret: str = os.getenv("FILE_LINK_SECRET", "")  # signs download links ("" = random per run)
+    file_link_hours: float = float(os.getenv("FILE_LINK_HOURS", "72"))  # link lifetime; downloads are pruned after
     
     # Database Configuration
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./data/whatsapp_hub.db")
     
+    # Persistence Configuration
+    persist_flush_interval: float = float(os.getenv("PERSIST_FLUSH_INTERVAL", "0.05"))  # seconds
+    persist_max_pending: int = int(os.getenv("PERSIST_MAX_PENDING", "100"))  # mutations per flush
+    storage_format: str = os.getenv("STORAGE_FORMAT", "json")  # json or snapshot
+    
+    # Retention Configuration
+    retention_days: float = float(os.getenv("RETENTION_DAYS", "30"))  # finished items stay hot this long
+    retention_interval_seconds: float = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+    retention_batch: int = int(os.getenv("RETENTION_BATCH", "500"))  # records archived per step
+    archive_dir: str = os.getenv("ARCHIVE_DIR", "data/archive")
+    
+    # Throttling Configuration
+    throttle_chat_rate: float = float(os.getenv("THROTTLE_CHAT_RATE", "1"))  # messages/sec per chat
+    throttle_chat_burst: int = int(os.getenv("THROTTLE_CHAT_BURST", "5"))
+    throttle_expensive_rate: float = float(os.getenv("THROTTLE_EXPENSIVE_RATE", "0.1"))  # per chat and command
+    throttle_expensive_burst: int = int(os.getenv("THROTTLE_EXPENSIVE_BURST", "3"))
+    throttle_expensive_commands: str = os.getenv("THROTTLE_EXPENSIVE_COMMANDS", "email,meeting,broadcast,mailmerge")
+    throttle_max_buckets: int = int(os.getenv("THROTTLE_MAX_BUCKETS", "10000"))
+    shed_queue_depth: int = int(os.getenv("SHED_QUEUE_DEPTH", "32"))  # messages in flight
+    shed_latency_ms: float = float(os.getenv("SHED_LATENCY_MS", "2000"))
+    response_cache_size: int = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))  # cached replies
+    
+    # Dialog Configuration (commands that ask follow-up questions)
+    session_ttl_seconds: float = float(os.getenv("SESSION_TTL_SECONDS", "600"))  # unanswered dialogs expire
+    session_max: int = int(os.getenv("SESSION_MAX", "100000"))  # dialogs kept in memory (LRU beyond)
+    session_spill: bool = os.getenv("SESSION_SPILL", "False").lower() == "true"  # evict to disk instead of dropping
+    session_spill_file: str = os.getenv("SESSION_SPILL_FILE", "data/sessions")  # dbm file
+    
     # Server Configuration
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8000"))
     debug: bool = os.getenv("DEBUG", "True").lower() == "true"
+    health_refresh_seconds: float = float(os.getenv("HEALTH_REFRESH_SECONDS", "60"))  # getMe cache TTL
+    
+    # Tracing Configuration
+    trace_export: str = os.getenv("TRACE_EXPORT", "")  # file, otlp or "" (ids in logs + /status only)
+    trace_file: str = os.getenv("TRACE_FILE", "data/traces.jsonl")
+    trace_max_file_mb: float = float(os.getenv("TRACE_MAX_FILE_MB", "50"))  # then rolls over to .1
+    trace_otlp_endpoint: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    trace_service_name: str = os.getenv("TRACE_SERVICE_NAME", "control-hub")
+    
+    # Profiling Configuration (off = no hook installed at all)
+    profile_enabled: bool = os.getenv("PROFILE_ENABLED", "False").lower() == "true"
+    profile_sample_every: int = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))  # profile 1 in N requests (0 = never)
+    profile_slow_ms: float = float(os.getenv("PROFILE_SLOW_MS", "0"))  # keep profiles of slower requests (0 = off)
+    profile_interval_ms: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))  # stack sampling interval
+    profile_dir: str = os.getenv("PROFILE_DIR", "data/profiles")
+    profile_keep: int = int(os.getenv("PROFILE_KEEP", "50"))  # newest profiles kept
+    
+    # Admin Configuration
+    admin_chat_ids: str = os.getenv("ADMIN_CHAT_IDS", "")  # comma-separated tg:<id> / wa:<number>
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
+    
+    # Broadcast Configuration
+    broadcast_rate_limit: float = float(os.getenv("BROADCAST_RATE_LIMIT", "25"))  # messages/sec
+    broadcast_workers: int = int(os.getenv("BROADCAST_WORKERS", "8"))
+    
+    # Mail merge Configuration
+    mail_merge_connections: int = int(os.getenv("MAIL_MERGE_CONNECTIONS", "4"))  # concurrent SMTP sessions
+    mail_merge_rate_limit: float = float(os.getenv("MAIL_MERGE_RATE_LIMIT", "10"))  # messages/sec across sessions
+    
+    # Daily digest Configuration
+    digest_default_time: str = os.getenv("DIGEST_DEFAULT_TIME", "20:00")
+    
+    # Time zone for chats that haven't set one ("" = server local time)
+    default_timezone: str = os.getenv("DEFAULT_TIMEZONE", "")
     
     # Meeting Configuration
     google_meet_email: str = os.getenv("GOOGLE_MEET_EMAIL", "")
     google_meet_password: str = os.getenv("GOOGLE_MEET_PASSWORD", "")
+    meeting_pool_size: int = int(os.getenv("MEETING_POOL_SIZE", "2"))  # warm browsers = concurrent meetings
+    meeting_recycle_after: int = int(os.getenv("MEETING_RECYCLE_AFTER", "20"))  # jobs per browser
+    meeting_max_minutes: int = int(os.getenv("MEETING_MAX_MINUTES", "180"))
+    meeting_headless: bool = os.getenv("MEETING_HEADLESS", "True").lower() == "true"
+    meeting_display_name: str = os.getenv("MEETING_DISPLAY_NAME", "Assistant")
+    meeting_state_file: str = os.getenv("MEETING_STATE_FILE", "data/meeting_state.json")  # saved login
+    meeting_allowed_hosts: str = os.getenv("MEETING_ALLOWED_HOSTS", "meet.google.com")  # https hosts (and subdomains) to join
     
     # Audio Configuration
     audio_device_index: int = int(os.getenv("AUDIO_DEVICE_INDEX", "0"))
     sample_rate: int = int(os.getenv("SAMPLE_RATE", "16000"))
+    recording_source: str = os.getenv("RECORDING_SOURCE", "device")  # device, synthetic or file:<path.wav>
+    recording_dir: str = os.getenv("RECORDING_DIR", "data/recordings")
+    recording_chunk_seconds: float = float(os.getenv("RECORDING_CHUNK_SECONDS", "30"))
+    recording_buffer_seconds: float = float(os.getenv("RECORDING_BUFFER_SECONDS", "10"))  # ring buffer size
+    recording_codec: str = os.getenv("RECORDING_CODEC", "opus")  # opus, flac or wav (opus/flac need ffmpeg)
     
     class Config:
         env_file = ".env"
@@ -1,4 +1,11 @@
 from .whatsapp_client import whatsapp_client
-from .command_router import command_router
 
 __all__ = ["whatsapp_client", "command_router"]
+
+def __getattr__(name):
+    # command_router imports app.modules, whose modules import app.core;
+    # loading it lazily keeps either package importable first
+    if name == "command_router":
+        from .command_router import command_router
+        return command_router
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,81 @@
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Chat ids are namespaced by channel ("tg:123", "wa:4915..."), so the same number on two
+# channels is two chats, and an id always says which channel reaches it
+CHANNEL_PREFIXES = {"telegram": "tg", "whatsapp": "wa"}
+PREFIX_CHANNELS = {prefix: channel for channel, prefix in CHANNEL_PREFIXES.items()}
+
+def chat_id_for(channel: str, raw_id) -> str:
+    """The namespaced id of a chat on a channel"""
+    return f"{CHANNEL_PREFIXES[channel]}:{raw_id}"
+
+def split_chat_id(chat_id: str) -> Tuple[Optional[str], str]:
+    """(channel, id on that channel); channel is None for a bare id from before namespacing"""
+    prefix, sep, raw_id = str(chat_id).partition(":")
+    if sep and prefix in PREFIX_CHANNELS:
+        return PREFIX_CHANNELS[prefix], raw_id
+    return None, str(chat_id)
+
+class LegacyChatIds:
+    """Maps bare chat ids stored before namespacing to namespaced ones.
+    
+    A bare id belongs to the channel the chat last wrote from, as recorded
+    in the old channels file, or to DEFAULT_CHANNEL. Managers qualify their
+    ids on load and save the result, so each stored id is migrated once.
+    """
+    
+    def __init__(self, channels_file: str = "data/channels.json"):
+        self.channels_file = Path(channels_file)
+        self._channels: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+        self.stats = {'migrated': 0}
+    
+    def _load(self) -> Dict[str, str]:
+        with self._lock:
+            if self._channels is None:
+                try:
+                    with open(self.channels_file, 'r', encoding='utf-8') as f:
+                        self._channels = json.load(f)
+                except FileNotFoundError:
+                    self._channels = {}
+                except Exception as e:
+                    logger.error(f"Error loading {self.channels_file}: {e}")
+                    self._channels = {}
+            return self._channels
+    
+    def is_legacy(self, chat_id: Optional[str]) -> bool:
+        return chat_id is not None and split_chat_id(chat_id)[0] is None
+    
+    def qualify(self, chat_id: Optional[str]) -> Optional[str]:
+        """Namespaced form of a chat id (None and namespaced ids are returned unchanged)"""
+        if not self.is_legacy(chat_id):
+            return chat_id
+        channel = self._load().get(str(chat_id), settings.default_channel)
+        return chat_id_for(channel if channel in CHANNEL_PREFIXES else settings.default_channel, chat_id)
+    
+    def qualify_records(self, records, field: str) -> int:
+        """Namespace the chat id in one field of every record in a RecordSet; returns how many changed"""
+        legacy = [record_id for record_id, chat_id in records.scan('id', field) if self.is_legacy(chat_id)]
+        for record_id in legacy:
+            record = records.get(record_id)
+            setattr(record, field, self.qualify(getattr(record, field)))
+        self.stats['migrated'] += len(legacy)
+        return len(legacy)
+    
+    def qualify_keys(self, mapping: Dict[str, Any]) -> int:
+        """Namespace the chat ids keying a dict in place; returns how many changed"""
+        legacy = [chat_id for chat_id in mapping if self.is_legacy(chat_id)]
+        for chat_id in legacy:
+            mapping[self.qualify(chat_id)] = mapping.pop(chat_id)
+        self.stats['migrated'] += len(legacy)
+        return len(legacy)
+
+# Global mapping for ids stored before chat ids carried their channel
+legacy_chat_ids = LegacyChatIds()
@@ -1,13 +1,104 @@
 import re
 import logging
-from typing import Dict, Any, List, Optional, Callable
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from app.core.telegram_client import telegram_client
-from app.modules.email_sender import email_sender
+from app.core.chat_ids import chat_id_for, split_chat_id
+from app.core.response_cache import response_cache
+from app.core.middleware import CommandRequest, Handler, Middleware, MiddlewareChain
+from app.core.sessions import Session, session_store
+from app.core.tracing import tracer
+from app.modules.email_sender import email_sender, format_size
+from app.modules.attachments import attachment_store
 from app.modules.todo_manager import todo_manager
 from app.modules.reminder_scheduler import reminder_scheduler
+from app.modules.broadcast_manager import broadcast_manager
+from app.modules.mail_merge import mail_merge_manager, parse_recipients
+from app.modules.digest_manager import digest_manager
+from app.modules.meeting_manager import meeting_manager
+from app.modules.audio_recorder import audio_recorder, format_duration
+from app.modules.retention import retention_manager
+from app.modules.cron import is_recurrence, parse_recurrence
+from app.modules.timezones import timezones
+from app.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# "Double quoted" (or “curly quoted”) words stay one argument; apostrophes are just letters
+_ARG_RE = re.compile(r'"([^"]*)"|“([^”]*)”|(\S+)')
+
+def split_args(text: str) -> List[str]:
+    """Split on whitespace, keeping quoted phrases together (quotes removed)"""
+    return [next(group for group in match.groups() if group is not None) for match in _ARG_RE.finditer(text)]
+
+def take_args(text: str, count: int) -> Tuple[List[str], str]:
+    """Split off up to count leading arguments (quoted phrases together); the rest is returned as written"""
+    args, end = [], 0
+    for match in _ARG_RE.finditer(text):
+        if len(args) == count:
+            break
+        args.append(next(group for group in match.groups() if group is not None))
+        end = match.end()
+    return args, text[end:].strip()
+
+def unquote(text: str) -> str:
+    """Text without its surrounding quotes, if it is a single quoted phrase"""
+    match = _ARG_RE.fullmatch(text.strip())
+    if match and match.group(3) is None:
+        return match.group(1) if match.group(1) is not None else match.group(2)
+    return text.strip()
+
+def is_time(text: str) -> bool:
+    """Whether text is a one-off reminder time (HH:MM or an ISO date-time)"""
+    try:
+        if len(text) == 5 and ":" in text:
+            datetime.strptime(text, "%H:%M")
+        else:
+            datetime.fromisoformat(text)
+        return True
+    except ValueError:
+        return False
+
+EMAIL_PROMPTS = {
+    "to": "📧 Who should I send it to? (email address, or 'cancel')",
+    "subject": "📝 What's the subject?",
+    "body": "✍️ And the message?",
+}
+
+def parse_context(args: List[str]) -> Optional[Dict[str, str]]:
+    """Parse key=value template variables; words without '=' continue the previous value (None if malformed)"""
+    context = {}
+    key = None
+    for arg in args:
+        if "=" in arg:
+            key, value = arg.split("=", 1)
+            context[key] = value
+        elif key is not None:
+            context[key] += " " + arg
+        else:
+            return None
+    return context
+
+# Read-only commands (and subcommands) whose replies only change with the chat's data
+CACHEABLE = {
+    "help": None,
+    "todo": {"list", "find"},
+    "remind": {"list", "find"},
+}
+
+def truncation_note(results) -> str:
+    """Footer for search replies when a short prefix matched too many words to search them all"""
+    if not getattr(results, 'truncated', False):
+        return ""
+    return "\n\nℹ️ A word in your search matches too many words; results may be incomplete. Type more of it."
+
+# Commands (and subcommands) whose payload is the rest of the message, later lines and ';' included
+PAYLOAD_COMMANDS = {
+    "email": None,
+    "broadcast": None,
+    "mailmerge": {"contacts"},
+}
+
 class CommandRouter:
     def __init__(self):
         self.commands: Dict[str, Callable] = {}
@@ -16,27 +107,72 @@ class CommandRouter:
 
 📧 Email Commands:
 • email <to> <subject> <body> - Send email
-• email boss "Update" "Project done" - Send to boss
+• email boss@company.com "Update" "Project done" - Quote words to keep them together
+• email - I'll ask for the address, subject and message
+• email <to> template:<name> key=value - Send a template
+• email attach <to> <subject> [body] - Email the last document you sent me
 
 📝 Todo Commands:
 • todo add <task> - Add new task
 • todo list - Show all tasks
+• todo find <words> - Search tasks
 • todo done <id> - Mark task as done
+• todo due <id> <YYYY-MM-DD> - Set a due date
+• todo history [words] - Show archived (old done or deleted) tasks
+
+📦 Batching:
+• Send several commands, one per line (or separated by ';')
+• todo add with one task per line adds them all at once (lines that don't start with a command)
+• email, broadcast and mailmerge contacts take the rest of the message, so put them last
 
 ⏰ Reminder Commands:
 • remind <time> <message> - Set reminder
 • remind 18:30 "Join standup"
+• remind every weekday 09:00 <message> - Recurring reminder
+• remind every 15m <message> / remind first monday 09:00 <message>
+• remind cron <min> <hour> <day> <month> <weekday> <message>
+• remind <message> - I'll ask when
+• remind list - Show your active reminders
+• remind find <words> - Search reminders
+• remind history [words] - Show archived reminders
+• tz <Area/City> - Set your time zone, e.g. tz Europe/Berlin
+
+📊 Digest Commands:
+• digest on [HH:MM] - Daily summary of your tasks and reminders
+• digest email <address> - Also send the digest by email
+• digest now - Show today's digest
+• digest off - Stop the daily digest
 
 🎥 Meeting Commands:
 • meeting join <url> - Join meeting
-• meeting record - Start recording
+• meeting record [url] - Record (joining the meeting if given)
+• meeting status - Show the current meeting
+• meeting stop - Hang up and send the recording
+
+📣 Admin Commands:
+• broadcast <message> - Send to all chats
+• broadcast status <id> - Show broadcast progress
+• mailmerge contacts <group> + CSV lines (email,name,...) - Save a recipient list
+• mailmerge send <group> template:<name> [key=value ...] - Email the template to every row
+• mailmerge status [id] - Show mail merge progress
+
+💬 Dialogs:
+• cancel - Stop a command that is asking you questions
 
 🎤 Voice Commands:
 • Send voice note for voice commands
 
 Type 'help' for this message.
         """
+        self.chain = MiddlewareChain(self._run_command)
+        self.sessions = session_store
+        # Multi-step commands: command -> handler for the chat's next reply
+        self.dialogs: Dict[str, Callable[[str, Session, str], str]] = {
+            "email": self._email_dialog,
+            "remind": self._remind_dialog,
+        }
         self._register_default_commands()
+        self._register_default_middleware()
     
     def _register_default_commands(self):
         """Register default command handlers"""
@@ -46,19 +182,40 @@ Type 'help' for this message.
         self.register_command("email", self._email_command)
         self.register_command("remind", self._remind_command)
         self.register_command("meeting", self._meeting_command)
+        self.register_command("broadcast", self._broadcast_command)
+        self.register_command("mailmerge", self._mailmerge_command)
+        self.register_command("digest", self._digest_command)
+        self.register_command("tz", self._tz_command)
     
     def register_command(self, command: str, handler: Callable):
         """Register a new command handler"""
         self.commands[command] = handler
         logger.info(f"Registered command: {command}")
     
+    def _register_default_middleware(self):
+        """Outermost first: errors -> lookup -> trace -> cache -> command handler"""
+        self.use(self._errors_middleware, "errors")
+        self.use(self._lookup_middleware, "lookup")
+        self.use(self._trace_middleware, "trace")
+        self.use(self._cache_middleware, "cache")
+    
+    def use(self, middleware: Middleware, name: str = None, before: str = None):
+        """Add a middleware(request, call_next) -> reply around command handlers.
+        
+        Stages run in the order added; pass before="cache" (for example) to
+        run ahead of a default stage. A middleware short-circuits by
+        returning a reply without calling call_next.
+        """
+        self.chain.use(middleware, name, before)
+        logger.info(f"Registered middleware: {name or middleware.__name__}")
+    
     def parse_command(self, message: str) -> Optional[Dict[str, Any]]:
         """Parse a message and extract command information"""
         message = message.strip()
         if not message:
             return None
         
-        # Split message into parts
+        # Split message into parts; commands with positional arguments re-split with split_args
         parts = message.split()
         if not parts:
             return None
@@ -72,25 +229,142 @@ Type 'help' for this message.
             "full_message": message
         }
     
+    def split_batch(self, message: str) -> List[str]:
+        """Split a message into individual commands.
+        
+        Each line that starts with a known command starts a new command;
+        other lines continue the one before (a multi-line ``todo add``), and
+        blank lines only separate. A one-line command whose ';'-separated
+        segments all start with a known command is split there too. A
+        command in PAYLOAD_COMMANDS (an email or broadcast body, a contacts
+        CSV) takes the rest of the message, so nothing in its payload runs
+        as a command.
+        """
+        commands: List[List[str]] = []
+        lines = message.strip().split("\n")
+        for position, line in enumerate(lines):
+            text = line.strip()
+            if not text:
+                continue
+            if commands and not self._starts_with_command(text):
+                commands[-1].append(text)
+                continue
+            if self._takes_payload(text):
+                commands.append(["\n".join(lines[position:]).strip()])
+                break
+            commands.append([text])
+        
+        result: List[str] = []
+        for command_lines in commands:
+            command = "\n".join(command_lines)
+            segments = [seg.strip() for seg in command.split(";")]
+            if ("\n" not in command and len(segments) > 1
+                    and all(seg and self._starts_with_command(seg) for seg in segments)):
+                result.extend(segments)
+            else:
+                result.append(command)
+        return result
+    
+    def _starts_with_command(self, text: str) -> bool:
+        return text.split(None, 1)[0].lower() in self.commands
+    
+    def _takes_payload(self, text: str) -> bool:
+        words = text.split(None, 2)
+        command = words[0].lower()
+        if command not in PAYLOAD_COMMANDS:
+            return False
+        subcommands = PAYLOAD_COMMANDS[command]
+        return subcommands is None or (len(words) > 1 and words[1].lower() in subcommands)
+    
     def handle_message(self, chat_id: str, message: str) -> str:
         """Handle incoming message and return response"""
+        session = self.sessions.get(chat_id)
+        if session is not None:
+            return self._continue_dialog(chat_id, session, message.strip())
+        
+        commands = self.split_batch(message)
+        if len(commands) <= 1:
+            return self._dispatch(chat_id, message)
+        
+        # Run the batch as one unit of work so each store is saved once
+        with todo_manager.batch(), reminder_scheduler.batch():
+            responses = [self._dispatch(chat_id, command) for command in commands]
+        logger.info(f"Handled batch of {len(commands)} commands for chat {chat_id}")
+        return "\n\n".join(responses)
+    
+    def _continue_dialog(self, chat_id: str, session: Session, text: str) -> str:
+        """Feed a reply to the command that asked for it"""
+        if text.lower() in ("cancel", "/cancel"):
+            self.sessions.end(chat_id)
+            return f"👌 Cancelled {session.command}."
+        if text and self._starts_with_command(text):
+            # A new command ends the dialog (quote a reply to use it as the answer)
+            self.sessions.end(chat_id)
+            return f"👌 Cancelled {session.command}.\n\n" + self.handle_message(chat_id, text)
+        with tracer.span(f"dialog.{session.command}", new_trace=False, step=session.step):
+            try:
+                return self.dialogs[session.command](chat_id, session, text)
+            except Exception as e:
+                logger.error(f"Error in {session.command} dialog: {e}")
+                self.sessions.end(chat_id)
+                return "Sorry, an error occurred while processing your command."
+    
+    def _dispatch(self, chat_id: str, message: str) -> str:
+        """Parse a single command and run it through the middleware chain"""
+        parsed = self.parse_command(message)
+        if not parsed:
+            return "Please send a valid command. Type 'help' for available commands."
+        return self.chain(CommandRequest(chat_id, parsed))
+    
+    def _run_command(self, request: CommandRequest) -> str:
+        return self.commands[request.command](request.chat_id, request.args, request.parsed)
+    
+    # Default middleware
+    
+    def _errors_middleware(self, request: CommandRequest, call_next: Handler) -> str:
         try:
-            parsed = self.parse_command(message)
-            if not parsed:
-                return "Please send a valid command. Type 'help' for available commands."
-            
-            command = parsed["command"]
-            args = parsed["args"]
-            
-            if command in self.commands:
-                return self.commands[command](chat_id, args, parsed)
-            else:
-                return f"Unknown command: {command}. Type 'help' for available commands."
-                
+            return call_next(request)
         except Exception as e:
             logger.error(f"Error handling message: {e}")
             return "Sorry, an error occurred while processing your command."
     
+    def _lookup_middleware(self, request: CommandRequest, call_next: Handler) -> str:
+        if request.command not in self.commands:
+            return f"Unknown command: {request.command}. Type 'help' for available commands."
+        return call_next(request)
+    
+    def _trace_middleware(self, request: CommandRequest, call_next: Handler) -> str:
+        with tracer.span(f"command.{request.command}", new_trace=False, subcommand=request.subcommand):
+            return call_next(request)
+    
+    def _cache_middleware(self, request: CommandRequest, call_next: Handler) -> str:
+        """Serve read-only commands from the response cache, keyed on the chat's data version"""
+        command, args, chat_id = request.command, request.args, request.chat_id
+        if not self._is_cacheable(command, args):
+            return call_next(request)
+        if CACHEABLE[command] is None:
+            key, version = (None, command), None  # static reply, shared by every chat
+        else:
+            key = (chat_id, command, tuple(arg.lower() for arg in args))
+            version = (todo_manager.version_for(chat_id), reminder_scheduler.version_for(chat_id))
+        return response_cache.get_or_render(key, version, lambda: call_next(request))
+    
+    def _is_cacheable(self, command: str, args: List[str]) -> bool:
+        if command not in CACHEABLE:
+            return False
+        subcommands = CACHEABLE[command]
+        return subcommands is None or (bool(args) and args[0].lower() in subcommands)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {'middleware': self.chain.get_stats()}
+    
+    def is_admin(self, chat_id: str) -> bool:
+        """Check whether a chat is allowed to run admin commands"""
+        # Entries name their channel ("tg:123", "wa:4915..."); bare ones are DEFAULT_CHANNEL chats
+        admin_ids = [c.strip() if split_chat_id(c.strip())[0] else chat_id_for(settings.default_channel, c.strip())
+                     for c in settings.admin_chat_ids.split(",") if c.strip()]
+        return str(chat_id) in admin_ids
+    
     def _help_command(self, chat_id: str, args: List[str], parsed: Dict[str, Any]) -> str:
         """Handle help command"""
         return self.help_text
@@ -102,39 +376,84 @@ Type 'help' for this message.
     def _todo_command(self, chat_id: str, args: List[str], parsed: Dict[str, Any]) -> str:
         """Handle todo commands"""
         if not args:
-            return "Usage: todo <add|list|done|delete> [task|id]"
+            return "Usage: todo <add|list|find|done|due|delete|history> [task|id]"
         
         subcommand = args[0].lower()
         
         if subcommand == "add":
             if len(args) < 2:
                 return "Usage: todo add <task>"
-            task = " ".join(args[1:])
-            todo = todo_manager.add_todo(task)
+            # One task per line: "todo add milk\neggs\nbread"
+            text = parsed["full_message"].split(None, 2)[2]
+            tasks = [line.strip() for line in text.splitlines() if line.strip()]
+            if len(tasks) > 1:
+                todos = todo_manager.add_todos(tasks, chat_id=chat_id)
+                lines = [f"• {todo['task']} (ID: {todo['id']})" for todo in todos]
+                return f"✅ Added {len(todos)} tasks:\n" + "\n".join(lines)
+            task = tasks[0]
+            todo = todo_manager.add_todo(task, chat_id=chat_id)
             return f"✅ Added task: {task} (ID: {todo['id']})"
         
         elif subcommand == "list":
-            return todo_manager.format_todo_list()
+            return todo_manager.format_todo_list(todo_manager.list_todos(chat_id=chat_id))
+        
+        elif subcommand == "find":
+            if len(args) < 2:
+                return "Usage: todo find <words>"
+            query = " ".join(args[1:])
+            todos = todo_manager.search_todos(query, chat_id=chat_id)
+            if not todos:
+                return f"🔍 No todos matching '{query}'" + truncation_note(todos)
+            return todo_manager.format_todo_list(todos) + truncation_note(todos)
+        
+        elif subcommand == "history":
+            items = retention_manager.history("todos", chat_id, " ".join(args[1:]))
+            return retention_manager.format_history("todos", items)
         
         elif subcommand == "done":
             if len(args) < 2:
-                return "Usage: todo done <id>"
+                return "Usage: todo done <id> [id ...]"
             try:
-                task_id = int(args[1])
-                todo = todo_manager.complete_todo(task_id)
-                if todo:
-                    return f"✅ Marked task {task_id} as done: {todo['task']}"
-                else:
-                    return f"❌ Task {task_id} not found"
+                task_ids = [int(i) for arg in args[1:] for i in arg.split(",") if i]
             except ValueError:
                 return "❌ Invalid task ID. Please provide a number."
+            if not task_ids:
+                return "Usage: todo done <id> [id ...]"
+            
+            if len(task_ids) > 1:
+                todos = todo_manager.complete_todos(task_ids, chat_id=chat_id)
+                found = {todo['id'] for todo in todos}
+                lines = [f"✅ Marked task {todo['id']} as done: {todo['task']}" for todo in todos]
+                lines += [f"❌ Task {task_id} not found" for task_id in task_ids if task_id not in found]
+                return "\n".join(lines)
+            
+            task_id = task_ids[0]
+            todo = todo_manager.complete_todo(task_id, chat_id=chat_id)
+            if todo:
+                return f"✅ Marked task {task_id} as done: {todo['task']}"
+            else:
+                return f"❌ Task {task_id} not found"
+        
+        elif subcommand == "due":
+            if len(args) < 3:
+                return "Usage: todo due <id> <YYYY-MM-DD>"
+            try:
+                task_id = int(args[1])
+                due_date = datetime.strptime(args[2], "%Y-%m-%d").date().isoformat()
+            except ValueError:
+                return "❌ Usage: todo due <id> <YYYY-MM-DD>"
+            todo = todo_manager.update_todo(task_id, chat_id=chat_id, due_date=due_date)
+            if todo:
+                return f"📅 Task {task_id} is due {due_date}"
+            else:
+                return f"❌ Task {task_id} not found"
         
         elif subcommand == "delete":
             if len(args) < 2:
                 return "Usage: todo delete <id>"
             try:
                 task_id = int(args[1])
-                if todo_manager.delete_todo(task_id):
+                if todo_manager.delete_todo(task_id, chat_id=chat_id):
                     return f"🗑️ Deleted task {task_id}"
                 else:
                     return f"❌ Task {task_id} not found"
@@ -146,14 +465,43 @@ Type 'help' for this message.
     
     def _email_command(self, chat_id: str, args: List[str], parsed: Dict[str, Any]) -> str:
         """Handle email commands"""
-        if len(args) < 3:
-            return "Usage: email <to> <subject> <body>"
+        rest = parsed["full_message"].split(None, 1)[1] if args else ""
+        if args and args[0].lower() == "attach":
+            return self._email_attach_command(chat_id, rest.split(None, 1)[1] if len(args) > 1 else "")
         
-        to_email = args[0]
-        subject = args[1]
-        body = " ".join(args[2:])
+        if len(args) >= 2 and args[1].lower().startswith("template:"):
+            return self._email_template_command(args[0], args[1].split(":", 1)[1], split_args(rest)[2:])
         
-        # Send email
+        # Address and subject may be quoted; the body is taken as written
+        fields, body = take_args(rest, 2)
+        if not all(fields) or (body and not unquote(body)):
+            return "❌ The address, subject and message can't be empty."
+        if len(fields) < 2 or not body:
+            # Ask for whatever is missing, one message at a time
+            if fields and "@" not in fields[0]:
+                return "Usage: email <to> <subject> <body>"
+            fields = dict(zip(("to", "subject"), fields))
+            step = "subject" if fields else "to"
+            self.sessions.start(chat_id, "email", "body" if len(fields) == 2 else step, **fields)
+            return EMAIL_PROMPTS["body" if len(fields) == 2 else step]
+        
+        return self._send_email(fields[0], fields[1], unquote(body))
+    
+    def _email_dialog(self, chat_id: str, session: Session, text: str) -> str:
+        text = unquote(text)
+        if not text:
+            return EMAIL_PROMPTS[session.step]
+        if session.step == "to" and "@" not in text:
+            return "❌ That doesn't look like an email address. Who should I send it to?"
+        session.set(session.step, text)
+        missing = next((field for field in EMAIL_PROMPTS if field not in session.data), None)
+        if missing:
+            session.step = missing
+            return EMAIL_PROMPTS[missing]
+        self.sessions.end(chat_id)
+        return self._send_email(session.data["to"], session.data["subject"], session.data["body"])
+    
+    def _send_email(self, to_email: str, subject: str, body: str) -> str:
         result = email_sender.send_email(to_email, subject, body)
         
         if result.get('success'):
@@ -161,15 +509,115 @@ Type 'help' for this message.
         else:
             return f"❌ Failed to send email: {result.get('error', 'Unknown error')}"
     
+    def _email_attach_command(self, chat_id: str, text: str) -> str:
+        """Email the chat's last Telegram document (as a link if it is too big to attach)"""
+        args, body = take_args(text, 2)
+        if len(args) < 2:
+            return "Usage: email attach <to> <subject> [body]"
+        if not all(args):
+            return "❌ The address and subject can't be empty."
+        
+        document = attachment_store.fetch(chat_id)
+        if "error" in document:
+            return f"❌ {document['error']}"
+        
+        to_email, subject, body = args[0], args[1], unquote(body)
+        result = email_sender.send_attachment_email(to_email, subject, body, document['path'], document['name'])
+        
+        if not result.get('success'):
+            return f"❌ Failed to send email: {result.get('error', 'Unknown error')}"
+        how = "Linked (too big to attach)" if result.get('linked') else "Attached"
+        return (f"📧 Email sent successfully!\nTo: {to_email}\nSubject: {subject}\n"
+                f"📎 {how}: {document['name']} ({format_size(document['size'])})")
+    
+    def _email_template_command(self, to_email: str, template_name: str, args: List[str]) -> str:
+        """Send a named email template; remaining args are key=value context"""
+        context = parse_context(args)
+        if context is None:
+            return "Usage: email <to> template:<name> [key=value ...]"
+        
+        result = email_sender.send_template_email(to_email, template_name, context)
+        
+        if result.get('success'):
+            return f"📧 Email sent successfully!\nTo: {to_email}\nTemplate: {template_name}"
+        else:
+            return f"❌ Failed to send email: {result.get('error', 'Unknown error')}"
+    
     def _remind_command(self, chat_id: str, args: List[str], parsed: Dict[str, Any]) -> str:
         """Handle reminder commands"""
-        if len(args) < 2:
-            return "Usage: remind <time> <message> <message>"
+        if args and args[0].lower() == "list":
+            return reminder_scheduler.format_reminder_list(reminder_scheduler.list_reminders('active', chat_id))
+        
+        if args and args[0].lower() == "history":
+            items = retention_manager.history("reminders", chat_id, " ".join(args[1:]))
+            return retention_manager.format_history("reminders", items)
+        
+        if args and args[0].lower() == "find":
+            if len(args) < 2:
+                return "Usage: remind find <words>"
+            query = " ".join(args[1:])
+            reminders = reminder_scheduler.search_reminders(query, chat_id)
+            if not reminders:
+                return f"🔍 No reminders matching '{query}'" + truncation_note(reminders)
+            return reminder_scheduler.format_reminder_list(reminders) + truncation_note(reminders)
         
-        time_str = args[0]
-        message = " ".join(args[1:])
+        if not args:
+            self.sessions.start(chat_id, "remind", "message")
+            return "⏰ What should I remind you about?"
+        
+        # The message is taken as written, after however many words the schedule used
+        rest = parsed["full_message"].split(None, 1)[1]
+        if is_recurrence(args[0]):
+            try:
+                expression, words = parse_recurrence(args)
+            except ValueError as e:
+                return f"❌ {e}. Try: remind every weekday 09:00 <message>"
+            if not words:
+                self.sessions.start(chat_id, "remind", "message", time=" ".join(args))
+                return "⏰ What should I remind you about?"
+            used = len(args) - len(words)
+            return self._add_recurring_reminder(chat_id, expression, unquote(rest.split(None, used)[used]))
         
-        # Add reminder
+        if not is_time(args[0]):
+            # No time given: everything is the message, ask when
+            self.sessions.start(chat_id, "remind", "time", message=unquote(rest))
+            return "🕐 When? (HH:MM, YYYY-MM-DD HH:MM or e.g. every weekday 09:00)"
+        if len(args) < 2:
+            self.sessions.start(chat_id, "remind", "message", time=args[0])
+            return "⏰ What should I remind you about?"
+        return self._add_reminder(chat_id, args[0], unquote(rest.split(None, 1)[1]))
+    
+    def _remind_dialog(self, chat_id: str, session: Session, text: str) -> str:
+        if session.step == "message":
+            text = unquote(text)
+            if not text:
+                return "⏰ What should I remind you about?"
+            session.set("message", text)
+            if "time" not in session.data:
+                session.step = "time"
+                return "🕐 When? (HH:MM, YYYY-MM-DD HH:MM or e.g. every weekday 09:00)"
+            text = session.data["time"]
+        
+        words = split_args(text)
+        if words and is_recurrence(words[0]):
+            try:
+                expression, rest = parse_recurrence(words)
+            except ValueError as e:
+                return f"❌ {e}. When? (e.g. every weekday 09:00)"
+            if rest:
+                return "❌ Just the schedule please, e.g. every weekday 09:00"
+            self.sessions.end(chat_id)
+            return self._add_recurring_reminder(chat_id, expression, session.data["message"])
+        if not is_time(text):
+            return "❌ I couldn't read that time. When? (HH:MM or YYYY-MM-DD HH:MM)"
+        self.sessions.end(chat_id)
+        return self._add_reminder(chat_id, text, session.data["message"])
+    
+    def _add_recurring_reminder(self, chat_id: str, expression: str, message: str) -> str:
+        reminder = reminder_scheduler.add_reminder(expression, message, chat_id, repeat="cron", cron=expression)
+        return f"🔁 Recurring reminder '{expression}': {message} (ID: {reminder['id']})\n⏭️ Next: {reminder_scheduler.format_next_fire(reminder)}"
+    
+    def _add_reminder(self, chat_id: str, time_str: str, message: str) -> str:
         reminder = reminder_scheduler.add_reminder(time_str, message, chat_id)
         
         if reminder:
@@ -180,23 +628,173 @@ Type 'help' for this message.
     def _meeting_command(self, chat_id: str, args: List[str], parsed: Dict[str, Any]) -> str:
         """Handle meeting commands"""
         if not args:
-            return "Usage: meeting <join|record> [url]"
+            return "Usage: meeting <join|record> <url> | meeting status | meeting leave"
         
         subcommand = args[0].lower()
         
-        if subcommand == "join":
+        if subcommand == "record" and len(args) < 2:
+            # No meeting link: record the configured audio source directly
+            recording = audio_recorder.start(chat_id)
+            if "error" in recording:
+                return f"❌ {recording['error']}"
+            return f"🎙️ Recording started (ID: {recording['id']}). Send 'meeting stop' to finish."
+        
+        if subcommand in ("join", "record"):
             if len(args) < 2:
-                return "Usage: meeting join <url>"
-            url = args[1]
-            # TODO: Implement meeting joining
-            return f"🎥 Joining meeting: {url}"
+                return f"Usage: meeting {subcommand} <url>"
+            job = meeting_manager.submit(chat_id, args[1], kind=subcommand)
+            if "error" in job:
+                return f"❌ {job['error']}"
+            verb = "Joining" if subcommand == "join" else "Joining to record"
+            if job['waiting_for_browser']:
+                return f"⏳ All meeting browsers are busy — queued {job['url']} (job {job['id']})"
+            return f"🎥 {verb}: {job['url']} (job {job['id']})"
+        
+        elif subcommand == "status":
+            job = meeting_manager.get_active(chat_id)
+            recording = audio_recorder.get(chat_id)
+            if not job and not recording:
+                return "🎥 Not in a meeting."
+            lines = []
+            if job:
+                lines.append(f"🎥 {job['url']}\nStatus: {job['status']}\nJoined: {job['joined_at'] or '-'}")
+            if recording:
+                report = recording.report()
+                lines.append(f"🎙️ Recording {format_duration(report['duration'])} in {report['chunks']} chunk(s)")
+            return "\n".join(lines)
         
-        elif subcommand == "record":
-            # TODO: Implement meeting recording
-            return "🎙️ Starting meeting recording..."
+        elif subcommand in ("leave", "stop"):
+            job = meeting_manager.leave(chat_id)
+            if job:
+                # The meeting worker finalizes any recording once it has hung up
+                return f"👋 Leaving {job['url']}..."
+            if audio_recorder.stop_and_send(chat_id):
+                return "⏹️ Stopping the recording — the file will follow shortly."
+            return "🎥 Not in a meeting."
         
         else:
             return f"Unknown meeting subcommand: {subcommand}"
+    
+    def _broadcast_command(self, chat_id: str, args: List[str], parsed: Dict[str, Any]) -> str:
+        """Handle broadcast commands (admin only)"""
+        if not self.is_admin(chat_id):
+            return "❌ Broadcast is restricted to admins."
+        
+        if not args:
+            return "Usage: broadcast <message> | broadcast status [id]"
+        
+        if args[0].lower() == "status":
+            if len(args) < 2:
+                reports = broadcast_manager.list_broadcasts()
+                if not reports:
+                    return "📣 No broadcasts found."
+                return "\n\n".join(broadcast_manager.format_report(r) for r in reports[-5:])
+            report = broadcast_manager.get_broadcast(args[1])
+            if not report:
+                return f"❌ Broadcast {args[1]} not found"
+            return broadcast_manager.format_report(report)
+        
+        # Keep the original spacing and line breaks of the announcement
+        message = parsed["full_message"].split(None, 1)[1]
+        report = broadcast_manager.create_broadcast(message)
+        return f"📣 Broadcast {report['id']} started to {report['total']} chats"
+    
+    def _mailmerge_command(self, chat_id: str, args: List[str], parsed: Dict[str, Any]) -> str:
+        """Handle mail merge commands (admin only)"""
+        if not self.is_admin(chat_id):
+            return "❌ Mail merge is restricted to admins."
+        
+        usage = ("Usage: mailmerge contacts <group> (CSV on the next lines) | "
+                 "mailmerge send <group> template:<name> [key=value ...] | mailmerge status [id]")
+        subcommand = args[0].lower() if args else ""
+        
+        if subcommand == "contacts":
+            if len(args) < 2:
+                groups = mail_merge_manager.groups
+                if not groups:
+                    return "📇 No contact groups yet."
+                return "📇 Contact groups:\n" + "\n".join(f"• {name} ({len(rows)})" for name, rows in groups.items())
+            lines = parsed["full_message"].split("\n", 1)
+            if len(lines) < 2:
+                return "Usage: mailmerge contacts <group>\nemail,name\nann@example.com,Ann"
+            try:
+                rows = parse_recipients(lines[1])
+            except ValueError as e:
+                return f"❌ {e}"
+            count = mail_merge_manager.save_group(args[1], rows)
+            return f"📇 Saved {count} contacts to {args[1].lower()}"
+        
+        elif subcommand == "send":
+            if len(args) < 3 or not args[2].lower().startswith("template:"):
+                return "Usage: mailmerge send <group> template:<name> [key=value ...]"
+            rows = mail_merge_manager.get_group(args[1])
+            if not rows:
+                return f"❌ No contact group named {args[1]}"
+            context = parse_context(split_args(parsed["full_message"])[4:])
+            if context is None:
+                return "Usage: mailmerge send <group> template:<name> [key=value ...]"
+            try:
+                report = mail_merge_manager.create_job(args[2].split(":", 1)[1], rows, context)
+            except Exception as e:
+                return f"❌ Template error: {e}"
+            return f"📨 Mail merge {report['id']} started to {report['total']} recipients"
+        
+        elif subcommand == "status":
+            if len(args) < 2:
+                reports = mail_merge_manager.list_jobs()
+                if not reports:
+                    return "📨 No mail merges found."
+                return "\n\n".join(mail_merge_manager.format_report(r) for r in reports[-5:])
+            report = mail_merge_manager.get_job(args[1])
+            if not report:
+                return f"❌ Mail merge {args[1]} not found"
+            return mail_merge_manager.format_report(report)
+        
+        return usage
+    
+    def _tz_command(self, chat_id: str, args: List[str], parsed: Dict[str, Any]) -> str:
+        """Show or set the chat's time zone"""
+        if not args:
+            zone = timezones.get(chat_id) or "server local time"
+            return f"🌍 Time zone: {zone}\n🕐 Now: {timezones.now(chat_id).strftime('%Y-%m-%d %H:%M')}"
+        
+        try:
+            zone = reminder_scheduler.set_timezone(chat_id, args[0])
+        except ValueError as e:
+            return f"❌ {e}. Use a name like Europe/Berlin or America/New_York"
+        digest_manager.update_timezone(chat_id)
+        return f"🌍 Time zone set to {zone}\n🕐 Now: {timezones.now(chat_id).strftime('%Y-%m-%d %H:%M')}"
+    
+    def _digest_command(self, chat_id: str, args: List[str], parsed: Dict[str, Any]) -> str:
+        """Handle daily digest commands"""
+        subcommand = args[0].lower() if args else "now"
+        
+        if subcommand == "now":
+            return digest_manager.format_digest(digest_manager.build_digest(chat_id))
+        
+        elif subcommand == "on":
+            try:
+                pref = digest_manager.subscribe(chat_id, args[1] if len(args) > 1 else None)
+            except ValueError:
+                return "❌ Invalid time. Use HH:MM, e.g. digest on 20:00"
+            return f"📊 Daily digest on at {pref['time']}"
+        
+        elif subcommand == "email":
+            if len(args) < 2:
+                return "Usage: digest email <address|off>"
+            email = "" if args[1].lower() == "off" else args[1]
+            pref = digest_manager.subscribe(chat_id, email=email)
+            if pref['email']:
+                return f"📧 Digest will also be emailed to {pref['email']} at {pref['time']}"
+            return "📧 Digest emails turned off"
+        
+        elif subcommand == "off":
+            if digest_manager.unsubscribe(chat_id):
+                return "📊 Daily digest turned off"
+            return "📊 Daily digest was not on"
+        
+        else:
+            return "Usage: digest <on [HH:MM]|email <address>|now|off>"
 
 # Global command router instance
 command_router = CommandRouter()
@@ -0,0 +1,111 @@
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from app.config.settings import settings
+from app.core.telegram_client import telegram_client
+
+logger = logging.getLogger(__name__)
+
+# Upstream state older than this many refresh intervals counts as unknown
+STALE_AFTER_INTERVALS = 3
+
+class HealthMonitor:
+    """Cached bot identity and readiness state.
+    
+    A background thread calls getMe every `ttl` seconds; probes and
+    GET /webhook only read the cached result, so they never wait on
+    Telegram. Local checks (storage, scheduler, ...) are registered as
+    cheap callables that read in-memory state.
+    """
+    
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl or settings.health_refresh_seconds
+        self.bot_info: Optional[Dict[str, Any]] = None  # getMe result, once fetched successfully
+        self.upstream_ok = False
+        self.upstream_error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.started_at = time.time()
+        self._checks: Dict[str, Callable[[], bool]] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.running = False
+        self.stats = {'refreshes': 0, 'refresh_failures': 0}
+    
+    def add_check(self, name: str, check: Callable[[], bool]):
+        """Register a readiness check; it must not do I/O"""
+        self._checks[name] = check
+    
+    def refresh(self) -> bool:
+        """Fetch the bot identity now (blocking); keeps the last good identity on failure"""
+        result = telegram_client.get_me()
+        self.checked_at = time.time()
+        self.stats['refreshes'] += 1
+        if result.get("ok"):
+            self.bot_info = result.get("result", {})
+            self.upstream_ok = True
+            self.upstream_error = None
+        else:
+            self.upstream_ok = False
+            self.upstream_error = result.get("description") or result.get("error", "getMe failed")
+            self.stats['refresh_failures'] += 1
+            logger.warning(f"Telegram getMe failed: {self.upstream_error}")
+        return self.upstream_ok
+    
+    def start(self):
+        """Start the refresh loop; the first fetch happens right away on that thread"""
+        if not self.running:
+            self.running = True
+            self._thread = threading.Thread(target=self._run, daemon=True, name="health-refresh")
+            self._thread.start()
+            logger.info(f"Health monitor started (refresh every {self.ttl:g}s)")
+    
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+    
+    def _run(self):
+        while self.running:
+            try:
+                self.refresh()
+            except Exception as e:
+                self.upstream_ok = False
+                self.upstream_error = str(e)
+                logger.error(f"Health refresh failed: {e}")
+            # Retry sooner while Telegram is unreachable
+            self._wake.wait(self.ttl if self.upstream_ok else min(self.ttl, 10))
+            self._wake.clear()
+    
+    def upstream_fresh(self) -> bool:
+        """Whether the cached upstream state is recent enough to trust"""
+        return self.checked_at is not None and time.time() - self.checked_at < self.ttl * STALE_AFTER_INTERVALS
+    
+    def readiness(self) -> Dict[str, Any]:
+        """Evaluate readiness from cached and in-memory state only"""
+        checks = {'telegram': self.upstream_ok and self.upstream_fresh()}
+        for name, check in self._checks.items():
+            try:
+                checks[name] = bool(check())
+            except Exception as e:
+                logger.error(f"Readiness check {name} failed: {e}")
+                checks[name] = False
+        return {
+            'ready': all(checks.values()),
+            'checks': checks,
+            'bot': (self.bot_info or {}).get("username"),
+            'upstream_checked_at': datetime.fromtimestamp(self.checked_at).isoformat() if self.checked_at else None,
+            'upstream_error': self.upstream_error
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'uptime_seconds': round(time.time() - self.started_at),
+            **self.readiness()
+        }
+
+# Global health monitor instance
+health_monitor = HealthMonitor()
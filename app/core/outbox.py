@@ -0,0 +1,116 @@
+import json
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.storage import JsonStore
+
+logger = logging.getLogger(__name__)
+
+class Outbox:
+    """Durable record of outbound messages until they are delivered.
+    
+    Entries are plain dicts (chat, channel, kind, payload) kept in a
+    JsonStore until the sender acks them. The pipeline puts that store in
+    a CommitGroup with the todo and reminder stores, so a reply and the
+    change it reports land in the same commit, and waits for it before it
+    releases a batch's replies. Whatever is still pending after a crash or
+    shutdown is replayed on startup. Delivery is at-least-once; an ack lost
+    in the flush window means one resend. Entries that failed for good are
+    appended to a JSON-lines dead letter file next to the outbox.
+    
+    A key makes add() idempotent while its entry is pending and for the
+    last `recent_keys` successful deliveries, so a retried action doesn't
+    send twice (and one that failed for good can be tried again).
+    """
+    
+    def __init__(self, path: str, recent_keys: int = 1000):
+        self.store = JsonStore(Path(path), self._snapshot)
+        self.dead_letter_path = self.store.path.with_suffix(".dead.jsonl")
+        self._lock = threading.Lock()
+        self.pending: Dict[int, Dict[str, Any]] = {entry['id']: entry for entry in self.store.load([])}
+        self.next_id = max(self.pending, default=0) + 1
+        self._keys: Dict[str, int] = {entry['key']: entry['id'] for entry in self.pending.values() if entry.get('key')}
+        self._delivered: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.recent_keys = recent_keys
+        self.stats = {'added': 0, 'delivered': 0, 'dead_lettered': 0, 'replayed': 0}
+    
+    def _snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.pending.values())
+    
+    def add(self, chat_id: str, channel: Optional[str], kind: str, key: str = None,
+            **payload) -> Tuple[Dict[str, Any], bool]:
+        """Record a message to send; returns (entry, added). A pending key returns its entry unchanged."""
+        with self._lock:
+            if key and key in self._keys:
+                return self.pending[self._keys[key]], False
+            entry = {'id': self.next_id, 'chat_id': chat_id, 'channel': channel, 'kind': kind, **payload}
+            if key:
+                entry['key'] = key
+                self._keys[key] = entry['id']
+            self.pending[entry['id']] = entry
+            self.next_id += 1
+            self.stats['added'] += 1
+        self.store.mark_dirty()
+        return entry, True
+    
+    def delivered(self, key: str) -> Optional[Dict[str, Any]]:
+        """Result of a recent delivery under this key, if any"""
+        with self._lock:
+            return self._delivered.get(key)
+    
+    def _dead_letter(self, failed: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Append entries that failed for good to the dead letter file, durably"""
+        failed_at = int(time.time())
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            for entry, result in failed:
+                f.write(json.dumps({**entry, 'error': result['error'], 'status_code': result.get('status_code'),
+                                    'failed_at': failed_at}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def dead_letters(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """The most recent dead letters, newest first"""
+        if not self.dead_letter_path.exists():
+            return []
+        with open(self.dead_letter_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()[-limit:] if limit else []
+        return [json.loads(line) for line in reversed(lines) if line.strip()]
+    
+    def ack(self, outcomes: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Drop finished entries, given (entry, send result) pairs; failed ones go to the dead letter file"""
+        failed = [(entry, result) for entry, result in outcomes if "error" in result]
+        if failed:
+            try:
+                self._dead_letter(failed)
+            except OSError as e:
+                # Keep them pending; they are replayed (and retried) after a restart
+                logger.error(f"Error writing dead letters to {self.dead_letter_path}: {e}")
+                outcomes = [(entry, result) for entry, result in outcomes if "error" not in result]
+        with self._lock:
+            for entry, result in outcomes:
+                self.pending.pop(entry['id'], None)
+                self.stats['dead_lettered' if "error" in result else 'delivered'] += 1
+                key = entry.get('key')
+                if key:
+                    self._keys.pop(key, None)
+                if key and "error" not in result:
+                    self._delivered[key] = result
+                    if len(self._delivered) > self.recent_keys:
+                        self._delivered.popitem(last=False)
+        # One mutation per drained batch; the acks share a flush
+        self.store.mark_dirty()
+    
+    def replay(self) -> List[Dict[str, Any]]:
+        """Entries still waiting for delivery, oldest first"""
+        with self._lock:
+            entries = sorted(self.pending.values(), key=lambda entry: entry['id'])
+            self.stats['replayed'] += len(entries)
+        return entries
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'pending': len(self.pending), 'store': self.store.get_stats()}
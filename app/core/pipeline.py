@@ -0,0 +1,320 @@
+import time
+import queue
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from app.config.settings import settings
+from app.core.storage import JsonStore, commit_group
+from app.core.chat_ids import split_chat_id, legacy_chat_ids
+from app.core.outbox import Outbox
+from app.core.throttle import command_throttle
+from app.core.tracing import tracer, SpanContext
+from app.core.transport import Transport, InboundMessage
+from app.core.telegram_client import telegram_client
+from app.core.whatsapp_client import whatsapp_client
+
+logger = logging.getLogger(__name__)
+
+ERROR_REPLY = "❌ Something went wrong handling that message."
+RETRY_BACKOFF = 0.5  # seconds before the second attempt; doubles per attempt
+MAX_RETRY_DELAY = 30
+
+def retryable(result: Dict[str, Any]) -> bool:
+    """Whether a failed send may succeed later (network errors, 429, 5xx)"""
+    if result.get("permanent"):
+        return False
+    status = result.get("status_code")
+    return status is None or status == 429 or status >= 500
+
+class MessagePipeline:
+    """The one path every channel's messages take.
+    
+    Inbound: dedup (webhook retries) -> throttle -> route -> record
+    replies in the outbox -> wait for durability once per batch -> queue
+    the replies. Outbound: every message goes through the outbox (see
+    Outbox) and a send queue sharded by chat, so each chat's messages go
+    out in order over the channel its id names ("tg:..." or "wa:..."),
+    while different chats send in parallel. Workers drain
+    their shard in batches, retry transient failures with backoff and ack
+    each batch with one outbox write.
+    """
+    
+    def __init__(self, workers: int = None, dedup_window: int = None, outbox_file: str = "data/outbox.json"):
+        self.transports: Dict[str, Transport] = {}
+        self.workers = workers or settings.send_workers
+        self.dedup_window = dedup_window or settings.dedup_window
+        self.router: Optional[Callable[[str, str], str]] = None
+        self.split: Callable[[str], List[str]] = lambda text: text.splitlines()
+        self._seen: "OrderedDict[Tuple[str, str, str], None]" = OrderedDict()
+        self._inbound_listeners: List[Callable[[InboundMessage], None]] = []
+        self.outbox = Outbox(outbox_file)
+        self.max_attempts = settings.outbox_max_attempts
+        self.drain_batch = settings.outbox_drain_batch
+        # Replies join the same commit as the changes they confirm (see commit_with)
+        commit_group.join(self.outbox.store)
+        self._commit_hooks: List[Callable[[], Awaitable[Any]]] = [self.outbox.store.durable]
+        self._futures: Dict[int, Future] = {}
+        self._shards: List["queue.Queue"] = []
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+    
+    def register(self, transport: Transport):
+        self.transports[transport.name] = transport
+        self.stats[transport.name] = {'received': 0, 'duplicates': 0, 'throttled': 0, 'sent': 0, 'failed': 0}
+    
+    def route_with(self, router: Callable[[str, str], str], split: Callable[[str], List[str]] = None):
+        """Set the command handler: (chat_id, text) -> reply, and how a message splits into commands"""
+        self.router = router
+        if split:
+            self.split = split
+    
+    def add_inbound_listener(self, callback: Callable[[InboundMessage], None]):
+        self._inbound_listeners.append(callback)
+    
+    def add_commit_hook(self, hook: Callable[[], Awaitable[Any]]):
+        """Awaited after each inbound batch, before any reply is queued"""
+        self._commit_hooks.append(hook)
+    
+    def commit_with(self, store: JsonStore):
+        """Write a store's changes in the same commit as the replies that report them"""
+        commit_group.join(store)
+        self.add_commit_hook(store.durable)
+    
+    def channel_for(self, chat_id: str) -> str:
+        """The channel a chat id names ("tg:..." or "wa:..."; bare ids from old data are mapped first)"""
+        return split_chat_id(legacy_chat_ids.qualify(chat_id))[0]
+    
+    def transport_for(self, chat_id: str) -> Transport:
+        """The transport a chat is reached over"""
+        return self.transports.get(self.channel_for(chat_id)) or self.transports[settings.default_channel]
+    
+    def address(self, chat_id: str) -> Tuple[Transport, str]:
+        """(transport, the id that transport knows the chat by)"""
+        return self.transport_for(chat_id), split_chat_id(legacy_chat_ids.qualify(chat_id))[1]
+    
+    # Inbound
+    
+    def _duplicate(self, message: InboundMessage) -> bool:
+        """Whether this message was already seen (webhooks are retried on slow replies)"""
+        if message.message_id is None:
+            return False
+        key = (message.channel, message.chat_id, message.message_id)
+        with self._lock:
+            if key in self._seen:
+                return True
+            self._seen[key] = None
+            if len(self._seen) > self.dedup_window:
+                self._seen.popitem(last=False)
+        return False
+    
+    def _handle(self, message: InboundMessage) -> Optional[str]:
+        """Throttle and route one message; returns the reply to send (if any)"""
+        chat_id = message.chat_id
+        logger.info(f"Processing {message.channel} message from {message.username or message.first_name} "
+                    f"(chat_id: {chat_id}): {message.text}")
+        
+        # Handle text messages
+        if message.message_type == "text" and message.text:
+            commands = [c.split(None, 1)[0] for c in self.split(message.text) if c.strip()]
+            admitted, reply = command_throttle.admit(chat_id, commands)
+            if not admitted:
+                # Cheap reply (or none at all); nothing touches SMTP or disk
+                self.stats[message.channel]['throttled'] += 1
+                return reply
+            with command_throttle.track(), tracer.span("route", commands=len(commands)):
+                return self.router(chat_id, message.text)
+        
+        # Handle voice messages
+        elif message.message_type == "voice":
+            # TODO: Implement voice message processing
+            return "🎤 Voice message received! Processing..."
+        
+        elif message.message_type == "document":
+            return "📎 Got your document. Send 'email attach <to> <subject> [body]' to email it."
+        
+        # Handle other message types
+        else:
+            return f"Received {message.message_type} message. Text commands are supported."
+    
+    async def ingest(self, messages: Iterable[InboundMessage]) -> int:
+        """Run a batch of inbound messages through the pipeline; returns how many were handled"""
+        replies = []
+        for message in messages:
+            stats = self.stats[message.channel]
+            stats['received'] += 1
+            if self._duplicate(message):
+                stats['duplicates'] += 1
+                logger.info(f"Skipping duplicate {message.channel} message {message.message_id}")
+                continue
+            with tracer.span("message", channel=message.channel, chat_id=message.chat_id,
+                             message_id=message.message_id, type=message.message_type) as span:
+                for listener in self._inbound_listeners:
+                    listener(message)
+                try:
+                    reply = self._handle(message)
+                except Exception as e:
+                    logger.error(f"Error handling message from {message.chat_id}: {e}")
+                    reply = ERROR_REPLY
+            if reply:
+                replies.append(self._record(message.chat_id, message.channel, "text", span.context, text=reply))
+        
+        # Don't confirm a change before it is on disk; one commit covers the batch's state and replies
+        with tracer.span("commit", messages=len(replies)):
+            await asyncio.gather(*(hook() for hook in self._commit_hooks))
+        for entry, _ in replies:
+            self._dispatch(entry)
+        return len(replies)
+    
+    # Outbound
+    
+    def _start_workers(self):
+        with self._lock:
+            if self._shards:
+                return
+            for index in range(self.workers):
+                shard: "queue.Queue" = queue.Queue()
+                thread = threading.Thread(target=self._work, args=(shard,), daemon=True, name=f"send-{index}")
+                thread.start()
+                self._shards.append(shard)
+                self._threads.append(thread)
+    
+    def _record(self, chat_id: str, channel: Optional[str], kind: str, trace: Optional[SpanContext] = None,
+                key: str = None, **payload) -> Tuple[Optional[Dict[str, Any]], Future]:
+        """Put a message in the outbox; returns (entry to dispatch or None if already queued, its Future)"""
+        # The send is traced as part of whatever queued it, even after a restart
+        trace = trace or tracer.current()
+        with self._lock:
+            result = self.outbox.delivered(key) if key else None
+            if result is not None:
+                future: Future = Future()
+                future.set_result(result)
+                return None, future
+            entry, added = self.outbox.add(chat_id, channel, kind, key=key,
+                                           trace=list(trace) if trace else None, **payload)
+            future = self._futures.get(entry['id'])
+            if future is None:
+                future = self._futures[entry['id']] = Future()
+        return (entry if added else None), future
+    
+    def _dispatch(self, entry: Optional[Dict[str, Any]]):
+        if entry is None:
+            return
+        if not self._shards:
+            self._start_workers()
+        # Same chat, same shard: its messages stay in order
+        self._shards[hash(entry['chat_id']) % len(self._shards)].put((entry, time.perf_counter()))
+    
+    def _submit(self, chat_id: str, channel: Optional[str], kind: str, trace: SpanContext = None,
+                key: str = None, **payload) -> Future:
+        entry, future = self._record(chat_id, channel, kind, trace, key, **payload)
+        self._dispatch(entry)
+        return future
+    
+    def replay_outbox(self) -> int:
+        """Queue what the outbox still holds from before the last shutdown or crash"""
+        entries = self.outbox.replay()
+        for entry in entries:
+            with self._lock:
+                self._futures.setdefault(entry['id'], Future())
+            self._dispatch(entry)
+        if entries:
+            logger.info(f"Replaying {len(entries)} undelivered messages from the outbox")
+        return len(entries)
+    
+    def _deliver(self, transport: Transport, to: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            if entry['kind'] == "document":
+                return transport.send_document_file(to, entry['path'], entry.get('caption', ""))
+            return transport.send_text_message(to, entry['text'])
+        except Exception as e:
+            # A bug or a missing local file, not a flaky network: retrying won't help
+            logger.error(f"Error sending to {entry['chat_id']} over {transport.name}: {e}")
+            return {"error": str(e), "permanent": True}
+    
+    def _send(self, entry: Dict[str, Any], queued_at: float) -> Dict[str, Any]:
+        """Deliver one entry, retrying transient failures with backoff"""
+        chat_id = entry['chat_id']
+        transport, to = self.address(chat_id)
+        trace = SpanContext(*entry['trace']) if entry.get('trace') else None
+        with tracer.span("send", parent=trace, new_trace=False, channel=transport.name, chat_id=chat_id,
+                         queued_ms=round((time.perf_counter() - queued_at) * 1000, 2)) as span:
+            for attempt in range(self.max_attempts):
+                result = self._deliver(transport, to, entry)
+                if "error" not in result or not retryable(result) or attempt == self.max_attempts - 1:
+                    break
+                time.sleep(result.get("retry_after") or min(RETRY_BACKOFF * 2 ** attempt, MAX_RETRY_DELAY))
+            if span is not None:
+                span.set(attempts=attempt + 1, failed="error" in result)
+        if "error" in result:
+            logger.error(f"Giving up on message {entry['id']} to {chat_id} after {attempt + 1} attempts: "
+                         f"{result['error']}")
+        self.stats[transport.name]['failed' if "error" in result else 'sent'] += 1
+        return result
+    
+    def _work(self, shard: "queue.Queue"):
+        while True:
+            # Take whatever has piled up (up to drain_batch) and ack it with one outbox write
+            batch = [shard.get()]
+            while batch[-1] is not None and len(batch) < self.drain_batch:
+                try:
+                    batch.append(shard.get_nowait())
+                except queue.Empty:
+                    break
+            outcomes = [(entry, self._send(entry, queued_at)) for entry, queued_at in
+                        (item for item in batch if item is not None)]
+            if outcomes:
+                with self._lock:
+                    self.outbox.ack(outcomes)
+                    futures = [(self._futures.pop(entry['id'], None), result) for entry, result in outcomes]
+                for future, result in futures:
+                    if future is not None:
+                        future.set_result(result)
+            if batch[-1] is None:
+                return
+    
+    def send_text(self, chat_id: str, text: str, trace: SpanContext = None, key: str = None) -> Future:
+        """Queue a text message to a chat; the Future resolves to the API result once delivered or given up on.
+        
+        With a key, sending again while the first is pending (or just delivered) doesn't send twice.
+        """
+        return self._submit(chat_id, self.channel_for(chat_id), "text", trace, key, text=text)
+    
+    def send_document_file(self, chat_id: str, path: str, caption: str = "") -> Future:
+        """Queue a local file to be sent to a chat as a document"""
+        return self._submit(chat_id, self.channel_for(chat_id), "document", path=path, caption=caption)
+    
+    def send(self, chat_id: str, text: str, timeout: float = 60, key: str = None) -> Dict[str, Any]:
+        """Send a text message and wait for the API result"""
+        try:
+            return self.send_text(chat_id, text, key=key).result(timeout)
+        except TimeoutError:
+            return {"error": "Send timed out"}
+    
+    def stop(self):
+        """Drain the send queue and persist the outbox"""
+        for shard in self._shards:
+            shard.put(None)
+        for thread in self._threads:
+            thread.join(timeout=30)
+        self._shards, self._threads = [], []
+        self.outbox.store.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'channels': {name: {**self.stats[name], **transport.get_stats()}
+                         for name, transport in self.transports.items()},
+            'queued': sum(shard.qsize() for shard in self._shards),
+            'outbox': self.outbox.get_stats(),
+            'commit': commit_group.get_stats(),
+            'migrated_chat_ids': legacy_chat_ids.stats['migrated']
+        }
+
+# Global message pipeline, with both channels plugged in
+message_pipeline = MessagePipeline()
+message_pipeline.register(telegram_client)
+message_pipeline.register(whatsapp_client)
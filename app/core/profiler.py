@@ -0,0 +1,220 @@
+import os
+import re
+import sys
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".collapsed"
+# Stack recorded for samples taken while a request's tasks were all suspended in an await
+AWAITING = "(awaiting)"
+
+# The session of the request whose task (or parent task) is running; tasks inherit it when created
+_current_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+class ProfileSession:
+    """Stack samples collected for one request.
+    
+    On an event loop many requests share one thread, so a session owns the
+    task that began it plus every task created under it (tracked by the
+    loop's task factory); a sample is only credited to the session whose
+    task is running at that moment.
+    """
+    
+    __slots__ = ('thread_id', 'reason', 'started', 'stacks', 'loop', 'tasks', 'token')
+    
+    def __init__(self, thread_id: int, reason: str, loop: asyncio.AbstractEventLoop = None):
+        self.thread_id = thread_id
+        self.reason = reason
+        self.started = time.perf_counter()
+        self.stacks: Counter = Counter()
+        self.loop = loop
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+        self.token = None
+
+class RequestProfiler:
+    """Opt-in statistical profiler for webhook requests.
+    
+    A request is profiled when an admin asks for it (X-Profile header), when
+    it is the Nth request (1-in-N sampling), or - with a latency threshold
+    set - every request is sampled and only the slow ones are kept. One
+    sampler thread walks the profiled threads' stacks every `interval` and
+    sleeps while nothing is being profiled. Under asyncio, samples are
+    credited per task: while a request's tasks are suspended the sample
+    counts as "(awaiting)" - time spent in awaits (durable(), network I/O)
+    shows up as a total, not attributed to the await that caused it.
+    Profiles are written as collapsed stacks (flamegraph.pl / speedscope input) to a directory that keeps the
+    newest `keep` files. When disabled, main.py never installs the hook.
+    """
+    
+    def __init__(self, directory: str = None, sample_every: int = None, slow_ms: float = None,
+                 interval_ms: float = None, keep: int = None):
+        self.enabled = settings.profile_enabled
+        self.directory = Path(directory or settings.profile_dir)
+        self.sample_every = settings.profile_sample_every if sample_every is None else sample_every
+        self.slow_ms = settings.profile_slow_ms if slow_ms is None else slow_ms
+        self.interval = (interval_ms or settings.profile_interval_ms) / 1000
+        self.keep = keep or settings.profile_keep
+        self._active: Dict[int, ProfileSession] = {}
+        self._labels: Dict[Any, str] = {}
+        self._hooked_loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._requests = 0
+        self._written = 0
+        self.stats = {'profiled': 0, 'written': 0, 'discarded': 0, 'samples': 0}
+    
+    def begin(self, requested: bool = False) -> Optional[ProfileSession]:
+        """Start profiling the calling task (or thread, outside asyncio) if a trigger fires; None means don't profile"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with self._lock:
+            self._requests += 1
+            if requested:
+                reason = "requested"
+            elif self.sample_every and self._requests % self.sample_every == 0:
+                reason = "sampled"
+            elif self.slow_ms:
+                reason = "slow"  # kept only if it turns out slow
+            else:
+                return None
+            session = ProfileSession(threading.get_ident(), reason, loop)
+            self._active[id(session)] = session
+            self.stats['profiled'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="profiler")
+                self._thread.start()
+        if loop is not None:
+            self._hook(loop)
+            session.tasks.add(asyncio.current_task())
+            session.token = _current_session.set(session)
+        self._wake.set()
+        return session
+    
+    def _hook(self, loop: asyncio.AbstractEventLoop):
+        """Install a task factory that adds tasks created under a session to it"""
+        if loop in self._hooked_loops:
+            return
+        previous = loop.get_task_factory()
+        
+        def factory(loop, coro, **kwargs):
+            task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+            session = _current_session.get()
+            if session is not None:
+                session.tasks.add(task)
+            return task
+        
+        loop.set_task_factory(factory)
+        self._hooked_loops.add(loop)
+    
+    def end(self, session: ProfileSession, label: str = "") -> Optional[str]:
+        """Stop a session; writes the profile and returns its file name (None if discarded)"""
+        elapsed_ms = (time.perf_counter() - session.started) * 1000
+        if session.token is not None:
+            _current_session.reset(session.token)
+        with self._lock:
+            self._active.pop(id(session), None)
+            if session.reason == "slow" and elapsed_ms < self.slow_ms:
+                self.stats['discarded'] += 1
+                return None
+            self._written += 1
+            sequence = self._written
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "request"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{sequence:04d}-{slug}-{session.reason}-{elapsed_ms:.0f}ms{PROFILE_SUFFIX}"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / name, 'w', encoding='utf-8') as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in session.stacks.most_common())
+            self.stats['written'] += 1
+            self._rotate()
+        except OSError as e:
+            logger.error(f"Failed to write profile {name}: {e}")
+            return None
+        logger.info(f"Profiled {label or 'request'} ({session.reason}, {elapsed_ms:.0f} ms) -> {name}")
+        return name
+    
+    def _run(self):
+        while True:
+            self._wake.clear()
+            with self._lock:
+                sessions = list(self._active.values())
+            if not sessions:
+                # Nothing to profile: sleep until the next session begins
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is None:
+                    continue
+                if session.loop is not None and asyncio.current_task(session.loop) not in session.tasks:
+                    # Another request's task (or the loop itself) is running; ours is waiting
+                    session.stacks[AWAITING] += 1
+                else:
+                    session.stacks[self._collapse(frame)] += 1
+                self.stats['samples'] += 1
+            del frames
+            time.sleep(self.interval)
+    
+    def _collapse(self, frame) -> str:
+        """Root-first 'a;b;c' stack for one frame"""
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                try:
+                    filename = os.path.relpath(code.co_filename)
+                except ValueError:
+                    filename = os.path.basename(code.co_filename)
+                label = self._labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+            labels.append(label)
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+    
+    def _saved(self) -> List[Path]:
+        """Saved profile files, newest first"""
+        return sorted(self.directory.glob(f"*{PROFILE_SUFFIX}"), key=lambda path: path.stat().st_mtime_ns, reverse=True)
+    
+    def _rotate(self):
+        """Delete all but the newest `keep` profiles"""
+        for path in self._saved()[self.keep:]:
+            path.unlink(missing_ok=True)
+    
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Saved profiles, newest first"""
+        if not self.directory.exists():
+            return []
+        return [{'name': path.name, 'bytes': stat.st_size, 'created': stat.st_mtime}
+                for path, stat in ((path, path.stat()) for path in self._saved())]
+    
+    def profile_path(self, name: str) -> Optional[Path]:
+        """Path of a saved profile, or None for unknown (or unsafe) names"""
+        if "/" in name or "\\" in name or not name.endswith(PROFILE_SUFFIX):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'enabled': self.enabled,
+            'sample_every': self.sample_every,
+            'slow_ms': self.slow_ms,
+            'active': len(self._active)
+        }
+
+# Global request profiler instance
+request_profiler = RequestProfiler()
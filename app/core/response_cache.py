@@ -0,0 +1,57 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """LRU cache of rendered replies for read-only commands.
+    
+    Entries are keyed by (chat, command, args) and remember the data
+    version they were rendered at; a lookup with a newer version is a
+    miss and the entry is re-rendered in place, so stale replies never
+    pile up in the LRU.
+    """
+    
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or settings.response_cache_size
+        self._entries: "OrderedDict[Hashable, Tuple[Any, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    def get_or_render(self, key: Hashable, version: Any, render: Callable[[], str]) -> str:
+        """Return the cached reply for key at version, rendering it on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+        
+        response = render()
+        with self._lock:
+            self._entries[key] = (version, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return response
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0
+            }
+
+# Global response cache instance
+response_cache = ResponseCache()
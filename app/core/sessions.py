@@ -0,0 +1,187 @@
+import dbm
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Longest value a dialog may keep per field; bounds the memory of one session
+MAX_FIELD_CHARS = 4096
+
+class Session:
+    """Where a chat is in a multi-step command"""
+    
+    __slots__ = ('command', 'step', 'data', 'expires_at')
+    
+    def __init__(self, command: str, step: str, data: Dict[str, str] = None, expires_at: float = 0.0):
+        self.command = command
+        self.step = step
+        self.data = data or {}
+        self.expires_at = expires_at
+    
+    def set(self, key: str, value: str):
+        self.data[key] = value[:MAX_FIELD_CHARS]
+    
+    def to_json(self) -> str:
+        return json.dumps([self.command, self.step, self.data, self.expires_at], ensure_ascii=False)
+    
+    @classmethod
+    def from_json(cls, raw) -> "Session":
+        return cls(*json.loads(raw))
+
+class SessionStore:
+    """Per-chat dialog state with a TTL and a hard cap on how many are kept in memory.
+    
+    Sessions live in an OrderedDict kept in last-used order: lookups are
+    O(1), every touch moves the chat to the end, and since the TTL is the
+    same for everyone the expired sessions are always at the front, so a
+    sweep only looks at what it removes. Past `max_sessions` the least
+    recently used session is evicted; with a spill file it is moved to a
+    dbm file instead (also O(1) per key) and comes back on the chat's next
+    message. Live sessions are spilled on close so dialogs survive restarts.
+    """
+    
+    def __init__(self, ttl: float = None, max_sessions: int = None, spill_file: str = None):
+        self.ttl = ttl if ttl is not None else settings.session_ttl_seconds
+        self.max_sessions = max_sessions or settings.session_max
+        spill_file = spill_file if spill_file is not None else (settings.session_spill_file
+                                                                if settings.session_spill else "")
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._spill = None
+        if spill_file:
+            Path(spill_file).parent.mkdir(parents=True, exist_ok=True)
+            self._spill_file = spill_file
+            self._spill = dbm.open(spill_file, 'c')
+            self._compact_spill()
+        self.stats = {'started': 0, 'expired': 0, 'evicted': 0, 'spilled': 0, 'restored': 0}
+    
+    def get(self, chat_id: str) -> Optional[Session]:
+        """The chat's live session (refreshing its TTL), or None"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(chat_id)
+            if session is None and self._spill is not None:
+                session = self._restore(chat_id)
+            if session is None:
+                return None
+            if session.expires_at <= now:
+                del self._sessions[chat_id]
+                self.stats['expired'] += 1
+                return None
+            session.expires_at = now + self.ttl
+            self._sessions.move_to_end(chat_id)
+            return session
+    
+    def start(self, chat_id: str, command: str, step: str, **data) -> Session:
+        """Begin a dialog, replacing any the chat was in"""
+        session = Session(command, step)
+        for key, value in data.items():
+            session.set(key, value)
+        session.expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            # Expired sessions go first, so the cap only ever evicts live ones
+            self._sweep(time.monotonic())
+            self._sessions[chat_id] = session
+            self._sessions.move_to_end(chat_id)
+            self.stats['started'] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._evict()
+        return session
+    
+    def end(self, chat_id: str) -> bool:
+        with self._lock:
+            found = self._sessions.pop(chat_id, None) is not None
+            if self._spill is not None and self._spill.get(chat_id):
+                self._spill[chat_id] = b""
+                found = True
+            return found
+    
+    def _evict(self):
+        chat_id, session = self._sessions.popitem(last=False)
+        if self._spill is not None and session.expires_at > time.monotonic():
+            self._spill[chat_id] = self._to_disk(session)
+            self.stats['spilled'] += 1
+        else:
+            self.stats['evicted'] += 1
+    
+    # Spilled sessions carry wall-clock expiry, since monotonic time restarts with the process.
+    # Taken-back entries are blanked rather than deleted: some dbm backends (dbm.dumb) rewrite
+    # their whole index on every delete, so deleting only happens when the file is compacted.
+    
+    def _to_disk(self, session: Session) -> str:
+        remaining = session.expires_at - time.monotonic()
+        return Session(session.command, session.step, session.data, time.time() + remaining).to_json()
+    
+    def _restore(self, chat_id: str) -> Optional[Session]:
+        raw = self._spill.get(chat_id)
+        if not raw:
+            return None
+        self._spill[chat_id] = b""
+        session = Session.from_json(raw)
+        session.expires_at = time.monotonic() + (session.expires_at - time.time())
+        self._sessions[chat_id] = session
+        self.stats['restored'] += 1
+        while len(self._sessions) > self.max_sessions:
+            self._evict()
+        return session
+    
+    def _sweep(self, now: float) -> int:
+        removed = 0
+        while self._sessions:
+            chat_id, session = next(iter(self._sessions.items()))
+            if session.expires_at > now:
+                break
+            del self._sessions[chat_id]
+            removed += 1
+        self.stats['expired'] += removed
+        return removed
+    
+    def sweep(self) -> int:
+        """Drop expired sessions; only touches the ones it removes"""
+        with self._lock:
+            return self._sweep(time.monotonic())
+    
+    def _compact_spill(self):
+        """Rewrite the spill file keeping only live sessions (drops blanked and expired entries)"""
+        now = time.time()
+        live = {}
+        for key in self._spill.keys():
+            try:
+                raw = self._spill[key]
+                if raw and Session.from_json(raw).expires_at > now:
+                    live[key] = raw
+            except (ValueError, TypeError):
+                pass
+        self._spill.close()
+        self._spill = dbm.open(self._spill_file, 'n')
+        for key, raw in live.items():
+            self._spill[key] = raw
+        if live:
+            logger.info(f"Restored {len(live)} spilled dialog sessions")
+    
+    def close(self):
+        """Spill live sessions (when spilling) and close the spill file"""
+        if self._spill is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            for chat_id, session in self._sessions.items():
+                if session.expires_at > now:
+                    self._spill[chat_id] = self._to_disk(session)
+            self._sessions.clear()
+            self._spill.close()
+            self._spill = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'active': len(self._sessions), 'max_sessions': self.max_sessions,
+                    'spill': self._spill is not None}
+
+# Global session store instance
+session_store = SessionStore()
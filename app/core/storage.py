@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import atexit
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.config.settings import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+def _fsync_dir(path: Path):
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(path, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def atomic_write(path: Path, payload: bytes):
+    """Replace a file with payload (temp file + fsync + rename), serialised across processes by a lock file"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(path.with_name(path.name + ".lock"), 'w') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(path.parent)
+
+class JsonStore:
+    """Write-behind JSON file with group commit.
+    
+    Mutations only mark the store dirty. A background flusher coalesces
+    them into one atomic write (temp file + fsync + rename) once the
+    flush window elapses, ``max_pending`` mutations pile up, or a caller
+    asks for durability.
+    """
+    
+    def __init__(self, path: str, snapshot: Callable[[], Any],
+                 flush_interval: float = None, max_pending: int = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.snapshot = snapshot
+        self.flush_interval = settings.persist_flush_interval if flush_interval is None else flush_interval
+        self.max_pending = settings.persist_max_pending if max_pending is None else max_pending
+        
+        self.version = 0          # bumped by every mutation
+        self.flushed_version = 0  # last version known to be on disk
+        self.stats = {'mutations': 0, 'flushes': 0, 'bytes_written': 0}
+        self.last_error: Optional[str] = None  # set while writes are failing
+        
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._batch_depth = 0
+        self._flush_requested = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.group: Optional["CommitGroup"] = None  # set by CommitGroup.join
+        # Scripts exit without a shutdown event; don't drop the last window
+        atexit.register(self.close)
+    
+    def load(self, default: Any) -> Any:
+        """Read the file, returning default when it is missing or unreadable"""
+        try:
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading {self.path}: {e}")
+        return default
+    
+    def mark_dirty(self):
+        """Record a mutation; the write happens later on the flusher thread"""
+        with self._cond:
+            self.version += 1
+            self.stats['mutations'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"flush-{self.path.name}", daemon=True)
+                self._thread.start()
+            if not self._batch_depth:
+                self._cond.notify_all()
+    
+    @contextmanager
+    def batch(self):
+        """Hold back flushes until the batch is done, unless durability is requested"""
+        with self._cond:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._batch_depth -= 1
+                self._cond.notify_all()
+    
+    def _pending(self) -> int:
+        return self.version - self.flushed_version
+    
+    def _run(self):
+        """Flusher loop: wait for dirt, let the window fill, then write once"""
+        while True:
+            with self._cond:
+                while not self._pending() and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending():
+                    return
+                deadline = time.monotonic() + self.flush_interval
+                while not (self._flush_requested or self._closed):
+                    if self._batch_depth:
+                        # A batch lands as one flush; its end wakes us up
+                        self._cond.wait()
+                        continue
+                    if self._pending() >= self.max_pending:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._flush_requested = False
+            if not self.flush() and self._pending():
+                # The write failed; back off instead of spinning
+                time.sleep(max(self.flush_interval, 0.5))
+    
+    def flush(self) -> bool:
+        """Write the current state to disk now if anything changed"""
+        if self.group is not None:
+            return self.group.flush()
+        with self._write_lock:
+            with self._cond:
+                target = self.version
+                if target == self.flushed_version:
+                    return False
+            try:
+                self._write(self._serialize())
+            except Exception as e:
+                logger.error(f"Error saving {self.path}: {e}")
+                self.last_error = str(e)
+                return False
+            self._flushed(target)
+            return True
+    
+    def _flushed(self, target: int):
+        self.last_error = None
+        with self._cond:
+            self.flushed_version = max(self.flushed_version, target)
+            self._cond.notify_all()
+    
+    def _serialize(self) -> bytes:
+        # Another thread may mutate a dict mid-dump; retry on a fresh snapshot
+        for attempt in range(3):
+            try:
+                return json.dumps(self.snapshot(), indent=2, ensure_ascii=False).encode('utf-8')
+            except RuntimeError:
+                if attempt == 2:
+                    raise
+        return b""
+    
+    def _write(self, payload: bytes):
+        """Atomically replace the file"""
+        atomic_write(self.path, payload)
+        self.stats['flushes'] += 1
+        self.stats['bytes_written'] += len(payload)
+    
+    def wait_durable(self, timeout: float = None) -> bool:
+        """Block until every mutation made so far is on disk"""
+        with self._cond:
+            target = self.version
+            if self.flushed_version >= target:
+                return True
+            if self._thread is not None and not self._closed:
+                # Ask the flusher to write now; later mutations join the next flush
+                self._flush_requested = True
+                self._cond.notify_all()
+                return self._cond.wait_for(lambda: self.flushed_version >= target, timeout)
+        self.flush()
+        return self.flushed_version >= target
+    
+    async def durable(self, timeout: float = None) -> bool:
+        """Await durability without blocking the event loop"""
+        if self.flushed_version >= self.version:
+            return True
+        return await asyncio.to_thread(self.wait_durable, timeout)
+    
+    def close(self):
+        """Flush outstanding changes and stop the flusher thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Mutation/flush counters; mutations per flush is the coalescing factor"""
+        flushes = self.stats['flushes']
+        return {
+            **self.stats,
+            'pending': self._pending(),
+            'last_error': self.last_error,
+            'mutations_per_flush': round(self.stats['mutations'] / flushes, 2) if flushes else 0.0
+        }
+
+class CommitGroup:
+    """Stores whose changes reach disk together.
+    
+    A flush of any member writes every dirty member. When that is more
+    than one file, all payloads first go to one journal (written
+    atomically), then each file is replaced and the journal removed. A
+    crash in between is finished from the journal on the next start,
+    before any store loads, so e.g. a reply in the outbox and the todo
+    change it reports are either both on disk or neither is.
+    """
+    
+    def __init__(self, journal: str):
+        self.journal = Path(journal)
+        self.stores: List[JsonStore] = []
+        self.stats = {'flushes': 0, 'journaled': 0, 'recovered': 0}
+        self._lock = threading.Lock()
+        self.recover()
+    
+    def join(self, store: JsonStore):
+        """Make the store flush with the group from now on"""
+        with self._lock:
+            if store.group is None:
+                store.group = self
+                self.stores.append(store)
+    
+    def recover(self):
+        """Finish a journaled flush that a crash interrupted"""
+        if not self.journal.exists():
+            return
+        try:
+            data = self.journal.read_bytes()
+            header, offset = data.split(b"\n", 1)[0], data.index(b"\n") + 1
+            for path, size in json.loads(header):
+                atomic_write(Path(path), data[offset:offset + size])
+                offset += size
+            self.journal.unlink()
+            self.stats['recovered'] += 1
+            logger.info(f"Finished an interrupted commit from {self.journal}")
+        except Exception as e:
+            # Left in place; the group's next flush writes a fresh journal over it
+            logger.error(f"Error recovering {self.journal}: {e}")
+    
+    def _write_journal(self, files: List[Tuple[Path, bytes]]):
+        self.journal.parent.mkdir(parents=True, exist_ok=True)
+        header = json.dumps([[str(path), len(payload)] for path, payload in files]).encode('utf-8')
+        atomic_write(self.journal, b"\n".join([header, b"".join(payload for _, payload in files)]))
+        self.stats['journaled'] += 1
+    
+    def flush(self) -> bool:
+        """Write every member with unflushed changes, all or nothing"""
+        with self._lock:
+            dirty = []
+            for store in self.stores:
+                with store._cond:
+                    if store.version != store.flushed_version:
+                        dirty.append((store, store.version))
+            if not dirty:
+                return False
+            try:
+                files = [(store, store._serialize()) for store, _ in dirty]
+                # A journal left by a failed flush covers stores that are still dirty; supersede it
+                journaled = len(files) > 1 or self.journal.exists()
+                if journaled:
+                    self._write_journal([(store.path, payload) for store, payload in files])
+                for store, payload in files:
+                    store._write(payload)
+                if journaled:
+                    self.journal.unlink()
+                    _fsync_dir(self.journal.parent)
+            except Exception as e:
+                logger.error(f"Error saving {', '.join(str(store.path) for store, _ in dirty)}: {e}")
+                for store, _ in dirty:
+                    store.last_error = str(e)
+                return False
+            self.stats['flushes'] += 1
+            for store, target in dirty:
+                store._flushed(target)
+            return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'stores': [store.path.name for store in self.stores]}
+
+# Stores the message pipeline commits together with its replies; recovered before any store loads
+commit_group = CommitGroup("data/commit.journal")
@@ -1,144 +1,151 @@
-import requests
-import json
+import os
 import logging
-from typing import Dict, Any, Optional
+import requests
+from typing import Dict, Any, Iterator, Optional
 from app.config.settings import settings
+from app.core.transport import Transport, InboundMessage, message_type_of
+from app.core.chat_ids import chat_id_for
 
 logger = logging.getLogger(__name__)
 
-class TelegramClient:
+class TelegramClient(Transport):
+    name = "telegram"
+    
     def __init__(self):
+        # Keep-alive connection pool shared by all requests (and broadcast workers)
+        super().__init__()
         self.bot_token = settings.telegram_bot_token
         self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
-        
+    
     def send_text_message(self, chat_id: str, message: str) -> Dict[str, Any]:
         """Send a text message via Telegram Bot API"""
-        url = f"{self.base_url}/sendMessage"
-        
         data = {
             "chat_id": chat_id,
             "text": message,
             "parse_mode": "HTML"  # Support basic HTML formatting
         }
-        
-        try:
-            response = requests.post(url, json=data)
-            response.raise_for_status()
-            logger.info(f"Message sent successfully to chat {chat_id}")
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send message: {e}")
-            return {"error": str(e)}
+        return self._request("post", f"{self.base_url}/sendMessage",
+                             f"Message sent successfully to chat {chat_id}", "send message", json=data)
     
     def send_media_message(self, chat_id: str, media_url: str, media_type: str = "photo") -> Dict[str, Any]:
         """Send a media message via Telegram Bot API"""
-        url = f"{self.base_url}/send{media_type.capitalize()}"
-        
         data = {
             "chat_id": chat_id,
             media_type: media_url
         }
-        
-        try:
-            response = requests.post(url, json=data)
-            response.raise_for_status()
-            logger.info(f"Media message sent successfully to chat {chat_id}")
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send media message: {e}")
-            return {"error": str(e)}
+        return self._request("post", f"{self.base_url}/send{media_type.capitalize()}",
+                             f"Media message sent successfully to chat {chat_id}", "send media message", json=data)
     
     def send_document(self, chat_id: str, document_url: str, caption: str = "") -> Dict[str, Any]:
         """Send a document via Telegram Bot API"""
-        url = f"{self.base_url}/sendDocument"
-        
         data = {
             "chat_id": chat_id,
             "document": document_url,
             "caption": caption
         }
-        
+        return self._request("post", f"{self.base_url}/sendDocument",
+                             f"Document sent successfully to chat {chat_id}", "send document", json=data)
+    
+    def send_document_file(self, chat_id: str, path: str, caption: str = "") -> Dict[str, Any]:
+        """Upload a local file as a document via Telegram Bot API"""
+        data = {
+            "chat_id": chat_id,
+            "caption": caption
+        }
         try:
-            response = requests.post(url, json=data)
-            response.raise_for_status()
-            logger.info(f"Document sent successfully to chat {chat_id}")
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send document: {e}")
+            with open(path, 'rb') as document:
+                return self._request("post", f"{self.base_url}/sendDocument",
+                                     f"Document {path} uploaded to chat {chat_id}", "upload document",
+                                     data=data, files={"document": document})
+        except OSError as e:
+            logger.error(f"Failed to read document {path}: {e}")
             return {"error": str(e)}
     
-    def get_me(self) -> Dict[str, Any]:
-        """Get bot information"""
-        url = f"{self.base_url}/getMe"
-        
+    def get_file(self, file_id: str) -> Dict[str, Any]:
+        """Look up a file's download path via Telegram Bot API"""
+        return self._request("get", f"{self.base_url}/getFile", "", "get file", params={"file_id": file_id})
+    
+    def download_file(self, file_id: str, dest: str, chunk_size: int = 64 * 1024) -> Dict[str, Any]:
+        """Stream a file sent to the bot to dest (via dest.part, so dest is never half written)"""
+        info = self.get_file(file_id)
+        if "error" in info:
+            return info
+        url = f"https://api.telegram.org/file/bot{self.bot_token}/{info['result']['file_path']}"
+        part = f"{dest}.part"
+        written = 0
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
+            with self.session.get(url, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                with open(part, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+                        written += len(chunk)
+            os.replace(part, dest)
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to get bot info: {e}")
+            logger.error(f"Failed to download file {file_id}: {e}")
+            return self._error_result(e)
+        except OSError as e:
+            logger.error(f"Failed to save file {file_id} to {dest}: {e}")
             return {"error": str(e)}
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+        return {"ok": True, "path": dest, "bytes": written}
+    
+    def get_me(self) -> Dict[str, Any]:
+        """Get bot information"""
+        return self._request("get", f"{self.base_url}/getMe", "", "get bot info")
     
     def set_webhook(self, webhook_url: str) -> Dict[str, Any]:
         """Set webhook URL for the bot"""
-        url = f"{self.base_url}/setWebhook"
-        
         data = {
             "url": webhook_url
         }
-        
-        try:
-            response = requests.post(url, json=data)
-            response.raise_for_status()
-            logger.info(f"Webhook set successfully: {webhook_url}")
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to set webhook: {e}")
-            return {"error": str(e)}
+        return self._request("post", f"{self.base_url}/setWebhook",
+                             f"Webhook set successfully: {webhook_url}", "set webhook", json=data)
     
     def delete_webhook(self) -> Dict[str, Any]:
         """Delete webhook for the bot"""
-        url = f"{self.base_url}/deleteWebhook"
+        return self._request("post", f"{self.base_url}/deleteWebhook",
+                             "Webhook deleted successfully", "delete webhook")
+    
+    def iter_webhook_messages(self, data: Dict[str, Any]) -> Iterator[InboundMessage]:
+        """Yield the message in a Telegram update (updates carry at most one)"""
+        message = data.get("message")
+        if not message:
+            return
+        chat = message.get("chat", {})
+        from_user = message.get("from", {})
         
-        try:
-            response = requests.post(url)
-            response.raise_for_status()
-            logger.info("Webhook deleted successfully")
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to delete webhook: {e}")
-            return {"error": str(e)}
+        # Extract message content
+        text = message.get("text", "")
+        voice = message.get("voice")
+        document = message.get("document")
+        photo = message.get("photo")
+        message_id = message.get("message_id")
+        
+        yield InboundMessage(
+            channel=self.name,
+            chat_id=chat_id_for(self.name, chat.get("id")),
+            text=text,
+            message_type=message_type_of(text, voice, document, photo),
+            message_id=str(message_id) if message_id is not None else None,
+            user_id=str(from_user.get("id")),
+            username=from_user.get("username", ""),
+            first_name=from_user.get("first_name", ""),
+            last_name=from_user.get("last_name", ""),
+            timestamp=message.get("date"),
+            voice=voice,
+            document=document,
+            photo=photo
+        )
     
     def process_webhook_message(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Process incoming webhook messages from Telegram"""
         try:
-            if "message" not in data:
-                return None
-            
-            message = data["message"]
-            chat = message.get("chat", {})
-            from_user = message.get("from", {})
-            
-            # Extract message content
-            text = message.get("text", "")
-            voice = message.get("voice")
-            document = message.get("document")
-            photo = message.get("photo")
-            
-            return {
-                "chat_id": str(chat.get("id")),
-                "user_id": str(from_user.get("id")),
-                "username": from_user.get("username", ""),
-                "first_name": from_user.get("first_name", ""),
-                "last_name": from_user.get("last_name", ""),
-                "timestamp": message.get("date"),
-                "text": text,
-                "voice": voice,
-                "document": document,
-                "photo": photo,
-                "message_type": "text" if text else "voice" if voice else "document" if document else "photo" if photo else "unknown"
-            }
-        except (KeyError, IndexError) as e:
+            message = next(self.iter_webhook_messages(data), None)
+            return message._asdict() if message else None
+        except (AttributeError, TypeError) as e:
             logger.error(f"Error processing webhook message: {e}")
         
         return None
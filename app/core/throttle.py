@@ -0,0 +1,116 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+from app.config.settings import settings
+from app.core.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+SLOW_DOWN_REPLY = "🐢 Slow down a little — try again in a few seconds."
+BUSY_REPLY = "🐢 I'm busy right now — please retry that in a minute."
+# Tell a chat it is throttled at most this often; further messages are dropped quietly
+NOTICE_INTERVAL = 30.0
+
+class CommandThrottle:
+    """Per-chat and per-command token buckets plus global load shedding.
+    
+    Buckets live in a bounded LRU, so memory stays flat no matter how many
+    distinct chats write in; an evicted bucket just starts full again.
+    """
+    
+    def __init__(self, max_buckets: int = None):
+        self.max_buckets = max_buckets or settings.throttle_max_buckets
+        self.expensive = {name.strip().lower() for name in settings.throttle_expensive_commands.split(",") if name.strip()}
+        self._buckets: "OrderedDict[Tuple[str, str], RateLimiter]" = OrderedDict()
+        self._noticed: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency_ms = 0.0  # moving average of handle_message time
+        self.stats = {'admitted': 0, 'throttled': 0, 'shed': 0, 'evicted': 0}
+    
+    def _bucket(self, chat_id: str, key: str) -> RateLimiter:
+        """Get (or create) a bucket, keeping the LRU within max_buckets"""
+        bucket = self._buckets.get((chat_id, key))
+        if bucket is not None:
+            self._buckets.move_to_end((chat_id, key))
+            return bucket
+        if key == "*":
+            bucket = RateLimiter(settings.throttle_chat_rate, settings.throttle_chat_burst)
+        else:
+            bucket = RateLimiter(settings.throttle_expensive_rate, settings.throttle_expensive_burst)
+        self._buckets[(chat_id, key)] = bucket
+        if len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+            self.stats['evicted'] += 1
+        return bucket
+    
+    def overloaded(self) -> bool:
+        """Whether the queue depth or recent latency calls for shedding"""
+        return self.in_flight >= settings.shed_queue_depth or self.latency_ms >= settings.shed_latency_ms
+    
+    def _notice(self, chat_id: str, reply: str) -> Optional[str]:
+        """The reply for a rejected message, or None if the chat was told recently"""
+        now = time.monotonic()
+        last = self._noticed.get(chat_id)
+        if last is not None and now - last < NOTICE_INTERVAL:
+            return None
+        self._noticed[chat_id] = now
+        self._noticed.move_to_end(chat_id)
+        if len(self._noticed) > self.max_buckets:
+            self._noticed.popitem(last=False)
+        return reply
+    
+    def admit(self, chat_id: str, commands: Iterable[str]) -> Tuple[bool, Optional[str]]:
+        """Decide whether to run a message's commands.
+        
+        Returns (admitted, reply). A rejected message gets a cheap reply
+        to send instead, or None when it should be dropped silently.
+        """
+        expensive = [name for name in dict.fromkeys(c.lower() for c in commands) if name in self.expensive]
+        with self._lock:
+            if expensive and self.overloaded():
+                # Shed costly work first; cheap commands keep flowing
+                self.stats['shed'] += 1
+                logger.warning(f"Shedding {expensive} for chat {chat_id} (in flight {self.in_flight}, "
+                               f"latency {self.latency_ms:.0f} ms)")
+                return False, self._notice(chat_id, BUSY_REPLY)
+            
+            if not self._bucket(chat_id, "*").try_acquire():
+                self.stats['throttled'] += 1
+                return False, self._notice(chat_id, SLOW_DOWN_REPLY)
+            for name in expensive:
+                if not self._bucket(chat_id, name).try_acquire():
+                    self.stats['throttled'] += 1
+                    return False, self._notice(chat_id, f"🐢 Too many '{name}' commands — try again later.")
+            
+            self.stats['admitted'] += 1
+            return True, None
+    
+    @contextmanager
+    def track(self):
+        """Count a message as in flight and fold its duration into the latency average"""
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.in_flight -= 1
+                self.latency_ms += 0.2 * (elapsed_ms - self.latency_ms)
+    
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                **self.stats,
+                'buckets': len(self._buckets),
+                'in_flight': self.in_flight,
+                'latency_ms': round(self.latency_ms, 1)
+            }
+
+# Global command throttle instance
+command_throttle = CommandThrottle()
@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, NamedTuple, Optional
+import requests
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Durations kept per span name for the percentiles in get_stats
+LATENCY_SAMPLES = 1024
+
+class SpanContext(NamedTuple):
+    """Where a span sits in a trace; enough to continue the trace elsewhere"""
+    trace_id: str
+    span_id: str
+
+class Span:
+    """One timed stage of a trace"""
+    
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start', 'duration_ms', 'attributes', 'error')
+    
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration_ms = 0.0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+    
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+    
+    @property
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': round(self.duration_ms, 3),
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+def current_trace_id() -> str:
+    span = _current.get()
+    return span.trace_id if span is not None else "-"
+
+class TraceLogFilter(logging.Filter):
+    """Adds %(trace_id)s to log records (install on handlers)"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id()
+        return True
+
+class FileExporter:
+    """Append finished spans as JSON lines, rolling over to <file>.1 at max_bytes"""
+    
+    def __init__(self, path: str, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+    
+    def export(self, spans: List[Span]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size >= self.max_bytes:
+            self.path.replace(self.path.with_name(self.path.name + ".1"))
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+
+class OtlpExporter:
+    """POST spans to an OTLP/HTTP collector as JSON (e.g. http://localhost:4318/v1/traces)"""
+    
+    def __init__(self, endpoint: str, service_name: str):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.session = requests.Session()
+    
+    def _attribute(self, key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+    
+    def _span(self, span: Span) -> Dict[str, Any]:
+        start_ns = int(span.start * 1e9)
+        return {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'parentSpanId': span.parent_id or "",
+            'name': span.name,
+            'kind': 1,  # internal
+            'startTimeUnixNano': str(start_ns),
+            'endTimeUnixNano': str(start_ns + int(span.duration_ms * 1e6)),
+            'attributes': [self._attribute(k, v) for k, v in span.attributes.items() if v is not None],
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+        }
+    
+    def export(self, spans: List[Span]):
+        body = {'resourceSpans': [{
+            'resource': {'attributes': [self._attribute('service.name', self.service_name)]},
+            'scopeSpans': [{'scope': {'name': 'app'}, 'spans': [self._span(span) for span in spans]}]
+        }]}
+        response = self.session.post(self.endpoint, json=body, timeout=10)
+        response.raise_for_status()
+
+def make_exporter(kind: str):
+    """Exporter for TRACE_EXPORT: "file", "otlp" or "" (keep spans in-process only)"""
+    if kind == "file":
+        return FileExporter(settings.trace_file, int(settings.trace_max_file_mb * 1024 * 1024))
+    if kind == "otlp":
+        return OtlpExporter(settings.trace_otlp_endpoint, settings.trace_service_name)
+    return None
+
+class Tracer:
+    """Lightweight spans carried in a context variable.
+    
+    `span()` opens a child of the current span (or a new trace), so the
+    trace id follows the code through calls and awaits, and into log lines
+    via TraceLogFilter. Threads and executors don't inherit context
+    variables: hand them `wrap(fn)`, or keep `current()` and pass it as
+    `parent=` when the work runs later (reminders, queued sends).
+    
+    Finished spans feed per-stage latency percentiles and, when an exporter
+    is configured, a bounded queue drained in batches by a background
+    thread; a full queue drops spans rather than slow the request.
+    """
+    
+    def __init__(self, exporter=None, batch_size: int = 256, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.running = False
+        self.stats = {'spans': 0, 'exported': 0, 'dropped': 0, 'export_errors': 0}
+    
+    @contextmanager
+    def span(self, name: str, parent: Optional[SpanContext] = None, new_trace: bool = True,
+             **attributes) -> Iterator[Optional[Span]]:
+        """Time a stage. With new_trace=False and no current span, nothing is recorded (yields None)."""
+        if parent is None:
+            current = _current.get()
+            parent = current.context if current is not None else None
+        if parent is None and not new_trace:
+            yield None
+            return
+        span = Span(name, parent.trace_id if parent else os.urandom(16).hex(),
+                    parent.span_id if parent else None, attributes)
+        token = _current.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - start) * 1000
+            _current.reset(token)
+            self._record(span)
+    
+    def current(self) -> Optional[SpanContext]:
+        """Context of the current span, to continue the trace on another thread later"""
+        span = _current.get()
+        return span.context if span is not None else None
+    
+    def wrap(self, fn: Callable) -> Callable:
+        """Bind fn to the caller's context (for Thread targets and executor.submit)"""
+        context = contextvars.copy_context()
+        
+        def run(*args, **kwargs):
+            # A Context can only be entered by one thread at a time; copy per call
+            return context.copy().run(fn, *args, **kwargs)
+        return run
+    
+    def _record(self, span: Span):
+        with self._lock:
+            self.stats['spans'] += 1
+            samples = self._latencies.get(span.name)
+            if samples is None:
+                samples = self._latencies[span.name] = deque(maxlen=LATENCY_SAMPLES)
+            samples.append(span.duration_ms)
+            self._counts[span.name] = self._counts.get(span.name, 0) + 1
+        if self.exporter is None:
+            return
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return
+        if self._thread is None:
+            self.start()
+    
+    def start(self):
+        """Start the export thread (started on the first exported span)"""
+        with self._lock:
+            if self._thread is None and self.exporter is not None:
+                self.running = True
+                self._thread = threading.Thread(target=self._run, daemon=True, name="trace-export")
+                self._thread.start()
+    
+    def stop(self):
+        """Export whatever is still queued"""
+        self.running = False
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+    
+    def _run(self):
+        while self.running:
+            time.sleep(self.flush_interval)
+            self.flush()
+    
+    def flush(self):
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            try:
+                self.exporter.export(batch)
+                self.stats['exported'] += len(batch)
+            except Exception as e:
+                self.stats['export_errors'] += 1
+                logger.error(f"Failed to export {len(batch)} spans: {e}")
+                return
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Span counters and per-stage latency percentiles (over the last LATENCY_SAMPLES of each)"""
+        with self._lock:
+            stages = {}
+            for name, samples in self._latencies.items():
+                ordered = sorted(samples)
+                pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+                stages[name] = {'count': self._counts[name], 'p50_ms': pick(0.5), 'p95_ms': pick(0.95),
+                                'p99_ms': pick(0.99), 'max_ms': round(ordered[-1], 2)}
+            return {**self.stats, 'queued': self._queue.qsize(), 'stages': stages}
+
+# Global tracer instance
+tracer = Tracer(make_exporter(settings.trace_export))
@@ -0,0 +1,110 @@
+import time
+import logging
+import threading
+import requests
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+class InboundMessage(NamedTuple):
+    """A received chat message, the same shape whichever channel it came in on"""
+    channel: str
+    chat_id: str
+    text: str = ""
+    message_type: str = "unknown"  # text, voice, document, photo or unknown
+    message_id: Optional[str] = None
+    user_id: Optional[str] = None
+    username: str = ""
+    first_name: str = ""
+    last_name: str = ""
+    timestamp: Optional[int] = None
+    voice: Optional[Dict[str, Any]] = None
+    document: Optional[Dict[str, Any]] = None
+    photo: Optional[Any] = None
+
+def message_type_of(text: str, voice: Any, document: Any, photo: Any) -> str:
+    return "text" if text else "voice" if voice else "document" if document else "photo" if photo else "unknown"
+
+class Transport:
+    """Base for chat channels (Telegram, WhatsApp).
+    
+    Owns the pooled keep-alive session and turns every HTTP call into
+    either the decoded JSON body or a uniform error dict, counting sends
+    and their latency once for all channels. Subclasses implement the
+    outbound interface (send_text_message, send_document_file) and parse
+    webhook bodies into InboundMessage.
+    """
+    name = ""
+    
+    def __init__(self, pool_maxsize: int = 32):
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.stats = {'requests': 0, 'errors': 0, 'request_ms': 0.0}
+        self._stats_lock = threading.Lock()
+    
+    def _error_result(self, e: requests.exceptions.RequestException) -> Dict[str, Any]:
+        """Build an error dict, keeping the API's error code, description and retry hint"""
+        result = {"error": str(e)}
+        response = getattr(e, "response", None)
+        if response is not None:
+            result["status_code"] = response.status_code
+            try:
+                body = response.json()
+                error = body.get("error")
+                if isinstance(error, dict):  # Graph API style
+                    result["description"] = error.get("message", "")
+                else:
+                    result["description"] = body.get("description", "")
+                retry_after = body.get("parameters", {}).get("retry_after")
+                if retry_after:
+                    result["retry_after"] = retry_after
+            except ValueError:
+                pass
+            if "retry_after" not in result and response.headers.get("Retry-After", "").isdigit():
+                result["retry_after"] = int(response.headers["Retry-After"])
+        return result
+    
+    def _request(self, method: str, url: str, success: str, action: str, **kwargs) -> Dict[str, Any]:
+        """Make an API call; logs `success` or "Failed to <action>" and never raises"""
+        start = time.perf_counter()
+        with tracer.span(f"http.{self.name}", new_trace=False, action=action) as span:
+            try:
+                response = self.session.request(method, url, **kwargs)
+                response.raise_for_status()
+                if success:
+                    logger.info(success)
+                result = response.json()
+                failed = False
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Failed to {action}: {e}")
+                result = self._error_result(e)
+                failed = True
+            if span is not None:
+                span.set(status_code=result.get("status_code") if failed else response.status_code, failed=failed)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats['errors'] += failed
+            self.stats['request_ms'] += elapsed_ms
+        return result
+    
+    def send_text_message(self, chat_id: str, message: str) -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    def send_document_file(self, chat_id: str, path: str, caption: str = "") -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    def iter_webhook_messages(self, data: Dict[str, Any]) -> Iterator[InboundMessage]:
+        raise NotImplementedError
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            requests_made = self.stats['requests']
+            return {
+                'requests': requests_made,
+                'errors': self.stats['errors'],
+                'avg_request_ms': round(self.stats['request_ms'] / requests_made, 1) if requests_made else 0.0
+            }
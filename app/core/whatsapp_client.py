@@ -1,66 +1,59 @@
-import requests
-import json
+import hmac
+import hashlib
 import logging
-from typing import Dict, Any, Optional
+import mimetypes
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional
 from app.config.settings import settings
+from app.core.transport import Transport, InboundMessage, message_type_of
+from app.core.chat_ids import chat_id_for
 
 logger = logging.getLogger(__name__)
 
-class WhatsAppClient:
+class WhatsAppClient(Transport):
+    name = "whatsapp"
+    
     def __init__(self):
+        # Keep-alive connection pool shared by all sends, with the auth header preset
+        super().__init__()
         self.access_token = settings.whatsapp_access_token
         self.phone_number_id = settings.whatsapp_phone_number_id
         self.base_url = "https://graph.facebook.com/v18.0"
-        
+        self.session.headers.update({"Authorization": f"Bearer {self.access_token}"})
+    
+    def _send(self, to: str, payload: Dict[str, Any], success: str, action: str) -> Dict[str, Any]:
+        data = {"messaging_product": "whatsapp", "to": to, **payload}
+        return self._request("post", f"{self.base_url}/{self.phone_number_id}/messages", success, action, json=data)
+    
     def send_text_message(self, to: str, message: str) -> Dict[str, Any]:
         """Send a text message via WhatsApp Business API"""
-        url = f"{self.base_url}/{self.phone_number_id}/messages"
-        
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "messaging_product": "whatsapp",
-            "to": to,
-            "type": "text",
-            "text": {"body": message}
-        }
-        
-        try:
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            logger.info(f"Message sent successfully to {to}")
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send message: {e}")
-            return {"error": str(e)}
+        return self._send(to, {"type": "text", "text": {"body": message}},
+                          f"Message sent successfully to {to}", "send message")
     
     def send_media_message(self, to: str, media_url: str, media_type: str = "image") -> Dict[str, Any]:
         """Send a media message via WhatsApp Business API"""
-        url = f"{self.base_url}/{self.phone_number_id}/messages"
-        
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "messaging_product": "whatsapp",
-            "to": to,
-            "type": media_type,
-            media_type: {"link": media_url}
-        }
-        
+        return self._send(to, {"type": media_type, media_type: {"link": media_url}},
+                          f"Media message sent successfully to {to}", "send media message")
+    
+    def send_document_file(self, to: str, path: str, caption: str = "") -> Dict[str, Any]:
+        """Upload a local file to WhatsApp's media store, then send it as a document"""
+        mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
         try:
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            logger.info(f"Media message sent successfully to {to}")
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send media message: {e}")
+            with open(path, 'rb') as document:
+                uploaded = self._request("post", f"{self.base_url}/{self.phone_number_id}/media",
+                                         "", "upload media",
+                                         data={"messaging_product": "whatsapp", "type": mime_type},
+                                         files={"file": (Path(path).name, document, mime_type)})
+        except OSError as e:
+            logger.error(f"Failed to read document {path}: {e}")
             return {"error": str(e)}
+        if "error" in uploaded:
+            return uploaded
+        return self._send(to, {"type": "document", "document": {
+            "id": uploaded["id"],
+            "filename": Path(path).name,
+            "caption": caption
+        }}, f"Document {path} sent to {to}", "send document")
     
     def verify_webhook(self, mode: str, token: str, challenge: str) -> Optional[str]:
         """Verify webhook for WhatsApp Business API"""
@@ -69,24 +62,70 @@ class WhatsAppClient:
             return challenge
         return None
     
+    def verify_signature(self, body: bytes, signature: Optional[str]) -> bool:
+        """Check X-Hub-Signature-256 (HMAC-SHA256 of the raw body with the app secret)"""
+        if not settings.whatsapp_app_secret:
+            logger.error("WHATSAPP_APP_SECRET is not set; rejecting WhatsApp webhook")
+            return False
+        expected = "sha256=" + hmac.new(settings.whatsapp_app_secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature or "")
+    
+    def _message_text(self, message: Dict[str, Any]) -> str:
+        """Text of a message, including quick-reply buttons and interactive replies"""
+        kind = message.get("type")
+        if kind == "text":
+            return message.get("text", {}).get("body", "")
+        if kind == "button":
+            return message.get("button", {}).get("text", "")
+        if kind == "interactive":
+            interactive = message.get("interactive", {})
+            reply = interactive.get("button_reply") or interactive.get("list_reply") or {}
+            return reply.get("title", "")
+        return ""
+    
+    def iter_webhook_messages(self, data: Dict[str, Any]) -> Iterator[InboundMessage]:
+        """Yield every message in a webhook delivery.
+        
+        Meta batches several entries, changes and messages into one POST;
+        status updates (sent/delivered/read) are skipped.
+        """
+        for entry in data.get("entry") or ():
+            for change in entry.get("changes") or ():
+                value = change.get("value") or {}
+                messages = value.get("messages")
+                if not messages:
+                    continue
+                names = {contact.get("wa_id"): contact.get("profile", {}).get("name", "")
+                         for contact in value.get("contacts") or ()}
+                for message in messages:
+                    sender = message.get("from")
+                    if not sender:
+                        continue
+                    text = self._message_text(message)
+                    voice = message.get("audio")
+                    document = message.get("document")
+                    photo = message.get("image")
+                    timestamp = message.get("timestamp")
+                    yield InboundMessage(
+                        channel=self.name,
+                        chat_id=chat_id_for(self.name, sender),
+                        text=text,
+                        message_type=message_type_of(text, voice, document, photo),
+                        message_id=message.get("id"),
+                        user_id=sender,
+                        first_name=names.get(sender, ""),
+                        timestamp=int(timestamp) if timestamp else None,
+                        voice=voice,
+                        document=document,
+                        photo=photo
+                    )
+    
     def process_webhook_message(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Process incoming webhook messages from WhatsApp"""
+        """First message of a webhook delivery; use iter_webhook_messages for all of them"""
         try:
-            entry = data.get("entry", [{}])[0]
-            changes = entry.get("changes", [{}])[0]
-            value = changes.get("value", {})
-            messages = value.get("messages", [])
-            
-            if messages:
-                message = messages[0]
-                return {
-                    "from": message.get("from"),
-                    "timestamp": message.get("timestamp"),
-                    "type": message.get("type"),
-                    "text": message.get("text", {}).get("body", ""),
-                    "media": message.get("image") or message.get("audio") or message.get("document")
-                }
-        except (KeyError, IndexError) as e:
+            message = next(self.iter_webhook_messages(data), None)
+            return message._asdict() if message else None
+        except (AttributeError, TypeError, ValueError) as e:
             logger.error(f"Error processing webhook message: {e}")
         
         return None
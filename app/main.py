@@ -1,22 +1,40 @@
 from fastapi import FastAPI, Request, Response, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 import logging
 import json
-from typing import Dict, Any
 
 from app.config.settings import settings
 from app.core.telegram_client import telegram_client
+from app.core.whatsapp_client import whatsapp_client
 from app.core.command_router import command_router
+from app.core.pipeline import message_pipeline
+from app.core.throttle import command_throttle
+from app.core.response_cache import response_cache
+from app.core.sessions import session_store
+from app.core.health import health_monitor
+from app.core.profiler import request_profiler
+from app.core.tracing import tracer, TraceLogFilter
+from app.modules.todo_manager import todo_manager
 from app.modules.reminder_scheduler import reminder_scheduler
+from app.modules.broadcast_manager import broadcast_manager
+from app.modules.mail_merge import mail_merge_manager, parse_recipients
+from app.modules.digest_manager import digest_manager
+from app.modules.meeting_manager import meeting_manager
+from app.modules.audio_recorder import audio_recorder
+from app.modules.retention import retention_manager
+from app.modules.attachments import attachment_store
 
-# Configure logging
+# Configure logging; every line carries the trace id of the update being handled ("-" outside one)
+log_handlers = [
+    logging.FileHandler('logs/whatsapp_hub.log'),
+    logging.StreamHandler()
+]
+for handler in log_handlers:
+    handler.addFilter(TraceLogFilter())
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/whatsapp_hub.log'),
-        logging.StreamHandler()
-    ]
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s',
+    handlers=log_handlers
 )
 
 logger = logging.getLogger(__name__)
@@ -27,6 +45,29 @@ app = FastAPI(
     version="1.0.0"
 )
 
+def is_admin_request(request: Request) -> bool:
+    """Whether the request carries the admin token"""
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(settings.admin_token) and token == settings.admin_token
+
+def require_admin(request: Request):
+    """Reject requests that don't carry the admin token"""
+    if not is_admin_request(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+if request_profiler.enabled:
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        """Profile requests picked by the profiler's triggers (only installed when enabled)"""
+        requested = request.headers.get("X-Profile") == "1" and is_admin_request(request)
+        session = request_profiler.begin(requested)
+        if session is None:
+            return await call_next(request)
+        try:
+            return await call_next(request)
+        finally:
+            request_profiler.end(session, f"{request.method} {request.url.path}")
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -41,51 +82,36 @@ async def verify_webhook():
     """Verify webhook for Telegram Bot API"""
     logger.info("Telegram webhook verification request")
     
-    # Get bot info to verify token
-    bot_info = telegram_client.get_me()
-    if bot_info.get("ok"):
-        logger.info("Telegram webhook verified successfully")
-        return {"status": "ok", "bot_info": bot_info.get("result", {})}
+    # Bot identity comes from the health monitor's cache, never a live getMe
+    if health_monitor.bot_info is None:
+        raise HTTPException(status_code=503, detail="Bot identity not loaded yet")
+    if health_monitor.upstream_ok:
+        return {"status": "ok", "bot_info": health_monitor.bot_info}
     
     logger.warning("Telegram webhook verification failed")
     raise HTTPException(status_code=403, detail="Verification failed")
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness from cached upstream state plus storage and scheduler status"""
+    readiness = health_monitor.readiness()
+    return JSONResponse(content=readiness, status_code=200 if readiness['ready'] else 503)
+
 @app.post("/webhook")
 async def webhook_handler(request: Request):
     """Handle incoming webhook messages from Telegram"""
     try:
         body = await request.json()
-        logger.info(f"Received Telegram webhook: {json.dumps(body, indent=2)}")
-        
-        # Process the webhook message
-        message_data = telegram_client.process_webhook_message(body)
-        
-        if message_data:
-            chat_id = message_data.get("chat_id")
-            message_text = message_data.get("text", "")
-            message_type = message_data.get("message_type")
-            username = message_data.get("username", "")
-            
-            logger.info(f"Processing message from {username} (chat_id: {chat_id}): {message_text}")
-            
-            # Handle text messages
-            if message_type == "text" and message_text:
-                response = command_router.handle_message(chat_id, message_text)
-                
-                # Send response back to Telegram
-                result = telegram_client.send_text_message(chat_id, response)
-                logger.info(f"Response sent: {result}")
+        with tracer.span("webhook", channel="telegram", update_id=body.get("update_id")):
+            logger.info(f"Received Telegram webhook: {json.dumps(body, indent=2)}")
             
-            # Handle voice messages
-            elif message_type == "voice":
-                # TODO: Implement voice message processing
-                response = "🎤 Voice message received! Processing..."
-                telegram_client.send_text_message(chat_id, response)
-            
-            # Handle other message types
-            else:
-                response = f"Received {message_type} message. Text commands are supported."
-                telegram_client.send_text_message(chat_id, response)
+            # Replies are queued; they go back over Telegram in order per chat
+            await message_pipeline.ingest(telegram_client.iter_webhook_messages(body))
         
         return JSONResponse(content={"status": "ok"})
         
@@ -96,6 +122,41 @@ async def webhook_handler(request: Request):
             status_code=500
         )
 
+@app.get("/whatsapp/webhook")
+async def verify_whatsapp_webhook(request: Request):
+    """Answer Meta's webhook verification challenge"""
+    params = request.query_params
+    challenge = whatsapp_client.verify_webhook(params.get("hub.mode"), params.get("hub.verify_token"),
+                                               params.get("hub.challenge"))
+    if challenge is None:
+        raise HTTPException(status_code=403, detail="Verification failed")
+    return PlainTextResponse(challenge)
+
+@app.post("/whatsapp/webhook")
+async def whatsapp_webhook(request: Request):
+    """Handle a WhatsApp delivery: every entry, change and message in it"""
+    # Only Meta knows the app secret; unsigned or forged deliveries never reach the pipeline
+    raw = await request.body()
+    if not whatsapp_client.verify_signature(raw, request.headers.get("X-Hub-Signature-256")):
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    try:
+        body = json.loads(raw)
+        with tracer.span("webhook", channel="whatsapp") as span:
+            messages = list(whatsapp_client.iter_webhook_messages(body))
+            span.set(messages=len(messages))
+            logger.info(f"Received WhatsApp webhook with {len(messages)} message(s)")
+            
+            await message_pipeline.ingest(messages)
+        
+        return JSONResponse(content={"status": "ok", "messages": len(messages)})
+        
+    except Exception as e:
+        logger.error(f"Error processing WhatsApp webhook: {e}")
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=500
+        )
+
 @app.get("/status")
 async def get_status():
     """Get application status and configuration"""
@@ -104,24 +165,162 @@ async def get_status():
         "telegram_configured": bool(settings.telegram_bot_token),
         "openai_configured": bool(settings.openai_api_key),
         "email_configured": bool(settings.smtp_username and settings.smtp_password),
-        "available_commands": list(command_router.commands.keys())
+        "available_commands": list(command_router.commands.keys()),
+        "storage": {
+            "todos": todo_manager.store.get_stats(),
+            "reminders": reminder_scheduler.store.get_stats()
+        },
+        "pipeline": message_pipeline.get_stats(),
+        "commands": command_router.get_stats(),
+        "throttle": command_throttle.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "sessions": session_store.get_stats(),
+        "health": health_monitor.get_stats(),
+        "meetings": meeting_manager.get_stats(),
+        "recordings": audio_recorder.get_stats(),
+        "retention": retention_manager.get_stats(),
+        "attachments": attachment_store.get_stats(),
+        "profiler": request_profiler.get_stats(),
+        "tracing": tracer.get_stats()
     }
 
+@app.post("/broadcast")
+async def create_broadcast(request: Request):
+    """Start a broadcast to the given chats (or every known chat)"""
+    require_admin(request)
+    body = await request.json()
+    message = body.get("message", "")
+    if not message:
+        raise HTTPException(status_code=400, detail="message is required")
+    
+    report = broadcast_manager.create_broadcast(message, body.get("chat_ids"))
+    return JSONResponse(content=report, status_code=202)
+
+@app.get("/broadcast/{broadcast_id}")
+async def get_broadcast(broadcast_id: str, request: Request):
+    """Get delivery progress for a broadcast"""
+    require_admin(request)
+    report = broadcast_manager.get_broadcast(broadcast_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return report
+
+@app.post("/mailmerge")
+async def create_mail_merge(request: Request):
+    """Start a mail merge: a template sent to recipients given as rows, CSV text or a stored contact group"""
+    require_admin(request)
+    body = await request.json()
+    template = body.get("template", "")
+    if not template:
+        raise HTTPException(status_code=400, detail="template is required")
+    
+    try:
+        if body.get("csv"):
+            recipients = parse_recipients(body["csv"])
+        elif body.get("group"):
+            recipients = mail_merge_manager.get_group(body["group"]) or []
+        else:
+            recipients = [row for row in body.get("recipients", []) if "@" in str(row.get("email", ""))]
+        report = mail_merge_manager.create_job(template, recipients, body.get("context"), body.get("subject"))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content=report, status_code=202)
+
+@app.get("/mailmerge/{job_id}")
+async def get_mail_merge(job_id: str, request: Request):
+    """Get per-status counts and throughput for a mail merge"""
+    require_admin(request)
+    report = mail_merge_manager.get_job(job_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Mail merge not found")
+    return report
+
+@app.get("/profiles")
+async def list_profiles(request: Request):
+    """List saved request profiles, newest first"""
+    require_admin(request)
+    return {"profiles": request_profiler.list_profiles(), "stats": request_profiler.get_stats()}
+
+@app.get("/profiles/{name}")
+async def download_profile(name: str, request: Request):
+    """Download a profile as collapsed stacks (flamegraph.pl / speedscope input)"""
+    require_admin(request)
+    path = request_profiler.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
+@app.get("/outbox/dead-letters")
+async def list_dead_letters(request: Request, limit: int = 50):
+    """Messages the outbox gave up on, newest first"""
+    require_admin(request)
+    return {"dead_letters": message_pipeline.outbox.dead_letters(limit)}
+
+@app.get("/files/{area}/{name:path}")
+async def download_file(area: str, name: str, expires: int, sig: str):
+    """Serve a file behind a signed download link (emailed in place of big attachments)"""
+    path = attachment_store.resolve(area, name, expires, sig)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Link expired or invalid")
+    return FileResponse(path, filename=path.name)
+
+# Every channel's messages run through the same pipeline
+message_pipeline.route_with(command_router.handle_message, command_router.split_batch)
+message_pipeline.add_inbound_listener(lambda message: broadcast_manager.remember_chat(message.chat_id))
+message_pipeline.add_inbound_listener(attachment_store.remember)
+message_pipeline.commit_with(todo_manager.store)
+message_pipeline.commit_with(reminder_scheduler.store)
+
+# Readiness checks only read in-memory state
+health_monitor.add_check("storage", lambda: not (todo_manager.store.last_error or reminder_scheduler.store.last_error
+                                                  or broadcast_manager.store.last_error
+                                                  or mail_merge_manager.store.last_error
+                                                  or message_pipeline.outbox.store.last_error))
+health_monitor.add_check("scheduler", lambda: reminder_scheduler.running and reminder_scheduler.scheduler_thread.is_alive())
+health_monitor.add_check("digest", lambda: digest_manager.running)
+
 @app.on_event("startup")
 async def startup_event():
     """Startup event handler"""
     logger.info("Starting Telegram Control Hub...")
+    # Deliver replies and reminders left in the outbox by the last run
+    message_pipeline.replay_outbox()
     # Start the reminder scheduler
     reminder_scheduler.start_scheduler()
     logger.info("Reminder scheduler started")
+    # Pick up broadcasts interrupted by the last shutdown
+    broadcast_manager.resume_pending()
+    mail_merge_manager.resume_pending()
+    digest_manager.start()
+    # Launch the warm browsers for meeting jobs
+    meeting_manager.start()
+    # Move old finished todos/reminders out of the hot set in the background
+    retention_manager.start()
+    health_monitor.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown event handler"""
     logger.info("Shutting down Telegram Control Hub...")
+    health_monitor.stop()
     # Stop the reminder scheduler
     reminder_scheduler.stop_scheduler()
     logger.info("Reminder scheduler stopped")
+    digest_manager.stop()
+    meeting_manager.stop()
+    audio_recorder.stop_all()
+    retention_manager.stop()
+    # Drain queued replies before the process exits
+    message_pipeline.stop()
+    tracer.stop()
+    # Flush any writes still waiting in the group-commit window
+    todo_manager.store.close()
+    reminder_scheduler.store.close()
+    broadcast_manager.store.close()
+    mail_merge_manager.store.close()
+    # Dialogs in progress survive the restart when spilling is on
+    session_store.close()
+    logger.info("Storage flushed")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,5 +1,9 @@
 from .email_sender import email_sender
 from .todo_manager import todo_manager
 from .reminder_scheduler import reminder_scheduler
+from .broadcast_manager import broadcast_manager
+from .digest_manager import digest_manager
+from .meeting_manager import meeting_manager
+from .audio_recorder import audio_recorder
 
-__all__ = ["email_sender", "todo_manager", "reminder_scheduler"]
+__all__ = ["email_sender", "todo_manager", "reminder_scheduler", "broadcast_manager", "digest_manager", "meeting_manager", "audio_recorder"]
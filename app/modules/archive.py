@@ -0,0 +1,189 @@
+import os
+import gzip
+import heapq
+import json
+import zlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.core.chat_ids import legacy_chat_ids
+from app.core.storage import JsonStore
+from app.modules.records import now_epoch
+
+logger = logging.getLogger(__name__)
+
+class RecordArchive:
+    """Append-only, gzip-compressed JSON-lines archive of finished records.
+    
+    Every append is one gzip member written to the end of the file and
+    fsynced; gzip readers treat the concatenated members as one stream, so
+    nothing already archived is ever rewritten. A small sidecar keeps the
+    highest archived id (ids must not be reused once their records leave
+    the hot set) and running totals.
+    
+    With an owner field, a second sidecar maps each owning chat to the
+    (offset, length) of the members holding its records, so a chat's
+    history only decompresses those members. The index is written behind;
+    members appended after its last save are re-indexed on startup.
+    """
+    
+    def __init__(self, path: str, owner_field: str = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.meta_store = JsonStore(self.path.with_suffix(".meta.json"), lambda: self.meta)
+        self.meta: Dict[str, int] = self.meta_store.load({'max_id': 0, 'records': 0})
+        self._lock = threading.Lock()
+        self.owner_field = owner_field
+        self.index_store = JsonStore(self.path.with_suffix(".index.json"), self._index_snapshot)
+        # owner ("" for records without one) -> [(offset, length)] of its members, oldest first
+        self.index: Dict[str, List[Tuple[int, int]]] = {}
+        self.indexed_size = 0
+        if owner_field:
+            self._load_index()
+    
+    def _index_snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'size': self.indexed_size, 'owners': {owner: list(members) for owner, members in self.index.items()}}
+    
+    def _owner_key(self, item: Dict[str, Any]) -> str:
+        # Records archived before chat ids carried their channel keep bare ids
+        return legacy_chat_ids.qualify(item.get(self.owner_field)) or ""
+    
+    def _index_member(self, offset: int, length: int, items: Iterable[Dict[str, Any]]):
+        for owner in {self._owner_key(item) for item in items}:
+            self.index.setdefault(owner, []).append((offset, length))
+        self.indexed_size = offset + length
+    
+    def _load_index(self):
+        """Load the owner index, indexing any members appended after it was last saved"""
+        saved = self.index_store.load({})
+        self.index = {owner: [tuple(member) for member in members] for owner, members in saved.get('owners', {}).items()}
+        self.indexed_size = saved.get('size', 0)
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if size < self.indexed_size:
+            # The archive was replaced or truncated: start over
+            self.index, self.indexed_size = {}, 0
+        if size > self.indexed_size:
+            caught_up = 0
+            for offset, length, lines in self._members(self.indexed_size):
+                self._index_member(offset, length, map(json.loads, lines))
+                caught_up += 1
+            logger.info(f"Indexed {caught_up} archive members in {self.path}")
+            self.index_store.mark_dirty()
+    
+    def _members(self, start: int = 0) -> Iterator[Tuple[int, int, List[str]]]:
+        """(offset, length, lines) of each gzip member from `start` on"""
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            data = f.read()
+        offset = start
+        while data:
+            decompressor = zlib.decompressobj(wbits=31)
+            try:
+                text = decompressor.decompress(data)
+            except zlib.error as e:
+                logger.error(f"Error reading archive {self.path} at {offset}: {e}")
+                return
+            if not decompressor.eof:
+                logger.error(f"Torn archive member in {self.path} at {offset}")
+                return
+            length = len(data) - len(decompressor.unused_data)
+            yield offset, length, text.decode('utf-8').splitlines()
+            offset += length
+            data = decompressor.unused_data
+    
+    def _read_member(self, offset: int, length: int) -> List[str]:
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return gzip.decompress(f.read(length)).decode('utf-8').splitlines()
+    
+    @property
+    def max_id(self) -> int:
+        return self.meta['max_id']
+    
+    def append(self, items: List[Dict[str, Any]]) -> int:
+        """Archive dicts (each with an integer 'id'); durable when this returns"""
+        if not items:
+            return 0
+        archived_at = now_epoch()
+        lines = "".join(json.dumps({**item, 'archived_at': archived_at}) + "\n" for item in items)
+        member = gzip.compress(lines.encode('utf-8'))
+        with self._lock:
+            with open(self.path, 'ab') as f:
+                offset = f.tell()
+                f.write(member)
+                f.flush()
+                os.fsync(f.fileno())
+            self.meta['max_id'] = max(self.meta['max_id'], max(item['id'] for item in items))
+            self.meta['records'] += len(items)
+            self.meta_store.mark_dirty()
+            self.meta_store.flush()
+            if self.owner_field:
+                self._index_member(offset, len(member), items)
+        if self.owner_field:
+            self.index_store.mark_dirty()
+        return len(items)
+    
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Every archived record, oldest first (streamed; memory stays flat)"""
+        if not self.path.exists():
+            return
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+        except (OSError, EOFError, ValueError) as e:
+            # A torn last member (crash mid-append) only loses that batch's tail
+            logger.error(f"Error reading archive {self.path}: {e}")
+    
+    def _newest_first(self, owners: Optional[Iterable[Optional[str]]]) -> Iterator[Dict[str, Any]]:
+        if owners is None or not self.owner_field:
+            items = list(self.iter_records())
+            yield from reversed(items)
+            return
+        with self._lock:
+            member_lists = [list(self.index.get(owner or "", ())) for owner in owners]
+        # Members of all the owners, newest (highest offset) first, each read once
+        members = heapq.merge(*(reversed(members) for members in member_lists), reverse=True)
+        last = None
+        for member in members:
+            if member == last:
+                continue
+            last = member
+            try:
+                lines = self._read_member(*member)
+            except (OSError, EOFError, ValueError, zlib.error) as e:
+                logger.error(f"Error reading archive {self.path} at {member[0]}: {e}")
+                continue
+            for line in reversed(lines):
+                yield json.loads(line)
+    
+    def history(self, accept: Callable[[Dict[str, Any]], bool], limit: int = 10,
+                owners: Iterable[Optional[str]] = None) -> List[Dict[str, Any]]:
+        """The newest `limit` accepted records, newest first (one per id).
+        
+        Given the owners a caller can see, only their members are read, newest
+        first, stopping once `limit` records are found.
+        """
+        seen, result = set(), []
+        for item in self._newest_first(owners):
+            if item['id'] in seen or not accept(item):
+                continue
+            seen.add(item['id'])
+            result.append(item)
+            if len(result) >= limit:
+                break
+        return result
+    
+    def close(self):
+        self.meta_store.close()
+        self.index_store.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'records': self.meta['records'],
+            'bytes': self.path.stat().st_size if self.path.exists() else 0,
+            'max_id': self.meta['max_id'],
+            'indexed_owners': len(self.index)
+        }
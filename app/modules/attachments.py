@@ -0,0 +1,131 @@
+import os
+import hmac
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+from app.config.settings import settings
+from app.core.telegram_client import telegram_client
+from app.core.transport import InboundMessage
+
+logger = logging.getLogger(__name__)
+
+# Telegram's Bot API won't hand out files bigger than this
+TELEGRAM_DOWNLOAD_LIMIT = 20 * 1024 * 1024
+
+class AttachmentStore:
+    """Files that can be attached to emails, or linked when too big to attach.
+    
+    Remembers the last document each chat sent over Telegram (a bounded
+    LRU of file ids, nothing is downloaded until it is used) and fetches
+    it into `attachment_dir` on demand, streaming to disk. Files there and
+    under `recording_dir` (one subdirectory per recording) can be shared as
+    signed, expiring download links served by GET /files/{area}/{name},
+    where name is the path relative to the area.
+    """
+    
+    def __init__(self, directory: str = None, max_chats: int = 10000):
+        self.directory = Path(directory or settings.attachment_dir)
+        self.areas = {'attachments': self.directory, 'recordings': Path(settings.recording_dir)}
+        # Without a configured secret, links stay valid until the next restart
+        self.secret = (settings.file_link_secret or os.urandom(32).hex()).encode()
+        self.max_chats = max_chats
+        self._documents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'remembered': 0, 'downloads': 0, 'download_bytes': 0, 'links': 0, 'pruned': 0}
+    
+    def remember(self, message: InboundMessage):
+        """Inbound listener: keep the chat's latest Telegram document"""
+        if message.channel != telegram_client.name or not message.document:
+            return
+        with self._lock:
+            self._documents[message.chat_id] = message.document
+            self._documents.move_to_end(message.chat_id)
+            if len(self._documents) > self.max_chats:
+                self._documents.popitem(last=False)
+            self.stats['remembered'] += 1
+    
+    def last_document(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._documents.get(chat_id)
+    
+    def fetch(self, chat_id: str) -> Dict[str, Any]:
+        """Download the chat's last document; returns {'path', 'name', 'size'} or {'error'}"""
+        document = self.last_document(chat_id)
+        if not document:
+            return {"error": "Send me a document first, then ask me to email it"}
+        if document.get('file_size', 0) > TELEGRAM_DOWNLOAD_LIMIT:
+            return {"error": "Telegram doesn't let bots download files over 20 MB"}
+        
+        name = Path(document.get('file_name') or "document").name
+        unique = document.get('file_unique_id') or document['file_id'][-16:]
+        path = self.directory / f"{unique}-{name}"
+        if path.is_file():
+            os.utime(path)  # used again: keep it past the next prune
+        else:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.prune()
+            result = telegram_client.download_file(document['file_id'], str(path))
+            if "error" in result:
+                return {"error": f"Couldn't download {name}: {result['error']}"}
+            with self._lock:
+                self.stats['downloads'] += 1
+                self.stats['download_bytes'] += result['bytes']
+        return {"path": str(path), "name": name, "size": path.stat().st_size}
+    
+    def _sign(self, area: str, name: str, expires: int) -> str:
+        return hmac.new(self.secret, f"{area}/{name}/{expires}".encode(), hashlib.sha256).hexdigest()
+    
+    def link_for(self, path: str) -> Optional[str]:
+        """Signed download link for a file in a served directory (None without PUBLIC_BASE_URL)"""
+        if not settings.public_base_url:
+            return None
+        path = Path(path).resolve()
+        for area, directory in self.areas.items():
+            try:
+                name = path.relative_to(directory.resolve()).as_posix()
+            except ValueError:
+                continue
+            expires = int(time.time() + settings.file_link_hours * 3600)
+            with self._lock:
+                self.stats['links'] += 1
+            return (f"{settings.public_base_url.rstrip('/')}/files/{area}/{quote(name)}"
+                    f"?expires={expires}&sig={self._sign(area, name, expires)}")
+        return None
+    
+    def resolve(self, area: str, name: str, expires: int, sig: str) -> Optional[Path]:
+        """Path behind a download link, or None if it is forged, expired or gone"""
+        directory = self.areas.get(area)
+        if directory is None or "\\" in name or expires < time.time():
+            return None
+        if not hmac.compare_digest(sig, self._sign(area, name, expires)):
+            return None
+        if name.startswith("/") or any(part in ("", ".", "..") for part in name.split("/")):
+            return None
+        path = directory / name
+        return path if path.is_file() else None
+    
+    def prune(self):
+        """Delete downloaded attachments older than the link lifetime"""
+        cutoff = time.time() - settings.file_link_hours * 3600
+        pruned = 0
+        for path in self.directory.glob("*"):
+            try:
+                if path.is_file() and path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    pruned += 1
+            except OSError as e:
+                logger.warning(f"Could not prune attachment {path}: {e}")
+        with self._lock:
+            self.stats['pruned'] += pruned
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'chats': len(self._documents)}
+
+# Global attachment store instance
+attachment_store = AttachmentStore()
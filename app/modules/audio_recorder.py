@@ -0,0 +1,532 @@
+"""
+Streaming audio capture for meeting recordings
+
+A capture thread reads PCM from a source (input device, WAV file or a
+synthetic tone) into a preallocated ring buffer. A writer thread drains
+the ring into fixed-length WAV chunks on disk, and a shared background
+worker hands each finished chunk to chunk listeners (e.g. incremental
+transcription) and then compresses it. Memory use is the ring plus one
+block, however long the meeting runs.
+"""
+
+import math
+import time
+import uuid
+import queue
+import shutil
+import logging
+import threading
+import subprocess
+import wave
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from app.config.settings import settings
+from app.core.pipeline import message_pipeline
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_WIDTH = 2          # 16-bit PCM
+BLOCK_SECONDS = 0.1       # capture/write granularity
+TELEGRAM_UPLOAD_LIMIT = 50 * 2 ** 20  # bots may upload files up to 50 MB
+CODECS = {
+    'opus': ('.ogg', ["-c:a", "libopus", "-b:a", "24k"]),
+    'flac': ('.flac', ["-c:a", "flac"]),
+    'wav': ('.wav', None),
+}
+
+class AudioSource:
+    """Interface for PCM sources: read() returns up to `frames` frames, b"" at the end"""
+    sample_rate = 16000
+    channels = 1
+    # Live sources can't be paused, so audio is dropped if the writer falls behind;
+    # others (unpaced files, synthetic tones) wait for room in the ring instead
+    live = False
+    
+    def read(self, frames: int) -> bytes:
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+
+class DeviceSource(AudioSource):
+    """Capture from an input device (a loopback/monitor device records meeting audio)"""
+    live = True
+    
+    def __init__(self, device_index: int = None, sample_rate: int = None):
+        try:
+            import sounddevice
+        except ImportError:
+            raise RuntimeError("Recording from a device needs sounddevice: pip install sounddevice")
+        self.sample_rate = sample_rate or settings.sample_rate
+        self.stream = sounddevice.RawInputStream(
+            device=settings.audio_device_index if device_index is None else device_index,
+            samplerate=self.sample_rate, channels=self.channels, dtype="int16"
+        )
+        self.stream.start()
+    
+    def read(self, frames: int) -> bytes:
+        if self.stream.closed:
+            return b""
+        data, _ = self.stream.read(frames)
+        return bytes(data)
+    
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+class FileSource(AudioSource):
+    """Replay a 16-bit WAV file, optionally paced like a live source"""
+    
+    def __init__(self, path: str, realtime: bool = False):
+        self.wav = wave.open(str(path), "rb")
+        if self.wav.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError("Only 16-bit WAV files are supported")
+        self.sample_rate = self.wav.getframerate()
+        self.channels = self.wav.getnchannels()
+        self.realtime = self.live = realtime
+        self._closed = False
+    
+    def read(self, frames: int) -> bytes:
+        if self._closed:
+            return b""
+        if self.realtime:
+            time.sleep(frames / self.sample_rate)
+        return self.wav.readframes(frames)
+    
+    def close(self):
+        self._closed = True
+        self.wav.close()
+
+class SyntheticSource(AudioSource):
+    """A sine tone for tests and benchmarks; endless unless `seconds` is given"""
+    
+    def __init__(self, sample_rate: int = None, seconds: float = None, frequency: float = 440.0,
+                 realtime: bool = False):
+        self.sample_rate = sample_rate or settings.sample_rate
+        self.remaining = int(seconds * self.sample_rate) if seconds is not None else None
+        self.realtime = self.live = realtime
+        # One second of samples; a whole-Hz tone repeats exactly every second
+        samples = array("h", (int(8000 * math.sin(2 * math.pi * frequency * i / self.sample_rate))
+                              for i in range(self.sample_rate)))
+        self._period = samples.tobytes() * 2
+        self._offset = 0
+        self._closed = False
+    
+    def read(self, frames: int) -> bytes:
+        if self._closed or self.remaining == 0:
+            return b""
+        if self.remaining is not None:
+            frames = min(frames, self.remaining)
+            self.remaining -= frames
+        frames = min(frames, self.sample_rate)
+        if self.realtime:
+            time.sleep(frames / self.sample_rate)
+        start = self._offset * SAMPLE_WIDTH
+        data = self._period[start:start + frames * SAMPLE_WIDTH]
+        self._offset = (self._offset + frames) % self.sample_rate
+        return data
+    
+    def close(self):
+        self._closed = True
+
+def format_duration(seconds: float) -> str:
+    """h:mm:ss or m:ss"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def make_source(spec: str = None) -> AudioSource:
+    """Build the source named by RECORDING_SOURCE: device, synthetic or file:<path>"""
+    spec = spec or settings.recording_source
+    if spec == "device":
+        return DeviceSource()
+    if spec == "synthetic":
+        return SyntheticSource(realtime=True)
+    if spec.startswith("file:"):
+        return FileSource(spec[5:], realtime=True)
+    raise ValueError(f"Unknown recording source: {spec}")
+
+class RingBuffer:
+    """Fixed-size byte ring between the capture and writer threads.
+    
+    A live capture side never blocks: when the writer falls behind by
+    more than the capacity, new audio is dropped and counted.
+    """
+    
+    def __init__(self, capacity: int, align: int = 1):
+        self.capacity = capacity - capacity % align
+        self.align = align
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._size = 0
+        self._cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+    
+    def write(self, data: bytes, block: bool = False) -> int:
+        """Append data; with block=True wait for room instead of dropping"""
+        with self._cond:
+            if block:
+                self._cond.wait_for(lambda: self.capacity - self._size >= len(data) or self.closed)
+            n = min(len(data), self.capacity - self._size)
+            n -= n % self.align
+            self.dropped += len(data) - n
+            end = (self._start + self._size) % self.capacity
+            first = min(n, self.capacity - end)
+            self._view[end:end + first] = data[:first]
+            self._view[:n - first] = data[first:n]
+            self._size += n
+            self._cond.notify()
+            return n
+    
+    def read(self, n: int, timeout: float = None) -> bytes:
+        """Wait for n bytes (less once closed or on timeout) and consume them"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._size >= n or self.closed, timeout)
+            n = min(n, self._size)
+            n -= n % self.align
+            first = min(n, self.capacity - self._start)
+            data = bytes(self._view[self._start:self._start + first]) + bytes(self._view[:n - first])
+            self._start = (self._start + n) % self.capacity
+            self._size -= n
+            self._cond.notify_all()
+            return data
+    
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+    
+    def __len__(self) -> int:
+        return self._size
+
+class Recording:
+    """One capture session: source -> ring buffer -> rotating chunk files"""
+    
+    def __init__(self, recorder: "AudioRecorder", chat_id: str, source: AudioSource, directory: Path,
+                 chunk_seconds: float, buffer_seconds: float):
+        self.recorder = recorder
+        self.id = uuid.uuid4().hex[:12]
+        self.chat_id = chat_id
+        self.source = source
+        self.directory = directory / self.id
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.frame_bytes = SAMPLE_WIDTH * source.channels
+        self.block_frames = max(1, int(source.sample_rate * BLOCK_SECONDS))
+        self.chunk_frames = max(self.block_frames, int(source.sample_rate * chunk_seconds))
+        self.ring = RingBuffer(int(source.sample_rate * buffer_seconds) * self.frame_bytes, self.frame_bytes)
+        self.chunks: List[Dict[str, Any]] = []
+        self.frames = 0
+        self.started_at = datetime.now().isoformat()
+        self.status = 'recording'
+        self._stopping = threading.Event()
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._capture = threading.Thread(target=self._capture_loop, daemon=True, name=f"capture-{self.id}")
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name=f"chunks-{self.id}")
+    
+    def start(self):
+        self._writer.start()
+        self._capture.start()
+    
+    def _capture_loop(self):
+        try:
+            while not self._stopping.is_set():
+                data = self.source.read(self.block_frames)
+                if not data:
+                    break
+                self.ring.write(data, block=not self.source.live)
+        except Exception as e:
+            logger.error(f"Recording {self.id} capture failed: {e}")
+        finally:
+            self.ring.close()
+    
+    def _open_chunk(self) -> wave.Wave_write:
+        index = len(self.chunks)
+        path = self.directory / f"chunk_{index:05d}.wav"
+        chunk = wave.open(str(path), "wb")
+        chunk.setnchannels(self.source.channels)
+        chunk.setsampwidth(SAMPLE_WIDTH)
+        chunk.setframerate(self.source.sample_rate)
+        self.chunks.append({
+            'index': index,
+            'path': str(path),
+            'start': self.frames / self.source.sample_rate,
+            'end': None,
+            'frames': 0,
+            'compressed': False
+        })
+        return chunk
+    
+    def _close_chunk(self, chunk: wave.Wave_write):
+        chunk.close()
+        info = self.chunks[-1]
+        info['end'] = info['start'] + info['frames'] / self.source.sample_rate
+        with self._pending_cond:
+            self._pending += 1
+        self.recorder._enqueue(self, info)
+    
+    def _write_loop(self):
+        try:
+            self._write_chunks()
+        except Exception as e:
+            logger.error(f"Recording {self.id} chunk writer failed: {e}")
+            self._stopping.set()
+            self.ring.close()
+    
+    def _write_chunks(self):
+        """Drain the ring block by block, rotating to a new chunk every chunk_frames"""
+        block_bytes = self.block_frames * self.frame_bytes
+        chunk = None
+        while True:
+            data = self.ring.read(block_bytes, timeout=0.5)
+            if not data:
+                if self.ring.closed and not len(self.ring):
+                    break
+                continue
+            view = memoryview(data)
+            while view:
+                if chunk is None:
+                    chunk = self._open_chunk()
+                info = self.chunks[-1]
+                take = min(len(view), (self.chunk_frames - info['frames']) * self.frame_bytes)
+                chunk.writeframesraw(view[:take])
+                frames = take // self.frame_bytes
+                info['frames'] += frames
+                self.frames += frames
+                view = view[take:]
+                if info['frames'] >= self.chunk_frames:
+                    self._close_chunk(chunk)
+                    chunk = None
+        if chunk is not None:
+            self._close_chunk(chunk)
+    
+    def _chunk_done(self):
+        with self._pending_cond:
+            self._pending -= 1
+            self._pending_cond.notify_all()
+    
+    def stop(self, timeout: float = None):
+        """Stop capturing and wait until every chunk is written and processed"""
+        self._stopping.set()
+        self._capture.join(timeout)
+        self.source.close()
+        self._writer.join(timeout)
+        with self._pending_cond:
+            self._pending_cond.wait_for(lambda: self._pending == 0, timeout)
+    
+    @property
+    def duration(self) -> float:
+        return self.frames / self.source.sample_rate
+    
+    def report(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'chat_id': self.chat_id,
+            'status': self.status,
+            'started_at': self.started_at,
+            'duration': round(self.duration, 1),
+            'chunks': len(self.chunks),
+            'dropped_bytes': self.ring.dropped,
+            'buffered_bytes': len(self.ring)
+        }
+
+class AudioRecorder:
+    """Starts and finalizes recordings, one per chat, and compresses their chunks"""
+    
+    def __init__(self, directory: str = None, codec: str = None):
+        self.directory = Path(directory or settings.recording_dir)
+        self.codec = codec or settings.recording_codec
+        if self.codec not in CODECS:
+            raise ValueError(f"Unknown recording codec: {self.codec}")
+        self.recordings: Dict[str, Recording] = {}
+        self._listeners: List[Callable[[Recording, Dict[str, Any]], None]] = []
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {'recordings': 0, 'chunks': 0, 'raw_bytes': 0, 'compressed_bytes': 0}
+    
+    def add_chunk_listener(self, callback: Callable[[Recording, Dict[str, Any]], None]):
+        """Call back with (recording, chunk) as each chunk is finished.
+        
+        The chunk's WAV file is only guaranteed to exist during the call;
+        it is compressed right afterwards.
+        """
+        self._listeners.append(callback)
+    
+    def _ffmpeg(self) -> Optional[str]:
+        return shutil.which("ffmpeg") if self.codec != 'wav' else None
+    
+    def start(self, chat_id: str, source: AudioSource = None) -> Dict[str, Any]:
+        """Start recording for a chat"""
+        with self._lock:
+            if chat_id in self.recordings:
+                return {"error": "Already recording. Use 'meeting stop' first"}
+            try:
+                source = source or make_source()
+            except Exception as e:
+                return {"error": f"Can't open the audio source: {e}"}
+            recording = Recording(self, chat_id, source, self.directory,
+                                  settings.recording_chunk_seconds, settings.recording_buffer_seconds)
+            self.recordings[chat_id] = recording
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._compress_loop, daemon=True, name="chunk-compressor")
+                self._worker.start()
+        recording.start()
+        self.stats['recordings'] += 1
+        logger.info(f"Recording {recording.id} started for chat {chat_id}")
+        return recording.report()
+    
+    def get(self, chat_id: str) -> Optional[Recording]:
+        return self.recordings.get(chat_id)
+    
+    def _enqueue(self, recording: Recording, chunk: Dict[str, Any]):
+        self._queue.put((recording, chunk))
+    
+    def _compress_loop(self):
+        while True:
+            recording, chunk = self._queue.get()
+            try:
+                self._process_chunk(recording, chunk)
+            except Exception as e:
+                logger.error(f"Error processing chunk {chunk['path']}: {e}")
+            finally:
+                recording._chunk_done()
+    
+    def _process_chunk(self, recording: Recording, chunk: Dict[str, Any]):
+        """Hand a finished chunk to listeners, then compress it in place"""
+        for callback in self._listeners:
+            try:
+                callback(recording, chunk)
+            except Exception as e:
+                logger.error(f"Chunk listener failed: {e}")
+        
+        path = Path(chunk['path'])
+        raw_bytes = path.stat().st_size
+        self.stats['chunks'] += 1
+        self.stats['raw_bytes'] += raw_bytes
+        ffmpeg = self._ffmpeg()
+        if ffmpeg:
+            suffix, codec_args = CODECS[self.codec]
+            target = path.with_suffix(suffix)
+            result = subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-i", str(path), *codec_args, str(target)],
+                                    capture_output=True)
+            if result.returncode == 0:
+                path.unlink()
+                chunk['path'] = str(target)
+                chunk['compressed'] = True
+                self.stats['compressed_bytes'] += target.stat().st_size
+                return
+            logger.warning(f"ffmpeg failed on {path.name}: {result.stderr.decode(errors='replace').strip()}")
+        self.stats['compressed_bytes'] += raw_bytes
+    
+    def _merge(self, recording: Recording) -> Optional[Path]:
+        """Join the chunks into one file and remove them (they are kept if the merge fails)"""
+        paths = [Path(chunk['path']) for chunk in recording.chunks if Path(chunk['path']).exists()]
+        if not paths:
+            return None
+        suffixes = {path.suffix for path in paths}
+        if len(suffixes) > 1:
+            # ffmpeg failed on some chunks, which stayed raw wav
+            raise ValueError(f"chunks are in mixed formats ({', '.join(sorted(suffixes))})")
+        target = recording.directory / f"recording{paths[0].suffix}"
+        
+        try:
+            if paths[0].suffix == ".wav":
+                with wave.open(str(target), "wb") as out:
+                    out.setnchannels(recording.source.channels)
+                    out.setsampwidth(SAMPLE_WIDTH)
+                    out.setframerate(recording.source.sample_rate)
+                    for path in paths:
+                        with wave.open(str(path), "rb") as chunk:
+                            while True:
+                                frames = chunk.readframes(recording.source.sample_rate)
+                                if not frames:
+                                    break
+                                out.writeframesraw(frames)
+            else:
+                listing = recording.directory / "chunks.txt"
+                listing.write_text("".join(f"file '{path.name}'\n" for path in paths), encoding="utf-8")
+                result = subprocess.run([shutil.which("ffmpeg"), "-y", "-loglevel", "error", "-f", "concat",
+                                         "-safe", "0", "-i", str(listing), "-c", "copy", str(target)],
+                                        capture_output=True)
+                listing.unlink()
+                if result.returncode != 0:
+                    raise ValueError(f"ffmpeg concat failed: {result.stderr.decode(errors='replace').strip()}")
+        except Exception:
+            target.unlink(missing_ok=True)
+            raise
+        
+        for path in paths:
+            path.unlink()
+        return target
+    
+    def _finalize(self, recording: Recording) -> Dict[str, Any]:
+        """Stop a detached recording, wait for its chunks and merge them into one file"""
+        recording.stop()
+        error = None
+        try:
+            path = self._merge(recording)
+        except (wave.Error, EOFError, OSError, ValueError) as e:
+            path, error = None, str(e) or type(e).__name__
+            logger.error(f"Merging recording {recording.id} failed, chunks kept in {recording.directory}: {e}")
+        recording.status = 'completed' if path else 'failed'
+        report = recording.report()
+        report['path'] = str(path) if path else None
+        report['bytes'] = path.stat().st_size if path else 0
+        report['error'] = error
+        report['directory'] = str(recording.directory)
+        logger.info(f"Recording {recording.id} finished: {report['duration']}s in {report['chunks']} chunks")
+        return report
+    
+    def stop(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """Stop a chat's recording and return its report (with the merged file's path)"""
+        with self._lock:
+            recording = self.recordings.pop(chat_id, None)
+        return self._finalize(recording) if recording else None
+    
+    def stop_and_send(self, chat_id: str) -> bool:
+        """Finalize a chat's recording in the background and send it back as a document"""
+        with self._lock:
+            recording = self.recordings.pop(chat_id, None)
+        if recording is None:
+            return False
+        
+        def finish():
+            report = self._finalize(recording)
+            if report['error']:
+                message_pipeline.send(chat_id, f"❌ The recording could not be merged ({report['error']}); "
+                                               f"the raw chunks are kept in {report['directory']}")
+                return
+            if not report['path']:
+                message_pipeline.send(chat_id, "❌ The recording could not be saved.")
+                return
+            caption = f"🎙️ Recording ({format_duration(report['duration'])})"
+            if report['bytes'] > TELEGRAM_UPLOAD_LIMIT:
+                message_pipeline.send(chat_id, f"{caption} is too large to send; saved as {report['path']}")
+                return
+            result = message_pipeline.send_document_file(chat_id, report['path'], caption).result()
+            if "error" in result:
+                message_pipeline.send(chat_id, f"❌ Couldn't upload the recording; saved as {report['path']}")
+        
+        threading.Thread(target=tracer.wrap(finish), daemon=True).start()
+        return True
+    
+    def stop_all(self):
+        """Finalize every recording (on shutdown) so no chunk is left unmerged"""
+        for chat_id in list(self.recordings):
+            self.stop(chat_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'active': len(self.recordings),
+            'compression_queue': self._queue.qsize()
+        }
+
+# Global audio recorder instance
+audio_recorder = AudioRecorder()
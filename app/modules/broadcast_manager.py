@@ -0,0 +1,237 @@
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable
+from pathlib import Path
+from app.config.settings import settings
+from app.core.chat_ids import legacy_chat_ids
+from app.core.rate_limiter import RateLimiter
+from app.core.storage import JsonStore
+from app.core.pipeline import message_pipeline
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+class BroadcastManager:
+    # Progress lines are buffered and appended in batches of this size
+    PROGRESS_FLUSH_EVERY = 100
+    MAX_ATTEMPTS = 3
+    
+    def __init__(self, data_dir: str = "data/broadcasts", chats_file: str = "data/chats.json"):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        # Chats arrive in bursts; the write-behind store coalesces them into few atomic writes
+        self.store = JsonStore(Path(chats_file), lambda: sorted(self.known_chats))
+        stored = self.store.load([])
+        self.known_chats = {legacy_chat_ids.qualify(chat_id) for chat_id in stored}
+        if any(map(legacy_chat_ids.is_legacy, stored)):
+            self.store.mark_dirty()
+        self.rate_limiter = RateLimiter(settings.broadcast_rate_limit)
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def remember_chat(self, chat_id: str):
+        """Record a chat as a broadcast recipient (only marks the store dirty when it is new)"""
+        if chat_id and chat_id not in self.known_chats:
+            with self._lock:
+                self.known_chats.add(chat_id)
+                self.store.mark_dirty()
+    
+    def _job_file(self, job_id: str) -> Path:
+        return self.data_dir / f"{job_id}.json"
+    
+    def _progress_file(self, job_id: str) -> Path:
+        return self.data_dir / f"{job_id}.progress"
+    
+    def _save_job(self, job: Dict[str, Any]):
+        """Persist job metadata (not the per-recipient progress)"""
+        meta = {k: v for k, v in job.items() if not k.startswith('_')}
+        try:
+            with open(self._job_file(job['id']), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Error saving broadcast {job['id']}: {e}")
+    
+    def _load_progress(self, job_id: str) -> Dict[str, str]:
+        """Read the append-only progress log of a job (chat_id -> status)"""
+        done = {}
+        path = self._progress_file(job_id)
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) == 2:
+                        done[parts[0]] = parts[1]
+        return done
+    
+    def create_broadcast(self, message: str, recipients: Iterable[str] = None) -> Dict[str, Any]:
+        """Create a broadcast job and start sending in the background"""
+        if recipients is None:
+            recipients = self.known_chats
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'message': message,
+            'recipients': list(dict.fromkeys(str(r) for r in recipients)),
+            'status': 'running',
+            'created_at': datetime.now().isoformat(),
+            'finished_at': None
+        }
+        self._save_job(job)
+        self._start(job, {})
+        logger.info(f"Created broadcast {job['id']} to {len(job['recipients'])} chats")
+        return self.get_broadcast(job['id'])
+    
+    def resume_pending(self) -> int:
+        """Resume broadcasts interrupted by a restart, skipping chats already handled"""
+        resumed = 0
+        for path in self.data_dir.glob("*.json"):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading broadcast {path.name}: {e}")
+                continue
+            if job.get('status') == 'running' and job['id'] not in self.jobs:
+                self._start(job, self._load_progress(job['id']))
+                resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} broadcast(s)")
+        return resumed
+    
+    def _start(self, job: Dict[str, Any], done: Dict[str, str]):
+        """Attach runtime counters to a job and run it on its own thread"""
+        counts = {'delivered': 0, 'failed': 0, 'blocked': 0}
+        for status in done.values():
+            counts[status] = counts.get(status, 0) + 1
+        job.update({'_counts': counts, '_done': done, '_started': time.monotonic(), '_sent_now': 0})
+        with self._lock:
+            self.jobs[job['id']] = job
+        threading.Thread(target=tracer.wrap(self._run), args=(job,), daemon=True).start()
+    
+    def _run(self, job: Dict[str, Any]):
+        """Fan the message out with a bounded window of in-flight sends"""
+        done = job['_done']
+        pending = (chat_id for chat_id in job['recipients'] if chat_id not in done)
+        window = settings.broadcast_workers * 4
+        buffer: List[str] = []
+        send_one = tracer.wrap(self._send_one)
+        
+        try:
+            with open(self._progress_file(job['id']), 'a', encoding='utf-8') as progress, \
+                    ThreadPoolExecutor(max_workers=settings.broadcast_workers) as executor:
+                in_flight = {}
+                for chat_id in pending:
+                    in_flight[executor.submit(send_one, chat_id, job['message'])] = chat_id
+                    if len(in_flight) >= window:
+                        self._collect(job, in_flight, buffer, progress)
+                while in_flight:
+                    self._collect(job, in_flight, buffer, progress)
+                self._flush_progress(buffer, progress)
+        except Exception as e:
+            logger.error(f"Broadcast {job['id']} interrupted: {e}")
+            return
+        
+        elapsed = time.monotonic() - job['_started']
+        job['status'] = 'completed'
+        job['finished_at'] = datetime.now().isoformat()
+        job['messages_per_second'] = round(job['_sent_now'] / elapsed, 2) if elapsed > 0 else 0.0
+        self._save_job(job)
+        logger.info(f"Broadcast {job['id']} completed: {job['_counts']}")
+    
+    def _collect(self, job: Dict[str, Any], in_flight: Dict, buffer: List[str], progress):
+        """Record finished sends and flush progress in batches"""
+        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in finished:
+            chat_id = in_flight.pop(future)
+            status = future.result()
+            job['_done'][chat_id] = status
+            job['_counts'][status] += 1
+            job['_sent_now'] += 1
+            buffer.append(f"{chat_id}\t{status}\n")
+        if len(buffer) >= self.PROGRESS_FLUSH_EVERY:
+            self._flush_progress(buffer, progress)
+    
+    def _flush_progress(self, buffer: List[str], progress):
+        if buffer:
+            progress.write("".join(buffer))
+            progress.flush()
+            buffer.clear()
+    
+    def _send_one(self, chat_id: str, message: str) -> str:
+        """Send to a single chat and classify the outcome"""
+        for attempt in range(self.MAX_ATTEMPTS):
+            self.rate_limiter.acquire()
+            transport, to = message_pipeline.address(chat_id)
+            result = transport.send_text_message(to, message)
+            if "error" not in result:
+                return 'delivered'
+            
+            status_code = result.get("status_code")
+            if status_code == 403:
+                return 'blocked'
+            if status_code == 429:
+                self.rate_limiter.pause(result.get("retry_after", 1))
+                continue
+            if status_code is not None and status_code < 500:
+                return 'failed'
+            # Network errors and 5xx are worth another try
+            time.sleep(0.5 * (attempt + 1))
+        return 'failed'
+    
+    def get_broadcast(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a progress report for a broadcast"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            path = self._job_file(job_id)
+            if not path.exists():
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                job = json.load(f)
+            done = self._load_progress(job_id)
+            counts = {'delivered': 0, 'failed': 0, 'blocked': 0}
+            for status in done.values():
+                counts[status] = counts.get(status, 0) + 1
+            throughput = job.get('messages_per_second', 0.0)
+        else:
+            counts = dict(job['_counts'])
+            elapsed = time.monotonic() - job['_started']
+            throughput = round(job['_sent_now'] / elapsed, 2) if elapsed > 0 else 0.0
+        
+        total = len(job['recipients'])
+        processed = sum(counts.values())
+        return {
+            'id': job['id'],
+            'status': job['status'],
+            'total': total,
+            'processed': processed,
+            'remaining': total - processed,
+            'delivered': counts['delivered'],
+            'failed': counts['failed'],
+            'blocked': counts['blocked'],
+            'messages_per_second': throughput,
+            'created_at': job['created_at'],
+            'finished_at': job.get('finished_at')
+        }
+    
+    def list_broadcasts(self) -> List[Dict[str, Any]]:
+        """List reports for all known broadcasts"""
+        reports = [self.get_broadcast(path.stem) for path in self.data_dir.glob("*.json")]
+        return sorted((r for r in reports if r), key=lambda r: r['created_at'])
+    
+    def format_report(self, report: Dict[str, Any]) -> str:
+        """Format a broadcast report for chat display"""
+        return (
+            f"📣 Broadcast {report['id']} ({report['status']})\n"
+            f"Progress: {report['processed']}/{report['total']}\n"
+            f"✅ Delivered: {report['delivered']}\n"
+            f"🚫 Blocked: {report['blocked']}\n"
+            f"❌ Failed: {report['failed']}\n"
+            f"⚡ Throughput: {report['messages_per_second']} msg/s"
+        )
+
+# Global broadcast manager instance
+broadcast_manager = BroadcastManager()
@@ -0,0 +1,248 @@
+"""
+Cron-style recurrence for reminders
+
+Expressions use the classic five fields ``minute hour day-of-month month
+day-of-week`` with ``*``, lists, ranges, steps and month/day names, plus
+``MON#1`` for "first Monday of the month" and the ``@daily``-style
+shortcuts. Each field is parsed once into an integer bitset, so finding
+the next fire time is a handful of bit scans rather than a walk through
+every minute.
+"""
+
+import calendar
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+MONTH_NAMES = {name.lower(): i for i, name in enumerate(calendar.month_abbr) if name}
+DAY_NAMES = {'sun': 0, 'mon': 1, 'tue': 2, 'wed': 3, 'thu': 4, 'fri': 5, 'sat': 6}
+FULL_DAY_NAMES = {name.lower(): (i + 1) % 7 for i, name in enumerate(calendar.day_name)}
+
+MACROS = {
+    '@yearly': "0 0 1 1 *",
+    '@annually': "0 0 1 1 *",
+    '@monthly': "0 0 1 * *",
+    '@weekly': "0 0 * * 0",
+    '@daily': "0 0 * * *",
+    '@midnight': "0 0 * * *",
+    '@hourly': "0 * * * *",
+}
+
+# (low, high, names) per field
+FIELD_RANGES = (
+    (0, 59, {}),
+    (0, 23, {}),
+    (1, 31, {}),
+    (1, 12, MONTH_NAMES),
+    (0, 7, DAY_NAMES),
+)
+
+ORDINALS = {'first': 1, 'second': 2, 'third': 3, 'fourth': 4}
+SEARCH_YEARS = 30
+
+def _next_bit(mask: int, start: int) -> int:
+    """Lowest set bit at position >= start, or -1"""
+    rest = mask >> start
+    if not rest:
+        return -1
+    return start + (rest & -rest).bit_length() - 1
+
+def _value(token: str, names: Dict[str, int]) -> int:
+    token = token.lower()
+    if token in names:
+        return names[token]
+    if not token.isdigit():
+        raise ValueError(f"Invalid cron value: {token}")
+    return int(token)
+
+def _parse_field(text: str, low: int, high: int, names: Dict[str, int]) -> Tuple[int, int]:
+    """Parse one field into (bitset, nth-weekday bitset)"""
+    mask = nth = 0
+    for item in text.split(","):
+        if "#" in item:
+            # Day-of-week only: MON#2 is the second Monday of the month
+            day, _, n = item.partition("#")
+            weekday, n = _value(day, names) % 7, _value(n, {})
+            if names is not DAY_NAMES or not 1 <= n <= 5:
+                raise ValueError(f"Invalid cron item: {item}")
+            nth |= 1 << (weekday * 5 + n - 1)
+            continue
+        
+        body, _, step = item.partition("/")
+        step = _value(step, {}) if step else 1
+        if body in ("*", "?"):
+            start, end = low, high
+        elif "-" in body:
+            start, end = (_value(v, names) for v in body.split("-", 1))
+        else:
+            start = _value(body, names)
+            end = high if step > 1 else start
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Invalid cron item: {item}")
+        for value in range(start, end + 1, step):
+            mask |= 1 << value
+    return mask, nth
+
+class CronExpression:
+    """A parsed cron expression; immutable, so parse_cron shares instances"""
+    __slots__ = ('expression', 'minutes', 'hours', 'days', 'months', 'weekdays', 'nth',
+                 'dom_any', 'dow_any', '_day_masks')
+    
+    def __init__(self, expression: str):
+        self.expression = " ".join(expression.split())
+        fields = MACROS.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression}")
+        
+        parsed = [_parse_field(text, *spec) for text, spec in zip(fields, FIELD_RANGES)]
+        (self.minutes, _), (self.hours, _), (self.days, _), (self.months, _), (weekdays, self.nth) = parsed
+        # 7 is Sunday too
+        self.weekdays = (weekdays | weekdays >> 7) & 0x7F
+        # Like cron: when both day fields are restricted, either may match
+        self.dom_any = fields[2].startswith(("*", "?"))
+        self.dow_any = fields[4].startswith(("*", "?"))
+        if not (self.minutes and self.hours and self.months and (self.days or self.weekdays or self.nth)):
+            raise ValueError(f"Cron expression never matches: {expression}")
+        # Days only: at least one chosen month must have one of the days (30 2 never comes; 29 2 does)
+        if self.dow_any and not any(self.months >> month & 1 and self.days & (2 << calendar.monthrange(2000, month)[1]) - 2
+                                    for month in range(1, 13)):
+            raise ValueError(f"Cron expression never matches: {expression}")
+        self._day_masks: Dict[Tuple[int, int], int] = {}
+    
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expression!r})"
+    
+    def _day_mask(self, year: int, month: int) -> int:
+        """Days (bits 1..31) of a month on which the expression can fire"""
+        key = (year, month)
+        mask = self._day_masks.get(key)
+        if mask is not None:
+            return mask
+        
+        first_weekday, num_days = calendar.monthrange(year, month)
+        valid = (1 << (num_days + 1)) - 2
+        if self.dom_any and self.dow_any:
+            mask = valid
+        else:
+            by_weekday = 0
+            if not self.dow_any:
+                first = (first_weekday + 1) % 7  # cron counts from Sunday
+                for day in range(1, num_days + 1):
+                    weekday = (first + day - 1) % 7
+                    if self.weekdays >> weekday & 1 or self.nth >> (weekday * 5 + (day - 1) // 7) & 1:
+                        by_weekday |= 1 << day
+            if self.dow_any:
+                mask = self.days & valid
+            elif self.dom_any:
+                mask = by_weekday
+            else:
+                mask = (self.days & valid) | by_weekday
+        
+        if len(self._day_masks) > 48:
+            self._day_masks.clear()
+        self._day_masks[key] = mask
+        return mask
+    
+    def next_fire(self, after: datetime) -> datetime:
+        """First matching minute strictly after `after` (keeps its tzinfo)"""
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        year, month, day, hour, minute = start.year, start.month, start.day, start.hour, start.minute
+        
+        # Each pass fixes one field or rolls the next larger one over
+        while year <= start.year + SEARCH_YEARS:
+            found = _next_bit(self.months, month)
+            if found < 0:
+                year, month, day, hour, minute = year + 1, 1, 1, 0, 0
+                continue
+            if found != month:
+                month, day, hour, minute = found, 1, 0, 0
+            
+            found = _next_bit(self._day_mask(year, month), day)
+            if found < 0:
+                if month == 12:
+                    year, month = year + 1, 1
+                else:
+                    month += 1
+                day, hour, minute = 1, 0, 0
+                continue
+            if found != day:
+                day, hour, minute = found, 0, 0
+            
+            found = _next_bit(self.hours, hour)
+            if found < 0:
+                day, hour, minute = day + 1, 0, 0
+                continue
+            if found != hour:
+                hour, minute = found, 0
+            
+            found = _next_bit(self.minutes, minute)
+            if found < 0:
+                hour, minute = hour + 1, 0
+                continue
+            return datetime(year, month, day, hour, found, tzinfo=after.tzinfo)
+        
+        raise ValueError(f"Cron expression never fires: {self.expression}")
+
+@lru_cache(maxsize=4096)
+def parse_cron(expression: str) -> CronExpression:
+    """Parse (once) and return the shared CronExpression for a string"""
+    return CronExpression(expression)
+
+def _weekday_list(text: str) -> str:
+    days = []
+    for name in text.lower().split(","):
+        name = name.rstrip("s")  # "mondays"
+        weekday = FULL_DAY_NAMES.get(name, DAY_NAMES.get(name[:3]) if len(name) >= 3 else None)
+        if weekday is None:
+            raise ValueError(f"Unknown day: {name}")
+        days.append(str(weekday))
+    return ",".join(days)
+
+def _at(time_str: str) -> Tuple[int, int]:
+    parsed = datetime.strptime(time_str, "%H:%M")
+    return parsed.hour, parsed.minute
+
+def parse_recurrence(words: List[str]) -> Tuple[str, List[str]]:
+    """Turn the start of a `remind` command into a cron expression.
+    
+    Returns (expression, remaining words). Understands:
+        cron <5 fields> | cron @daily
+        every 15m | every 2h
+        every day|weekday|weekend|monday[,friday] HH:MM
+        first|second|third|fourth <day> HH:MM
+    """
+    keyword = words[0].lower() if words else ""
+    if keyword == "cron":
+        if len(words) > 1 and words[1].startswith("@"):
+            return parse_cron(words[1].lower()).expression, words[2:]
+        expression = " ".join(words[1:6])
+        return parse_cron(expression).expression, words[6:]
+    
+    if keyword == "every" and len(words) > 1:
+        unit = words[1].lower()
+        if unit[:-1].isdigit() and unit[-1] in "mh":
+            n = int(unit[:-1])
+            if not 1 <= n <= (59 if unit[-1] == "m" else 23):
+                raise ValueError(f"Invalid interval: {unit}")
+            expression = f"*/{n} * * * *" if unit[-1] == "m" else f"0 */{n} * * *"
+            return parse_cron(expression).expression, words[2:]
+        
+        if len(words) > 2:
+            hour, minute = _at(words[2])
+            days = {'day': "*", 'weekday': "1-5", 'weekend': "0,6"}.get(unit.rstrip("s"))
+            expression = f"{minute} {hour} * * {days or _weekday_list(unit)}"
+            return parse_cron(expression).expression, words[3:]
+    
+    if keyword in ORDINALS and len(words) > 2:
+        hour, minute = _at(words[2])
+        weekday = _weekday_list(words[1])
+        if "," in weekday:
+            raise ValueError("Use a single day, e.g. first monday 09:00")
+        expression = f"{minute} {hour} * * {weekday}#{ORDINALS[keyword]}"
+        return parse_cron(expression).expression, words[3:]
+    
+    raise ValueError("Unrecognized schedule")
+
+def is_recurrence(word: str) -> bool:
+    """Whether a `remind` argument starts a recurring schedule"""
+    return word.lower() in ("cron", "every") or word.lower() in ORDINALS
@@ -0,0 +1,290 @@
+import time
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from app.config.settings import settings
+from app.core.chat_ids import legacy_chat_ids
+from app.core.storage import JsonStore
+from app.core.pipeline import message_pipeline
+from app.core.tracing import tracer
+from app.modules.email_sender import email_sender
+from app.modules.todo_manager import todo_manager
+from app.modules.reminder_scheduler import reminder_scheduler, reminder_cron
+from app.modules.records import Status, TodoRecord, ReminderRecord
+from app.modules.cron import parse_cron
+from app.modules.timezones import timezones, load_zone, localize
+
+logger = logging.getLogger(__name__)
+
+MAX_LISTED = 10
+
+def due_day(todo: TodoRecord) -> Optional[date]:
+    """Day a todo is due on, if it has a parseable due date"""
+    if not todo.due_date:
+        return None
+    try:
+        return datetime.fromisoformat(str(todo.due_date)).date()
+    except ValueError:
+        return None
+
+def reminder_fires_on(reminder: ReminderRecord, day: date) -> bool:
+    """Whether an active reminder goes off on the given day (in its own zone)"""
+    start = datetime.combine(day, datetime.min.time(), tzinfo=load_zone(reminder.tz or ""))
+    end = start + timedelta(days=1)
+    if reminder.next_fire and start.timestamp() <= reminder.next_fire < end.timestamp():
+        return True
+    expression = reminder_cron(reminder)
+    return bool(expression) and parse_cron(expression).next_fire(start - timedelta(minutes=1)) < end
+
+class ChatDigest:
+    """Running aggregates for one chat, updated on every todo/reminder change"""
+    __slots__ = ('pending', 'due', 'reminders', 'done_day', 'done')
+    
+    def __init__(self):
+        self.pending: Set[int] = set()              # pending todo ids
+        self.due: Dict[date, Set[int]] = {}          # due day -> pending todo ids
+        self.reminders: Set[int] = set()            # active reminder ids
+        self.done_day: Optional[date] = None
+        self.done: List[Tuple[str, int]] = []       # ('todo'|'reminder', id) finished on done_day
+    
+    def note_done(self, kind: str, item_id: int, day: date):
+        if self.done_day != day:
+            self.done_day = day
+            self.done = []
+        self.done.append((kind, item_id))
+    
+    def done_on(self, day: date) -> List[Tuple[str, int]]:
+        return self.done if self.done_day == day else []
+
+class DigestManager:
+    """Daily per-chat digest built from incrementally maintained aggregates.
+    
+    Todo and reminder changes are folded into per-chat aggregates as they
+    happen, so producing a digest only reads that chat's live items.
+    """
+    
+    def __init__(self, prefs_file: str = "data/digests.json"):
+        self.store = JsonStore(Path(prefs_file), lambda: self.prefs)
+        self.prefs: Dict[str, Dict[str, Any]] = self.store.load({})
+        if legacy_chat_ids.qualify_keys(self.prefs):
+            self.store.mark_dirty()
+        self.chats: Dict[str, ChatDigest] = {}
+        self._todo_keys: Dict[int, Tuple[str, Optional[date]]] = {}
+        self._reminder_keys: Dict[int, str] = {}
+        # (zone, HH:MM) -> chats, so each minute only looks at the chats due then
+        self._by_time: Dict[Tuple[str, str], Set[str]] = {}
+        self._chat_slots: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+        self.running = False
+        self.stats = {'updates': 0, 'digests_sent': 0}
+        
+        for chat_id, pref in self.prefs.items():
+            self._slot(chat_id, pref['time'])
+        # Seed once from the stored items, then follow changes
+        for todo in todo_manager.list_todos():
+            self.on_todo('load', todo)
+        for reminder in reminder_scheduler.list_reminders():
+            self.on_reminder('load', reminder)
+        todo_manager.add_listener(self.on_todo)
+        reminder_scheduler.add_listener(self.on_reminder)
+    
+    def _slot(self, chat_id: str, time_str: Optional[str]):
+        """(Re)file a chat under its delivery zone and time; None removes it"""
+        old = self._chat_slots.pop(chat_id, None)
+        if old:
+            self._by_time.get(old, set()).discard(chat_id)
+        if time_str:
+            slot = (timezones.get(chat_id), time_str)
+            self._by_time.setdefault(slot, set()).add(chat_id)
+            self._chat_slots[chat_id] = slot
+    
+    def update_timezone(self, chat_id: str):
+        """Follow a chat's time zone change"""
+        with self._lock:
+            pref = self.prefs.get(chat_id)
+            if pref:
+                self._slot(chat_id, pref['time'])
+    
+    def _day(self, chat_id: str, epoch: int) -> date:
+        return localize(epoch, timezones.get(chat_id)).date()
+    
+    def _chat(self, chat_id: str) -> ChatDigest:
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            chat = self.chats[chat_id] = ChatDigest()
+        return chat
+    
+    def on_todo(self, event: str, todo: TodoRecord):
+        """Move one todo's contribution between aggregates (event: load, upsert or delete)"""
+        with self._lock:
+            self.stats['updates'] += 1
+            old = self._todo_keys.pop(todo.id, None)
+            if old:
+                chat = self.chats[old[0]]
+                chat.pending.discard(todo.id)
+                if old[1] is not None:
+                    ids = chat.due.get(old[1])
+                    if ids is not None:
+                        ids.discard(todo.id)
+                        if not ids:
+                            del chat.due[old[1]]
+            
+            if event in ('delete', 'archive') or not todo.chat_id:
+                return
+            chat = self._chat(todo.chat_id)
+            if todo.status == Status.PENDING:
+                day = due_day(todo)
+                chat.pending.add(todo.id)
+                if day is not None:
+                    chat.due.setdefault(day, set()).add(todo.id)
+                self._todo_keys[todo.id] = (todo.chat_id, day)
+            elif (old or event == 'load') and todo.status == Status.COMPLETED and todo.completed_at:
+                chat.note_done('todo', todo.id, self._day(todo.chat_id, todo.completed_at))
+    
+    def on_reminder(self, event: str, reminder: ReminderRecord):
+        """Track active reminders per chat and the ones that finished today"""
+        with self._lock:
+            self.stats['updates'] += 1
+            old_chat = self._reminder_keys.pop(reminder.id, None)
+            if old_chat:
+                self.chats[old_chat].reminders.discard(reminder.id)
+            
+            if event in ('delete', 'archive') or not reminder.phone_number:
+                return
+            chat = self._chat(reminder.phone_number)
+            if reminder.status == Status.ACTIVE:
+                chat.reminders.add(reminder.id)
+                self._reminder_keys[reminder.id] = reminder.phone_number
+            elif (old_chat or event == 'load') and reminder.status == Status.COMPLETED and reminder.last_triggered:
+                chat.note_done('reminder', reminder.id, self._day(reminder.phone_number, reminder.last_triggered))
+    
+    def build_digest(self, chat_id: str, today: date = None) -> Dict[str, Any]:
+        """Read a chat's aggregates into a digest; touches only its live items"""
+        today = today or timezones.now(chat_id).date()
+        tomorrow = today + timedelta(days=1)
+        with self._lock:
+            chat = self.chats.get(chat_id) or ChatDigest()
+            overdue_ids = sorted(i for day, ids in chat.due.items() if day < today for i in ids)
+            tomorrow_ids = sorted(chat.due.get(tomorrow, ()))
+            reminder_ids = sorted(chat.reminders)
+            done = list(chat.done_on(today))
+            pending = len(chat.pending)
+        
+        todos = lambda ids: [t for t in map(todo_manager.get_todo, ids) if t]
+        done_items = [todo_manager.get_todo(i) if kind == 'todo' else reminder_scheduler.get_reminder(i)
+                      for kind, i in done]
+        return {
+            'date': today.isoformat(),
+            'pending': pending,
+            'overdue': todos(overdue_ids),
+            'due_tomorrow': todos(tomorrow_ids),
+            'reminders_tomorrow': [r for r in map(reminder_scheduler.get_reminder, reminder_ids)
+                                   if r and reminder_fires_on(r, tomorrow)],
+            'completed_today': [item for item in done_items if item]
+        }
+    
+    def format_digest(self, digest: Dict[str, Any]) -> str:
+        """Format a digest for chat display"""
+        result = f"📊 Daily digest — {digest['date']}\n\n⏳ Pending tasks: {digest['pending']}"
+        sections = [
+            ("⚠️ Overdue", digest['overdue'], lambda t: f"{t.id}. {t.task} (due {t['due_date'][:10]})"),
+            ("📅 Due tomorrow", digest['due_tomorrow'], lambda t: f"{t.id}. {t.task}"),
+            ("⏰ Reminders tomorrow", digest['reminders_tomorrow'], lambda r: f"{r.time} - {r.message}"),
+            ("✅ Completed today", digest['completed_today'],
+             lambda i: i.task if isinstance(i, TodoRecord) else f"⏰ {i.message}"),
+        ]
+        for title, items, label in sections:
+            if not items:
+                continue
+            lines = [f"• {label(item)}" for item in items[:MAX_LISTED]]
+            if len(items) > MAX_LISTED:
+                lines.append(f"… and {len(items) - MAX_LISTED} more")
+            result += f"\n\n{title}: {len(items)}\n" + "\n".join(lines)
+        return result
+    
+    def subscribe(self, chat_id: str, time_str: str = None, email: str = None) -> Dict[str, Any]:
+        """Turn the daily digest on for a chat (optionally also by email)"""
+        with self._lock:
+            pref = dict(self.prefs.get(chat_id) or {'time': settings.digest_default_time, 'email': None})
+            if time_str:
+                datetime.strptime(time_str, "%H:%M")
+                pref['time'] = time_str
+            if email is not None:
+                pref['email'] = email or None
+            self.prefs[chat_id] = pref
+            self._slot(chat_id, pref['time'])
+            self.store.mark_dirty()
+            return pref
+    
+    def unsubscribe(self, chat_id: str) -> bool:
+        """Turn the daily digest off for a chat"""
+        with self._lock:
+            pref = self.prefs.pop(chat_id, None)
+            if not pref:
+                return False
+            self._slot(chat_id, None)
+            self.store.mark_dirty()
+            return True
+    
+    def send_digest(self, chat_id: str) -> Dict[str, Any]:
+        """Build and deliver one chat's digest over Telegram and/or email"""
+        digest = self.build_digest(chat_id)
+        text = self.format_digest(digest)
+        result = {'chat': message_pipeline.send(chat_id, text)}
+        
+        email = self.prefs.get(chat_id, {}).get('email')
+        if email:
+            result['email'] = email_sender.send_template_email(email, "digest", {
+                'digest': digest,
+                'text': text
+            })
+        self.stats['digests_sent'] += 1
+        logger.info(f"Sent digest to chat {chat_id}")
+        return result
+    
+    def run_due(self, instant: float):
+        """Send digests to every chat whose local HH:MM is this minute"""
+        with self._lock:
+            zones = {zone for zone, _ in self._by_time}
+            chat_ids = []
+            for zone in zones:
+                minute = localize(instant, zone).strftime("%H:%M")
+                chat_ids.extend(self._by_time.get((zone, minute), ()))
+        for chat_id in chat_ids:
+            try:
+                with tracer.span("digest", chat_id=chat_id):
+                    self.send_digest(chat_id)
+            except Exception as e:
+                logger.error(f"Error sending digest to {chat_id}: {e}")
+    
+    def start(self):
+        """Start the once-a-minute digest loop in a separate thread"""
+        if not self.running:
+            self.running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            logger.info("Digest scheduler started")
+    
+    def stop(self):
+        """Stop the digest loop"""
+        self.running = False
+        if self._thread:
+            self._thread.join()
+        self.store.close()
+        logger.info("Digest scheduler stopped")
+    
+    def _run(self):
+        last = int(time.time()) // 60 * 60
+        while self.running:
+            time.sleep(1)
+            now = int(time.time()) // 60 * 60
+            # Walk every minute since the last tick so a slow send never skips a slot
+            while last < now:
+                last += 60
+                self.run_due(last)
+
+# Global digest manager instance
+digest_manager = DigestManager()
@@ -1,12 +1,28 @@
+import os
+import base64
 import smtplib
 import logging
+import mimetypes
+from email.mime.base import MIMEBase
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional, Dict, Any
+from email.policy import compat32
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 from app.config.settings import settings
+from app.core.tracing import tracer
+from app.modules.email_templates import email_templates
+from app.modules.attachments import attachment_store
 
 logger = logging.getLogger(__name__)
 
+# SMTP wants CRLF line endings
+SMTP_POLICY = compat32.clone(linesep="\r\n")
+# Raw bytes per read: a multiple of 57, so every base64 line is a full 76 characters
+ATTACHMENT_READ_SIZE = 57 * 1024
+
+def format_size(size: int) -> str:
+    return f"{size / 2 ** 20:.1f} MB" if size >= 2 ** 20 else f"{size / 1024:.0f} KB"
+
 class EmailSender:
     def __init__(self):
         self.smtp_server = settings.smtp_server
@@ -14,27 +30,93 @@ class EmailSender:
         self.username = settings.smtp_username
         self.password = settings.smtp_password
         
+    def _build_message(self, to_email: str, subject: str, parts: List[Tuple[str, str]],
+                       from_name: str = None, multipart: str = 'mixed') -> MIMEMultipart:
+        """Build a MIME message from (body, subtype) parts"""
+        msg = MIMEMultipart(multipart)
+        msg['From'] = f"{from_name or 'WhatsApp Bot'} <{self.username}>"
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        # For alternatives the least preferred part goes first (RFC 2046)
+        for body, subtype in parts:
+            msg.attach(MIMEText(body, subtype))
+        return msg
+    
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        server.starttls()
+        server.login(self.username, self.password)
+        return server
+    
+    def _deliver(self, to_email: str, msg: MIMEMultipart):
+        """Log in to the SMTP server and send a built message"""
+        with tracer.span("smtp.deliver", new_trace=False, server=self.smtp_server):
+            server = self._connect()
+            server.sendmail(self.username, to_email, msg.as_string())
+            server.quit()
+    
+    def _stream_message(self, to_email: str, subject: str, body: str, attachments: List[Tuple[str, str]],
+                        from_name: str = None) -> Iterator[bytes]:
+        """Yield a multipart/mixed message piece by piece, base64-encoding (path, name) attachments as they are read.
+        
+        Text pieces are dot-stuffed for SMTP DATA; base64 lines never start with '.'.
+        """
+        boundary = f"==============={os.urandom(12).hex()}=="
+        headers = [
+            ('From', f"{from_name or 'WhatsApp Bot'} <{self.username}>"),
+            ('To', to_email),
+            ('Subject', subject),
+            ('MIME-Version', '1.0'),
+            ('Content-Type', f'multipart/mixed; boundary="{boundary}"')
+        ]
+        text = MIMEText(body, 'plain')
+        del text['MIME-Version']
+        yield smtplib.quotedata("".join(SMTP_POLICY.fold(key, value) for key, value in headers) + "\r\n"
+                                + f"--{boundary}\r\n" + text.as_string(policy=SMTP_POLICY) + "\r\n").encode()
+        
+        for path, name in attachments:
+            maintype, subtype = (mimetypes.guess_type(name)[0] or 'application/octet-stream').split('/', 1)
+            part = MIMEBase(maintype, subtype)
+            del part['MIME-Version']
+            part['Content-Transfer-Encoding'] = 'base64'
+            part.add_header('Content-Disposition', 'attachment', filename=name)
+            yield smtplib.quotedata(f"--{boundary}\r\n" + part.as_string(policy=SMTP_POLICY)).encode()
+            with open(path, 'rb') as f:
+                while True:
+                    block = f.read(ATTACHMENT_READ_SIZE)
+                    if not block:
+                        break
+                    yield base64.encodebytes(block).replace(b"\n", b"\r\n")
+        yield f"\r\n--{boundary}--\r\n".encode()
+    
+    def _deliver_stream(self, to_email: str, chunks: Iterator[bytes]):
+        """Send a message to the SMTP socket as it is generated, without building it in memory"""
+        with tracer.span("smtp.deliver", new_trace=False, server=self.smtp_server, streamed=True):
+            server = self._connect()
+            try:
+                server.ehlo_or_helo_if_needed()
+                code, response = server.mail(self.username)
+                if code != 250:
+                    raise smtplib.SMTPSenderRefused(code, response, self.username)
+                code, response = server.rcpt(to_email)
+                if code not in (250, 251):
+                    raise smtplib.SMTPRecipientsRefused({to_email: (code, response)})
+                code, response = server.docmd("data")
+                if code != 354:
+                    raise smtplib.SMTPDataError(code, response)
+                for chunk in chunks:
+                    server.send(chunk)
+                server.send(b".\r\n")
+                code, response = server.getreply()
+                if code != 250:
+                    raise smtplib.SMTPDataError(code, response)
+            finally:
+                server.quit()
+    
     def send_email(self, to_email: str, subject: str, body: str, from_name: str = None) -> Dict[str, Any]:
         """Send an email via SMTP"""
         try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = f"{from_name or 'WhatsApp Bot'} <{self.username}>"
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            # Add body
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Connect to SMTP server
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.username, self.password)
-            
-            # Send email
-            text = msg.as_string()
-            server.sendmail(self.username, to_email, text)
-            server.quit()
+            self._deliver(to_email, self._build_message(to_email, subject, [(body, 'plain')], from_name))
             
             logger.info(f"Email sent successfully to {to_email}")
             return {
@@ -50,28 +132,56 @@ class EmailSender:
                 "error": str(e)
             }
     
-    def send_html_email(self, to_email: str, subject: str, html_body: str, from_name: str = None) -> Dict[str, Any]:
-        """Send an HTML email via SMTP"""
+    def send_attachment_email(self, to_email: str, subject: str, body: str, path: str, name: str = None,
+                              from_name: str = None) -> Dict[str, Any]:
+        """Send a file as an attachment, streamed from disk.
+        
+        Files over EMAIL_ATTACHMENT_MAX_MB go as a download link in the body
+        instead (when PUBLIC_BASE_URL is set).
+        """
+        name = name or os.path.basename(path)
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['From'] = f"{from_name or 'WhatsApp Bot'} <{self.username}>"
-            msg['To'] = to_email
-            msg['Subject'] = subject
+            size = os.path.getsize(path)
+            if size > settings.email_attachment_max_mb * 2 ** 20:
+                link = attachment_store.link_for(path)
+                if not link:
+                    return {
+                        "success": False,
+                        "error": f"{name} ({format_size(size)}) is over the {settings.email_attachment_max_mb:g} MB "
+                                 f"attachment limit and PUBLIC_BASE_URL isn't set for a download link"
+                    }
+                body = f"{body}\n\n📎 {name} ({format_size(size)}): {link}".strip()
+                result = self.send_email(to_email, subject, body, from_name)
+                if result['success']:
+                    result.update(linked=True, size=size)
+                return result
             
-            # Add HTML body
-            html_part = MIMEText(html_body, 'html')
-            msg.attach(html_part)
+            self._deliver_stream(to_email, self._stream_message(to_email, subject, body, [(path, name)], from_name))
             
-            # Connect to SMTP server
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.username, self.password)
+            logger.info(f"Email with attachment {name} ({size} bytes) sent successfully to {to_email}")
+            return {
+                "success": True,
+                "message": f"Email sent to {to_email}",
+                "subject": subject,
+                "attachment": name,
+                "size": size,
+                "linked": False
+            }
             
-            # Send email
-            text = msg.as_string()
-            server.sendmail(self.username, to_email, text)
-            server.quit()
+        except Exception as e:
+            logger.error(f"Failed to send email with attachment {name}: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def send_html_email(self, to_email: str, subject: str, html_body: str, from_name: str = None,
+                        text_body: str = None) -> Dict[str, Any]:
+        """Send an HTML email via SMTP, optionally with a plain-text alternative"""
+        try:
+            parts = [(text_body, 'plain')] if text_body else []
+            parts.append((html_body, 'html'))
+            self._deliver(to_email, self._build_message(to_email, subject, parts, from_name, 'alternative'))
             
             logger.info(f"HTML email sent successfully to {to_email}")
             return {
@@ -87,13 +197,31 @@ class EmailSender:
                 "error": str(e)
             }
     
+    def build_template_message(self, to_email: str, template_name: str, context: Dict[str, Any] = None,
+                               subject: str = None, from_name: str = None) -> MIMEMultipart:
+        """Render a named template for one recipient into a ready-to-send message (raises on template errors)"""
+        rendered = email_templates.render(template_name, context, subject)
+        return self._build_message(to_email, rendered.subject, [(rendered.text, 'plain'), (rendered.html, 'html')],
+                                   from_name, 'alternative')
+    
+    def send_template_email(self, to_email: str, template_name: str, context: Dict[str, Any] = None,
+                            subject: str = None, from_name: str = None, include_text: bool = True) -> Dict[str, Any]:
+        """Render a named template for one recipient and send it"""
+        try:
+            rendered = email_templates.render(template_name, context, subject)
+        except Exception as e:
+            logger.error(f"Failed to render email template {template_name}: {e}")
+            return {
+                "success": False,
+                "error": f"Template error: {e}"
+            }
+        return self.send_html_email(to_email, rendered.subject, rendered.html, from_name,
+                                    text_body=rendered.text if include_text else None)
+    
     def test_connection(self) -> bool:
         """Test SMTP connection"""
         try:
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.username, self.password)
-            server.quit()
+            self._connect().quit()
             return True
         except Exception as e:
             logger.error(f"SMTP connection test failed: {e}")
@@ -0,0 +1,114 @@
+import re
+import html
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_SUBJECT_RE = re.compile(r"{%-?\s*block\s+subject\s*-?%}(.*?){%-?\s*endblock(?:\s+subject)?\s*-?%}", re.S)
+_DROP_RE = re.compile(r"<(head|style|script)\b.*?</\1\s*>", re.S | re.I)
+_LINK_RE = re.compile(r"<a\b[^>]*\bhref\s*=\s*[\"']([^\"']*)[\"'][^>]*>(.*?)</a\s*>", re.S | re.I)
+_BLOCK_RE = re.compile(r"</(p|div|h[1-6]|table|ul|ol)\s*>", re.I)
+_BREAK_RE = re.compile(r"<br\s*/?>|</tr\s*>", re.I)
+_ITEM_RE = re.compile(r"<li\b[^>]*>", re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+_LINE_SPACE_RE = re.compile(r"[ \t]*\n[ \t]*")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+def tidy_text(text: str) -> str:
+    """Strip the spaces and blank-line runs that Jinja tags leave in plain text"""
+    return _BLANK_LINES_RE.sub("\n\n", _LINE_SPACE_RE.sub("\n", text)).strip() + "\n"
+
+def html_to_text(source: str) -> str:
+    """Turn HTML template source into a plain-text template source.
+    
+    Only HTML markup is touched, so Jinja expressions survive and the
+    result can be compiled as its own template.
+    """
+    # Source layout whitespace means nothing in HTML; only markup breaks lines
+    text = re.sub(r"\s+", " ", _DROP_RE.sub("", source))
+    text = _LINK_RE.sub(lambda m: f"{m.group(2)} ({m.group(1)})", text)
+    text = _ITEM_RE.sub("\n• ", text)
+    text = _BLOCK_RE.sub("\n\n", text)
+    text = _BREAK_RE.sub("\n", text)
+    text = _TAG_RE.sub("", text)
+    text = html.unescape(text)
+    return tidy_text(text)
+
+class CompiledTemplate(NamedTuple):
+    mtime: float
+    subject: Optional[Template]
+    html: Template
+    text: Template
+
+class RenderedEmail(NamedTuple):
+    subject: str
+    html: str
+    text: str
+
+class EmailTemplateRegistry:
+    """Named email templates, compiled once and recompiled when the file changes"""
+    
+    def __init__(self, template_dir: str = None):
+        self.template_dir = Path(template_dir or settings.email_template_dir)
+        loader = FileSystemLoader(str(self.template_dir))
+        # Includes/extends resolve through the loader; autoescape only for HTML
+        self.html_env = Environment(loader=loader, autoescape=select_autoescape(default=True))
+        self.text_env = Environment(loader=loader, autoescape=False)
+        self._cache: Dict[str, CompiledTemplate] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'compiles': 0}
+    
+    def _path(self, name: str) -> Path:
+        path = (self.template_dir / f"{name}.html").resolve()
+        if self.template_dir.resolve() not in path.parents:
+            raise ValueError(f"Invalid template name: {name}")
+        return path
+    
+    def list_templates(self) -> List[str]:
+        """Names of the available templates"""
+        return sorted(path.stem for path in self.template_dir.glob("*.html"))
+    
+    def get(self, name: str) -> CompiledTemplate:
+        """Return the compiled template, recompiling only if its mtime changed"""
+        path = self._path(name)
+        mtime = path.stat().st_mtime
+        cached = self._cache.get(name)
+        if cached and cached.mtime == mtime:
+            self.stats['hits'] += 1
+            return cached
+        
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached and cached.mtime == mtime:
+                return cached
+            source = path.read_text(encoding='utf-8')
+            match = _SUBJECT_RE.search(source)
+            subject = self.text_env.from_string(match.group(1).strip()) if match else None
+            body = _SUBJECT_RE.sub("", source, count=1).strip()
+            compiled = CompiledTemplate(
+                mtime=mtime,
+                subject=subject,
+                html=self.html_env.from_string(body),
+                # The text alternative is derived once per template version
+                text=self.text_env.from_string(html_to_text(body))
+            )
+            self._cache[name] = compiled
+            self.stats['compiles'] += 1
+            logger.info(f"Compiled email template: {name}")
+            return compiled
+    
+    def render(self, name: str, context: Dict[str, Any] = None, subject: str = None) -> RenderedEmail:
+        """Render subject, HTML and text bodies for one recipient"""
+        compiled = self.get(name)
+        context = context or {}
+        if subject is None:
+            subject = compiled.subject.render(context).strip() if compiled.subject else name
+        return RenderedEmail(subject, compiled.html.render(context), tidy_text(compiled.text.render(context)))
+
+# Global email template registry instance
+email_templates = EmailTemplateRegistry()
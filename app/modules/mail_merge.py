@@ -0,0 +1,307 @@
+import io
+import csv
+import json
+import time
+import uuid
+import smtplib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+from pathlib import Path
+from app.config.settings import settings
+from app.core.rate_limiter import RateLimiter
+from app.core.storage import JsonStore
+from app.core.tracing import tracer
+from app.modules.email_sender import email_sender
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('sent', 'rejected', 'failed')
+
+def parse_recipients(text: str) -> List[Dict[str, str]]:
+    """Parse CSV with a header row; the `email` column is required, other columns become template variables"""
+    reader = csv.DictReader(io.StringIO(text.strip()))
+    if not reader.fieldnames or "email" not in [name.strip().lower() for name in reader.fieldnames]:
+        raise ValueError("The first line must be a CSV header with an email column, e.g. email,name")
+    rows = {}
+    for row in reader:
+        row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+        if "@" in row.get("email", ""):
+            rows.setdefault(row["email"].lower(), row)
+    return list(rows.values())
+
+class MailMergeManager:
+    """Send one email template to many recipients, each with their own variables.
+    
+    Works like BroadcastManager: jobs run in the background, record every
+    recipient's outcome in an append-only progress file, and resume after a
+    restart. Each outcome is written as soon as its send returns, so a crash
+    can only re-send the messages that were in flight. Sends are spread over
+    MAIL_MERGE_CONNECTIONS worker threads, each keeping its own logged-in
+    SMTP session for the whole job, under a shared messages/sec cap.
+    """
+    MAX_ATTEMPTS = 3
+    
+    def __init__(self, data_dir: str = "data/mail_merges", contacts_file: str = "data/contacts.json",
+                 connect: Callable[[], smtplib.SMTP] = None):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.store = JsonStore(Path(contacts_file), lambda: self.groups)
+        self.groups: Dict[str, List[Dict[str, str]]] = self.store.load({})
+        self.connect = connect or email_sender._connect
+        self.rate_limiter = RateLimiter(settings.mail_merge_rate_limit)
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    # Contact groups
+    
+    def save_group(self, name: str, rows: List[Dict[str, str]]) -> int:
+        """Store (or replace) a named recipient list"""
+        with self._lock:
+            self.groups[name.lower()] = rows
+        self.store.mark_dirty()
+        return len(rows)
+    
+    def get_group(self, name: str) -> Optional[List[Dict[str, str]]]:
+        return self.groups.get(name.lower())
+    
+    # Jobs
+    
+    def _job_file(self, job_id: str) -> Path:
+        return self.data_dir / f"{job_id}.json"
+    
+    def _progress_file(self, job_id: str) -> Path:
+        return self.data_dir / f"{job_id}.progress"
+    
+    def _save_job(self, job: Dict[str, Any]):
+        """Persist job metadata (not the per-recipient progress)"""
+        meta = {k: v for k, v in job.items() if not k.startswith('_')}
+        try:
+            with open(self._job_file(job['id']), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Error saving mail merge {job['id']}: {e}")
+    
+    def _load_progress(self, job_id: str) -> Dict[str, str]:
+        """Read the append-only progress log of a job (email -> status)"""
+        done = {}
+        path = self._progress_file(job_id)
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) == 2:
+                        done[parts[0]] = parts[1]
+        return done
+    
+    def create_job(self, template: str, recipients: List[Dict[str, str]], context: Dict[str, Any] = None,
+                   subject: str = None) -> Dict[str, Any]:
+        """Create a mail merge and start sending in the background.
+        
+        Each recipient is a dict with an `email` key; its other keys override
+        `context` when the template is rendered for that recipient.
+        """
+        if not recipients:
+            raise ValueError("No recipients")
+        # Fail now on a missing or broken template, not once per recipient
+        email_sender.build_template_message(recipients[0]['email'], template, {**(context or {}), **recipients[0]},
+                                            subject)
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'template': template,
+            'subject': subject,
+            'context': context or {},
+            'recipients': recipients,
+            'status': 'running',
+            'created_at': datetime.now().isoformat(),
+            'finished_at': None
+        }
+        self._save_job(job)
+        self._start(job, {})
+        logger.info(f"Created mail merge {job['id']} ({template}) to {len(recipients)} recipients")
+        return self.get_job(job['id'])
+    
+    def resume_pending(self) -> int:
+        """Resume mail merges interrupted by a restart, skipping recipients already handled"""
+        resumed = 0
+        for path in self.data_dir.glob("*.json"):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading mail merge {path.name}: {e}")
+                continue
+            if job.get('status') == 'running' and job['id'] not in self.jobs:
+                self._start(job, self._load_progress(job['id']))
+                resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} mail merge(s)")
+        return resumed
+    
+    def _start(self, job: Dict[str, Any], done: Dict[str, str]):
+        """Attach runtime counters to a job and run it on its own thread"""
+        counts = dict.fromkeys(STATUSES, 0)
+        for status in done.values():
+            counts[status] = counts.get(status, 0) + 1
+        job.update({'_counts': counts, '_done': done, '_started': time.monotonic(), '_sent_now': 0,
+                    '_sessions': []})
+        with self._lock:
+            self.jobs[job['id']] = job
+        threading.Thread(target=tracer.wrap(self._run), args=(job,), daemon=True).start()
+    
+    def _run(self, job: Dict[str, Any]):
+        """Spread the sends over the SMTP connections with a bounded window in flight"""
+        done = job['_done']
+        pending = (row for row in job['recipients'] if row['email'] not in done)
+        connections = settings.mail_merge_connections
+        window = connections * 4
+        send_one = tracer.wrap(self._send_one)
+        
+        try:
+            with open(self._progress_file(job['id']), 'a', encoding='utf-8') as progress, \
+                    ThreadPoolExecutor(max_workers=connections) as executor:
+                def send(row: Dict[str, str]):
+                    self._record(job, progress, row['email'], send_one(job, row))
+                
+                in_flight = set()
+                for row in pending:
+                    in_flight.add(executor.submit(send, row))
+                    if len(in_flight) >= window:
+                        self._collect(in_flight)
+                while in_flight:
+                    self._collect(in_flight)
+        except Exception as e:
+            logger.error(f"Mail merge {job['id']} interrupted: {e}")
+            return
+        finally:
+            for server in job['_sessions']:
+                try:
+                    server.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+        
+        elapsed = time.monotonic() - job['_started']
+        job['status'] = 'completed'
+        job['finished_at'] = datetime.now().isoformat()
+        job['messages_per_second'] = round(job['_sent_now'] / elapsed, 2) if elapsed > 0 else 0.0
+        self._save_job(job)
+        logger.info(f"Mail merge {job['id']} completed: {job['_counts']}")
+    
+    def _collect(self, in_flight: set):
+        """Wait for at least one send to finish (re-raising its error)"""
+        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in finished:
+            in_flight.discard(future)
+            future.result()
+    
+    def _record(self, job: Dict[str, Any], progress, email: str, status: str):
+        """Log one outcome as soon as it is known, before that worker sends again"""
+        with self._lock:
+            progress.write(f"{email}\t{status}\n")
+            progress.flush()
+            job['_done'][email] = status
+            job['_counts'][status] += 1
+            job['_sent_now'] += 1
+    
+    def _session(self, job: Dict[str, Any]) -> smtplib.SMTP:
+        """This worker thread's SMTP session for the job, logging in on first use"""
+        server = getattr(self._local, 'server', None)
+        if server is None or getattr(self._local, 'job_id', None) != job['id']:
+            server = self.connect()
+            self._local.server, self._local.job_id = server, job['id']
+            with self._lock:
+                job['_sessions'].append(server)
+        return server
+    
+    def _drop_session(self):
+        server, self._local.server = getattr(self._local, 'server', None), None
+        if server is not None:
+            try:
+                server.close()
+            except OSError:
+                pass
+    
+    def _send_one(self, job: Dict[str, Any], row: Dict[str, str]) -> str:
+        """Render and send to one recipient and classify the outcome"""
+        email = row['email']
+        try:
+            msg = email_sender.build_template_message(email, job['template'], {**job['context'], **row},
+                                                      job.get('subject'))
+        except Exception as e:
+            logger.error(f"Mail merge {job['id']}: could not render for {email}: {e}")
+            return 'failed'
+        payload = msg.as_string()
+        
+        for attempt in range(self.MAX_ATTEMPTS):
+            self.rate_limiter.acquire()
+            try:
+                self._session(job).sendmail(email_sender.username, email, payload)
+                return 'sent'
+            except smtplib.SMTPRecipientsRefused:
+                return 'rejected'
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code >= 500:
+                    logger.warning(f"Mail merge {job['id']}: {email} rejected: {e.smtp_code} {e.smtp_error!r}")
+                    return 'rejected'
+                # 4xx: the server wants us to come back later; a fresh session is cheap insurance
+                self._drop_session()
+            except (smtplib.SMTPException, OSError) as e:
+                logger.warning(f"Mail merge {job['id']}: SMTP session lost sending to {email}: {e}")
+                self._drop_session()
+            time.sleep(0.5 * (attempt + 1))
+        return 'failed'
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a progress report for a mail merge"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            path = self._job_file(job_id)
+            if not path.exists():
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                job = json.load(f)
+            counts = dict.fromkeys(STATUSES, 0)
+            for status in self._load_progress(job_id).values():
+                counts[status] = counts.get(status, 0) + 1
+            throughput = job.get('messages_per_second', 0.0)
+        else:
+            counts = dict(job['_counts'])
+            elapsed = time.monotonic() - job['_started']
+            throughput = round(job['_sent_now'] / elapsed, 2) if elapsed > 0 else 0.0
+        
+        total = len(job['recipients'])
+        processed = sum(counts.values())
+        return {
+            'id': job['id'],
+            'template': job['template'],
+            'status': job['status'],
+            'total': total,
+            'processed': processed,
+            'remaining': total - processed,
+            **counts,
+            'messages_per_second': throughput,
+            'created_at': job['created_at'],
+            'finished_at': job.get('finished_at')
+        }
+    
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """List reports for all known mail merges"""
+        reports = [self.get_job(path.stem) for path in self.data_dir.glob("*.json")]
+        return sorted((r for r in reports if r), key=lambda r: r['created_at'])
+    
+    def format_report(self, report: Dict[str, Any]) -> str:
+        """Format a mail merge report for chat display"""
+        return (
+            f"📨 Mail merge {report['id']} ({report['template']}, {report['status']})\n"
+            f"Progress: {report['processed']}/{report['total']}\n"
+            f"✅ Sent: {report['sent']}\n"
+            f"🚫 Rejected: {report['rejected']}\n"
+            f"❌ Failed: {report['failed']}\n"
+            f"⚡ Throughput: {report['messages_per_second']} msg/s"
+        )
+
+# Global mail merge manager instance
+mail_merge_manager = MailMergeManager()
@@ -0,0 +1,384 @@
+import re
+import time
+import uuid
+import queue
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+from app.config.settings import settings
+from app.core.pipeline import message_pipeline
+from app.core.tracing import tracer
+from app.modules.audio_recorder import audio_recorder
+
+logger = logging.getLogger(__name__)
+
+# Google Meet's pre-join and in-call controls; a local HTML page with the
+# same labels stands in for Meet when testing the pool
+JOIN_BUTTON = re.compile(r"^\s*(join now|ask to join|join)\s*$", re.IGNORECASE)
+NAME_INPUT = 'input[aria-label="Your name"]'
+IN_CALL = 'button[aria-label="Leave call"]'
+LOGIN_URL = "https://accounts.google.com/signin"
+
+BROWSER_ARGS = [
+    "--use-fake-ui-for-media-stream",      # accept the mic/camera prompt
+    "--use-fake-device-for-media-stream",
+    "--disable-dev-shm-usage",
+]
+NAVIGATION_TIMEOUT_MS = 30_000
+ADMIT_TIMEOUT_MS = 300_000  # how long "Ask to join" may wait for the host
+CHECK_INTERVAL = 5.0        # seconds between "still in the call?" checks
+
+ACTIVE_STATUSES = ("queued", "joining", "in_meeting", "recording")
+MAX_FINISHED_JOBS = 200  # finished job reports kept for 'meeting status'
+
+def is_meeting_url(url: str) -> bool:
+    """Only https links on MEETING_ALLOWED_HOSTS (or their subdomains) are opened in the browser"""
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return False
+    host = (parts.hostname or "").lower()
+    allowed = [h.strip().lower() for h in settings.meeting_allowed_hosts.split(",") if h.strip()]
+    return (parts.scheme == "https" and not parts.username and port in (None, 443)
+            and any(host == h or host.endswith("." + h) for h in allowed))
+
+class MeetingManager:
+    """Meeting join/record jobs run on a pool of pre-launched headless browsers.
+    
+    Each worker thread owns one warm Playwright browser (the sync API is
+    bound to the thread that started it) and opens a fresh context per job
+    from the saved login state. The number of workers caps concurrent
+    meetings, and a browser is relaunched after `recycle_after` jobs so
+    long-running processes don't accumulate memory.
+    """
+    
+    def __init__(self, size: int = None, recycle_after: int = None,
+                 state_file: str = None, notify: Callable[[str, str], Any] = None,
+                 allow_url: Callable[[str], bool] = None):
+        self.size = size if size is not None else settings.meeting_pool_size
+        self.recycle_after = recycle_after or settings.meeting_recycle_after
+        self.state_file = Path(state_file or settings.meeting_state_file)
+        self.notify = notify or message_pipeline.send_text
+        self.allow_url = allow_url or is_meeting_url
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._by_chat: Dict[str, str] = {}
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._login_lock = threading.Lock()
+        self._login_attempted = False
+        self.running = False
+        self.warm = 0  # browsers currently launched
+        self.error: Optional[str] = None
+        self.stats = {'launches': 0, 'recycles': 0, 'joined': 0, 'failed': 0, 'launch_ms': 0.0}
+    
+    def start(self):
+        """Start the worker threads; each launches its browser right away"""
+        if self.running or self.size <= 0:
+            return
+        self.running = True
+        for index in range(self.size):
+            worker = threading.Thread(target=self._worker, args=(index,), daemon=True,
+                                      name=f"meeting-{index}")
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Meeting pool started with {self.size} browser(s)")
+    
+    def stop(self):
+        """Leave every meeting and close the browsers"""
+        if not self.running:
+            return
+        self.running = False
+        with self._lock:
+            for job in self.jobs.values():
+                job['_leave'].set()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=30)
+        self._workers = []
+        logger.info("Meeting pool stopped")
+    
+    def submit(self, chat_id: str, url: str, kind: str = "join") -> Dict[str, Any]:
+        """Queue a join (or record) job for a chat; one active meeting per chat"""
+        if not self.running:
+            return {"error": "Meeting automation is not running"}
+        if not self.allow_url(url):
+            hosts = ", ".join(h.strip() for h in settings.meeting_allowed_hosts.split(",") if h.strip())
+            return {"error": f"Not a meeting link: {url} (https links on {hosts} only)"}
+        
+        with self._lock:
+            current = self.get_active(chat_id)
+            if current:
+                return {"error": f"Already in a meeting ({current['url']}). Use 'meeting leave' first"}
+            job = {
+                'id': uuid.uuid4().hex[:12],
+                'chat_id': chat_id,
+                'kind': kind,
+                'url': url,
+                'status': 'queued',
+                'created_at': datetime.now().isoformat(),
+                'joined_at': None,
+                'finished_at': None,
+                'error': None,
+                '_leave': threading.Event(),
+                '_trace': tracer.current()
+            }
+            self._prune()
+            self.jobs[job['id']] = job
+            self._by_chat[chat_id] = job['id']
+            busy = sum(1 for j in self.jobs.values() if j['status'] in ACTIVE_STATUSES) - 1
+        
+        self._queue.put(job)
+        logger.info(f"Queued meeting {kind} {job['id']} for chat {chat_id}")
+        return {**self.report(job), 'waiting_for_browser': busy >= self.size}
+    
+    def _prune(self):
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS"""
+        finished = [job_id for job_id, job in self.jobs.items() if job['status'] not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+    
+    def get_active(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """The chat's queued or running meeting job, if any"""
+        job = self.jobs.get(self._by_chat.get(chat_id, ""))
+        return job if job and job['status'] in ACTIVE_STATUSES else None
+    
+    def leave(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """Ask the worker running the chat's meeting to hang up"""
+        job = self.get_active(chat_id)
+        if job is None:
+            return None
+        job['_leave'].set()
+        return self.report(job)
+    
+    def report(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in job.items() if not k.startswith('_')}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = sum(1 for job in self.jobs.values() if job['status'] in ACTIVE_STATUSES)
+        return {
+            **self.stats,
+            'size': self.size,
+            'warm': self.warm,
+            'active': active,
+            'queued': self._queue.qsize(),
+            'error': self.error
+        }
+    
+    def _progress(self, job: Dict[str, Any], text: str):
+        """Send a progress line to the chat that started the job"""
+        try:
+            self.notify(job['chat_id'], text)
+        except Exception as e:
+            logger.error(f"Error sending meeting progress to {job['chat_id']}: {e}")
+    
+    def _set_status(self, job: Dict[str, Any], status: str, **fields):
+        """Change a job's status under the lock its readers take"""
+        with self._lock:
+            job['status'] = status
+            job.update(fields)
+    
+    def _finish(self, job: Dict[str, Any], status: str, error: str = None, **fields):
+        with self._lock:
+            job['status'] = status
+            job['error'] = error
+            job.update(fields)
+            job['finished_at'] = datetime.now().isoformat()
+            if self._by_chat.get(job['chat_id']) == job['id']:
+                del self._by_chat[job['chat_id']]
+    
+    def _launch(self, playwright):
+        """Launch one headless browser and record how long it took"""
+        start = time.perf_counter()
+        browser = playwright.chromium.launch(headless=settings.meeting_headless, args=BROWSER_ARGS)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats['launches'] += 1
+            self.stats['launch_ms'] = round(elapsed_ms, 1)
+            self.warm += 1
+        logger.info(f"Launched meeting browser in {elapsed_ms:.0f} ms")
+        return browser
+    
+    def _close(self, browser):
+        with self._lock:
+            self.warm -= 1
+        try:
+            browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing meeting browser: {e}")
+    
+    def _worker(self, index: int):
+        """Keep one browser warm and run jobs on it, relaunching every recycle_after jobs"""
+        try:
+            from playwright.sync_api import sync_playwright
+        except ImportError:
+            self.error = "playwright is not installed"
+            logger.error("Meeting pool needs playwright: pip install playwright && playwright install chromium")
+            self._drain()
+            return
+        
+        with sync_playwright() as playwright:
+            browser, uses = None, 0
+            while True:
+                if browser is None and self.running:
+                    try:
+                        browser, uses = self._launch(playwright), 0
+                    except Exception as e:
+                        self.error = f"Browser launch failed: {e}"
+                        logger.error(f"Meeting worker {index}: {self.error}")
+                
+                job = self._queue.get()
+                if job is None:
+                    break
+                if browser is None:
+                    # Launch failed while idle; try once more for this job
+                    try:
+                        browser, uses = self._launch(playwright), 0
+                        self.error = None
+                    except Exception as e:
+                        self._finish(job, 'failed', f"Browser launch failed: {e}")
+                        self.stats['failed'] += 1
+                        self._progress(job, f"❌ Couldn't start a browser: {e}")
+                        continue
+                
+                with tracer.span("meeting.job", parent=job['_trace'], job_id=job['id'], kind=job['kind']):
+                    self._run_job(browser, job)
+                uses += 1
+                if uses >= self.recycle_after or not browser.is_connected():
+                    self._close(browser)
+                    browser = None
+                    self.stats['recycles'] += 1
+            
+            if browser is not None:
+                self._close(browser)
+    
+    def _drain(self):
+        """Fail queued jobs when no browser can ever run them"""
+        while True:
+            try:
+                job = self._queue.get(timeout=1)
+            except queue.Empty:
+                if not self.running:
+                    return
+                continue
+            if job is None:
+                return
+            self._finish(job, 'failed', self.error)
+            self._progress(job, f"❌ Meeting automation unavailable: {self.error}")
+    
+    def _new_context(self, browser):
+        """Open a context from the saved login, logging in once if there is none yet"""
+        with self._login_lock:
+            if (not self.state_file.exists() and not self._login_attempted
+                    and settings.google_meet_email and settings.google_meet_password):
+                # One attempt per process; a failed login falls back to guest joins
+                self._login_attempted = True
+                context = browser.new_context()
+                try:
+                    self._login(context.new_page())
+                    self.state_file.parent.mkdir(parents=True, exist_ok=True)
+                    context.storage_state(path=str(self.state_file))
+                    logger.info("Saved meeting login state")
+                except Exception as e:
+                    logger.warning(f"Meeting login failed, joining as a guest: {e}")
+                finally:
+                    context.close()
+        
+        state = str(self.state_file) if self.state_file.exists() else None
+        return browser.new_context(storage_state=state, permissions=["microphone", "camera"])
+    
+    def _login(self, page):
+        """Sign in to the Google account configured for meetings"""
+        page.goto(LOGIN_URL, timeout=NAVIGATION_TIMEOUT_MS)
+        page.fill('input[type="email"]', settings.google_meet_email)
+        page.click("#identifierNext")
+        page.locator('input[type="password"]').wait_for(timeout=NAVIGATION_TIMEOUT_MS)
+        page.fill('input[type="password"]', settings.google_meet_password)
+        page.click("#passwordNext")
+        page.wait_for_url(re.compile(r"^https://myaccount\.google\.com/"), timeout=NAVIGATION_TIMEOUT_MS)
+    
+    def _join(self, page, job: Dict[str, Any]):
+        """Fill the pre-join screen, mute, and wait until we're in the call"""
+        page.goto(job['url'], wait_until="domcontentloaded", timeout=NAVIGATION_TIMEOUT_MS)
+        name = page.locator(NAME_INPUT)
+        if name.count():
+            name.first.fill(settings.meeting_display_name)
+        # Microphone and camera off before joining
+        page.keyboard.press("Control+d")
+        page.keyboard.press("Control+e")
+        page.get_by_role("button", name=JOIN_BUTTON).first.click(timeout=NAVIGATION_TIMEOUT_MS)
+        
+        in_call = page.locator(IN_CALL).first
+        try:
+            in_call.wait_for(timeout=3000)
+        except Exception:
+            self._progress(job, "🙋 Asked to join — waiting for the host to let me in...")
+            in_call.wait_for(timeout=ADMIT_TIMEOUT_MS)
+    
+    def _run_job(self, browser, job: Dict[str, Any]):
+        """Join, stay until asked to leave (or the call ends), then hang up"""
+        if job['_leave'].is_set():
+            self._finish(job, 'cancelled')
+            return
+        self._set_status(job, 'joining')
+        self._progress(job, f"🔗 Opening {job['url']}...")
+        context = None
+        try:
+            context = self._new_context(browser)
+            page = context.new_page()
+            self._join(page, job)
+        except Exception as e:
+            logger.error(f"Meeting {job['id']} failed to join: {e}")
+            self.stats['failed'] += 1
+            self._finish(job, 'failed', str(e).splitlines()[0])
+            self._progress(job, f"❌ Couldn't join the meeting: {job['error']}")
+            if context is not None:
+                context.close()
+            return
+        
+        self._set_status(job, 'in_meeting', joined_at=datetime.now().isoformat())
+        self.stats['joined'] += 1
+        if job['kind'] == 'record':
+            recording = audio_recorder.start(job['chat_id'])
+            if "error" in recording:
+                self._progress(job, f"⚠️ Joined, but recording failed: {recording['error']}")
+            else:
+                self._set_status(job, 'recording')
+                self._progress(job, "✅ Joined and recording. Send 'meeting stop' to finish.")
+        else:
+            self._progress(job, "✅ Joined the meeting. Send 'meeting leave' to hang up.")
+        
+        reason = "left"
+        deadline = time.monotonic() + settings.meeting_max_minutes * 60
+        try:
+            while not job['_leave'].wait(CHECK_INTERVAL):
+                if not self.running:
+                    reason = "shutdown"
+                    break
+                if time.monotonic() >= deadline:
+                    reason = "time limit"
+                    break
+                if page.is_closed() or not page.locator(IN_CALL).count():
+                    reason = "meeting ended"
+                    break
+            if not page.is_closed() and page.locator(IN_CALL).count():
+                page.locator(IN_CALL).first.click(timeout=5000)
+        except Exception as e:
+            logger.warning(f"Meeting {job['id']} ended with an error: {e}")
+        finally:
+            context.close()
+        
+        self._finish(job, 'completed', ended_by=reason)
+        self._progress(job, f"👋 Left the meeting ({reason}).")
+        if job['kind'] == 'record' and audio_recorder.stop_and_send(job['chat_id']):
+            self._progress(job, "⏳ Finishing the recording...")
+        logger.info(f"Meeting {job['id']} finished: {reason}")
+
+# Global meeting manager instance
+meeting_manager = MeetingManager()
@@ -0,0 +1,151 @@
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Type
+from app.config.settings import settings
+from app.core.storage import JsonStore
+from app.modules.records import Record
+from app.modules.snapshot import SnapshotReader, encode_snapshot, json_to_snapshot, kind_of
+
+logger = logging.getLogger(__name__)
+
+# Marks the slot of a removed record
+_GONE = object()
+
+class RecordSet:
+    """A manager's records, with id lookups, optionally backed by an open snapshot.
+    
+    Records loaded from a snapshot start out undecoded: get(id) finds the
+    slot through the file's header index and decodes that one record,
+    keeping it since callers change records in place. Iterating decodes
+    untouched records on the fly without keeping them, and scan() reads
+    single fields without building records at all. Removing a record
+    leaves a tombstone, so a flush iterating on another thread never skips
+    one. The snapshot file may be replaced by later writes; the open
+    mapping keeps the old copy, which still holds every untouched record.
+    """
+    
+    def __init__(self, records: Iterable[Record] = (), reader: SnapshotReader = None):
+        self.reader = reader
+        self._slots: List = [None] * len(reader) if reader is not None else list(records)
+        # id -> slot for records not looked up through the reader (JSON-loaded, appended, decoded)
+        self._positions: Dict[int, int] = {} if reader is not None else {record.id: slot for slot, record in enumerate(self._slots)}
+        self._live = len(self._slots)
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return self._live
+    
+    def __iter__(self) -> Iterator[Record]:
+        slots = self._slots
+        for slot in range(len(slots)):
+            record = slots[slot]
+            if record is None:
+                record = self.reader[slot]
+            elif record is _GONE:
+                continue
+            yield record
+    
+    def _slot(self, record_id: int) -> Optional[int]:
+        slot = self._positions.get(record_id)
+        if slot is None and self.reader is not None:
+            slot = self.reader.slot_of(record_id)
+        return slot
+    
+    def get(self, record_id: int) -> Optional[Record]:
+        """The record with this id, decoding it on first access"""
+        with self._lock:
+            slot = self._slot(record_id)
+            if slot is None:
+                return None
+            record = self._slots[slot]
+            if record is None:
+                record = self._slots[slot] = self.reader[slot]
+                self._positions[record_id] = slot
+            return None if record is _GONE else record
+    
+    def append(self, record: Record):
+        with self._lock:
+            self._positions[record.id] = len(self._slots)
+            self._slots.append(record)
+            self._live += 1
+    
+    def discard(self, record_ids: Iterable[int]):
+        """Remove records by id (unknown ids are ignored)"""
+        with self._lock:
+            for record_id in record_ids:
+                slot = self._slot(record_id)
+                if slot is not None and self._slots[slot] is not _GONE:
+                    self._slots[slot] = _GONE
+                    self._positions[record_id] = slot
+                    self._live -= 1
+    
+    def scan(self, *names: str) -> Iterator[tuple]:
+        """Yield the named fields of every record; untouched snapshot records are not decoded"""
+        if self.reader is None:
+            return (tuple(getattr(record, name) for name in names) for record in self)
+        return self._scan(names)
+    
+    def _scan(self, names) -> Iterator[tuple]:
+        slots = self._slots
+        for slot, values in enumerate(self.reader.scan(*names)):
+            record = slots[slot]
+            if record is None:
+                yield values
+            elif record is not _GONE:
+                yield tuple(getattr(record, name) for name in names)
+        for record in slots[len(self.reader):]:
+            if record is not _GONE:
+                yield tuple(getattr(record, name) for name in names)
+    
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+
+class JsonRecordStore(JsonStore):
+    """Group-commit store that keeps records in the original JSON file shape"""
+    
+    def __init__(self, path: Path, record_cls: Type[Record], items: Callable[[], List[Record]]):
+        super().__init__(path, lambda: [record.to_dict() for record in items()])
+        self.record_cls = record_cls
+    
+    def load_records(self) -> RecordSet:
+        return RecordSet(self.record_cls.from_dict(item) for item in self.load([]))
+
+class SnapshotStore(JsonStore):
+    """Group-commit store that writes the binary mmap snapshot format"""
+    
+    def __init__(self, path: Path, record_cls: Type[Record], items: Callable[[], List[Record]]):
+        super().__init__(path, items)
+        self.record_cls = record_cls
+        self._records: Optional[RecordSet] = None
+    
+    def _serialize(self) -> bytes:
+        return encode_snapshot(self.record_cls, list(self.snapshot()))
+    
+    def load_records(self) -> RecordSet:
+        """Map the snapshot and keep it open; records are decoded as they are accessed"""
+        try:
+            if self.path.exists():
+                self._records = RecordSet(reader=SnapshotReader(self.path))
+                return self._records
+        except Exception as e:
+            logger.error(f"Error loading {self.path}: {e}")
+        return RecordSet()
+    
+    def close(self):
+        """Flush, then unmap the snapshot the records were loaded from"""
+        super().close()
+        if self._records is not None:
+            self._records.close()
+            self._records = None
+
+def open_record_store(json_path: Path, record_cls: Type[Record], items: Callable[[], List[Record]]) -> JsonStore:
+    """Pick the store for settings.storage_format, migrating JSON to a snapshot once"""
+    if settings.storage_format != "snapshot":
+        return JsonRecordStore(json_path, record_cls, items)
+    
+    snapshot_path = json_path.with_suffix(".snap")
+    if not snapshot_path.exists() and json_path.exists():
+        json_to_snapshot(json_path, snapshot_path, kind_of(record_cls))
+    return SnapshotStore(snapshot_path, record_cls, items)
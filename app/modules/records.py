@@ -0,0 +1,151 @@
+import sys
+import time
+from datetime import date, datetime, timezone
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+class Status(str, Enum):
+    PENDING = "pending"
+    COMPLETED = "completed"
+    ACTIVE = "active"
+    DELETED = "deleted"
+
+class Priority(str, Enum):
+    HIGH = "high"
+    MEDIUM = "medium"
+    LOW = "low"
+
+class Repeat(str, Enum):
+    ONCE = "once"
+    DAILY = "daily"
+    WEEKLY = "weekly"
+    CRON = "cron"
+
+def to_epoch(value: Any) -> Optional[int]:
+    """Convert an ISO timestamp to integer epoch seconds (strings without an offset are local time)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+def to_iso(value: Optional[int]) -> Optional[str]:
+    """Convert epoch seconds back to the ISO string stored in JSON (UTC, with its offset)"""
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+def local_date(value: Any) -> Optional[str]:
+    """Server-local calendar date (YYYY-MM-DD) of an epoch or ISO timestamp, for display"""
+    epoch = to_epoch(value)
+    if epoch is None:
+        return None
+    return date.fromtimestamp(epoch).isoformat()
+
+def now_epoch() -> int:
+    return int(time.time())
+
+def coerce_enum(enum: type, value: Any) -> Any:
+    """Map a stored string onto its shared enum member (unknown values are kept)"""
+    if value is None or isinstance(value, enum):
+        return value
+    try:
+        return enum(value)
+    except ValueError:
+        return sys.intern(str(value))
+
+class Record:
+    """Slotted record that still reads like the JSON dict it came from.
+    
+    ``record['created_at']`` and ``record.get('status')`` return the JSON
+    representation (ISO strings, plain strings); attributes hold the
+    compact form (epoch ints, enum members).
+    """
+    __slots__ = ()
+    FIELDS: Tuple[str, ...] = ()
+    INTEGERS: frozenset = frozenset({'id'})
+    TIMESTAMPS: frozenset = frozenset()
+    ENUMS: Dict[str, type] = {}
+    INTERNED: frozenset = frozenset()
+    DEFAULTS: Dict[str, Any] = {}
+    
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            self[name] = fields.get(name, self.DEFAULTS.get(name))
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Record":
+        return cls(**data)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: self[name] for name in self.FIELDS}
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if key in self.TIMESTAMPS:
+            return to_iso(value)
+        if isinstance(value, Enum):
+            return value.value
+        if isinstance(value, tuple):
+            return list(value)
+        return value
+    
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        if key in self.TIMESTAMPS:
+            value = to_epoch(value)
+        elif key in self.ENUMS:
+            value = coerce_enum(self.ENUMS[key], value)
+        elif key in self.INTERNED and isinstance(value, str):
+            value = sys.intern(value)
+        elif isinstance(value, list):
+            value = tuple(sys.intern(v) if isinstance(v, str) else v for v in value)
+        setattr(self, key, value)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.FIELDS:
+            return default
+        value = self[key]
+        return default if value is None else value
+    
+    @classmethod
+    def field_types(cls) -> Tuple[Tuple[str, str], ...]:
+        """Storage type of each field: int, sym (small repeated set), list or str"""
+        types = []
+        for name in cls.FIELDS:
+            if name in cls.INTEGERS or name in cls.TIMESTAMPS:
+                types.append((name, 'int'))
+            elif name in cls.ENUMS or name in cls.INTERNED:
+                types.append((name, 'sym'))
+            elif isinstance(cls.DEFAULTS.get(name), tuple):
+                types.append((name, 'list'))
+            else:
+                types.append((name, 'str'))
+        return tuple(types)
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+class TodoRecord(Record):
+    __slots__ = ('id', 'task', 'priority', 'status', 'created_at', 'due_date', 'completed_at', 'chat_id')
+    FIELDS = __slots__
+    TIMESTAMPS = frozenset({'created_at', 'completed_at'})
+    ENUMS = {'priority': Priority, 'status': Status}
+    INTERNED = frozenset({'chat_id'})
+    DEFAULTS = {'priority': Priority.MEDIUM, 'status': Status.PENDING}
+
+class ReminderRecord(Record):
+    __slots__ = ('id', 'time', 'message', 'phone_number', 'repeat', 'days', 'status',
+                 'created_at', 'last_triggered', 'cron', 'next_fire', 'tz', 'attempts')
+    FIELDS = __slots__
+    INTEGERS = frozenset({'id', 'attempts'})
+    TIMESTAMPS = frozenset({'created_at', 'last_triggered', 'next_fire'})
+    ENUMS = {'repeat': Repeat, 'status': Status}
+    INTERNED = frozenset({'time', 'phone_number', 'cron', 'tz'})
+    DEFAULTS = {'repeat': Repeat.ONCE, 'status': Status.ACTIVE, 'days': (), 'attempts': 0}
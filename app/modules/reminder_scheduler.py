@@ -1,126 +1,246 @@
-import schedule
 import time
-import json
+import heapq
 import logging
 import threading
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple
 from pathlib import Path
-from app.core.whatsapp_client import whatsapp_client
+from app.core.pipeline import message_pipeline, retryable
+from app.core.tracing import tracer, SpanContext
+from app.core.chat_ids import legacy_chat_ids
+from app.modules.search_index import SearchIndex, SearchResults
+from app.modules.record_store import RecordSet, open_record_store
+from app.modules.records import ReminderRecord, Status, Repeat, local_date, now_epoch
+from app.modules.cron import parse_cron
+from app.modules.timezones import timezones, load_zone, localize, next_transition
 
 logger = logging.getLogger(__name__)
 
+# A reminder whose message couldn't be delivered fires again after this long, doubling
+# per failed attempt up to the cap; after the last attempt the occurrence is dropped
+REMINDER_RETRY_SECONDS = 60
+REMINDER_MAX_RETRY_SECONDS = 3600
+REMINDER_MAX_ATTEMPTS = 8
+
+REPEAT_EMOJI = {
+    Repeat.ONCE: '1️⃣',
+    Repeat.DAILY: '🔄',
+    Repeat.WEEKLY: '📅',
+    Repeat.CRON: '🔁'
+}
+
+def reminder_cron(reminder: ReminderRecord) -> Optional[str]:
+    """Cron expression behind a recurring reminder (None for one-off reminders)"""
+    if reminder.repeat == Repeat.CRON:
+        return reminder.cron
+    if reminder.repeat in (Repeat.DAILY, Repeat.WEEKLY):
+        hour, minute = (int(part) for part in reminder.time.split(":"))
+        days = "*"
+        if reminder.repeat == Repeat.WEEKLY:
+            days = ",".join(day[:3].lower() for day in reminder.days) or "*"
+        return f"{minute} {hour} * * {days}"
+    return None
+
 class ReminderScheduler:
     def __init__(self, data_file: str = "data/reminders.json"):
         self.data_file = Path(data_file)
         self.data_file.parent.mkdir(parents=True, exist_ok=True)
+        self.store = open_record_store(self.data_file, ReminderRecord, lambda: self.reminders)
         self.reminders = self._load_reminders()
         self.next_id = self._get_next_id()
+        self.index = SearchIndex()
+        self.listeners: List[Callable[[str, ReminderRecord], None]] = []
+        # Reminder ids per chat, in id order
+        self._by_chat: Dict[str, Dict[int, None]] = {}
+        # Per-chat data versions, bumped by every change; response caches key on them
+        self.versions: Dict[str, int] = {}
+        # Request, scheduler and retention threads all change reminders; every mutation holds this
+        self._lock = threading.RLock()
+        if legacy_chat_ids.qualify_records(self.reminders, 'phone_number'):
+            self.store.mark_dirty()
+        # (finished_at, id) of completed and deleted reminders, oldest first, for the archive;
+        # entries for reminders changed or evicted since go stale and are dropped when reached
+        self._expiry: List[Tuple[int, int]] = []
+        # Only the fields the indexes need are read; records are decoded when looked up
+        for reminder_id, phone_number, status, message, last_triggered, created_at in self.reminders.scan(
+                'id', 'phone_number', 'status', 'message', 'last_triggered', 'created_at'):
+            self._by_chat.setdefault(phone_number, {})[reminder_id] = None
+            if status != Status.DELETED:
+                self.index.add(reminder_id, message or '')
+            finished_at = self._finished_at(status, last_triggered, created_at)
+            if finished_at is not None:
+                self._expiry.append((finished_at, reminder_id))
+        heapq.heapify(self._expiry)
         self.scheduler_thread = None
         self.running = False
-        
-    def _load_reminders(self) -> List[Dict[str, Any]]:
-        """Load reminders from JSON file"""
-        try:
-            if self.data_file.exists():
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            else:
-                return []
-        except Exception as e:
-            logger.error(f"Error loading reminders: {e}")
-            return []
+        # Timer queue: (next_fire, reminder_id), one entry per active reminder
+        self._timers: List[tuple] = []
+        self._timer_cond = threading.Condition()
+        # Active reminders by time zone, and (transition, zone) timers for DST passes
+        self._zone_index: Dict[str, Set[int]] = {}
+        self._dst_timers: List[tuple] = []
+        self.stats = {'fired': 0, 'dst_passes': 0, 'dst_recomputed': 0}
+        # Trace of the request that created each reminder (in memory only); firing continues it
+        self._origins: Dict[int, SpanContext] = {}
+    
+    def _load_reminders(self) -> RecordSet:
+        """Load reminders from the JSON file (or binary snapshot)"""
+        return self.store.load_records()
     
     def _save_reminders(self):
-        """Save reminders to JSON file"""
-        try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.reminders, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logger.error(f"Error saving reminders: {e}")
+        """Write reminders to disk now (normally the store flushes in the background)"""
+        self.store.flush()
+    
+    def _persist(self):
+        """Mark reminders dirty; the store coalesces writes into one flush"""
+        self.store.mark_dirty()
+    
+    def batch(self):
+        """Group several mutations into a single flush"""
+        return self.store.batch()
+    
+    def add_listener(self, callback: Callable[[str, ReminderRecord], None]):
+        """Call callback(event, reminder) after every change; event is 'upsert', 'delete' or 'archive'"""
+        self.listeners.append(callback)
+    
+    @staticmethod
+    def _finished_at(status, last_triggered: Optional[int], created_at: Optional[int]) -> Optional[int]:
+        """When a reminder became archivable (0 for deleted ones: right away), or None while active"""
+        if status == Status.DELETED:
+            return 0
+        if status == Status.COMPLETED:
+            return last_triggered or created_at or 0
+        return None
+    
+    def _notify(self, event: str, reminder: ReminderRecord):
+        self.versions[reminder.phone_number] = self.versions.get(reminder.phone_number, 0) + 1
+        if event in ('upsert', 'delete'):
+            finished_at = self._finished_at(reminder.status, reminder.last_triggered, reminder.created_at)
+            if finished_at is not None:
+                heapq.heappush(self._expiry, (finished_at, reminder.id))
+        for callback in self.listeners:
+            try:
+                callback(event, reminder)
+            except Exception as e:
+                logger.error(f"Reminder listener failed: {e}")
+    
+    def version_for(self, chat_id: str) -> int:
+        """Version of a chat's reminders"""
+        return self.versions.get(chat_id, 0)
     
     def _get_next_id(self) -> int:
         """Get the next available ID"""
-        if not self.reminders:
-            return 1
-        return max(reminder.get('id', 0) for reminder in self.reminders) + 1
+        return max((reminder_id or 0 for reminder_id, in self.reminders.scan('id')), default=0) + 1
     
     def add_reminder(self, time_str: str, message: str, phone_number: str, 
-                    repeat: str = "once", days: List[str] = None) -> Dict[str, Any]:
-        """Add a new reminder"""
-        reminder = {
-            'id': self.next_id,
-            'time': time_str,
-            'message': message,
-            'phone_number': phone_number,
-            'repeat': repeat,  # once, daily, weekly
-            'days': days or [],  # for weekly reminders
-            'status': 'active',
-            'created_at': datetime.now().isoformat(),
-            'last_triggered': None
-        }
-        
-        self.reminders.append(reminder)
-        self.next_id += 1
-        self._save_reminders()
-        
-        # Schedule the reminder
-        self._schedule_reminder(reminder)
+                    repeat: str = "once", days: List[str] = None, cron: str = None) -> ReminderRecord:
+        """Add a new reminder; repeat="cron" takes a cron expression"""
+        if repeat == Repeat.CRON:
+            cron = parse_cron(cron).expression  # raises ValueError on a bad expression
+        with self._lock:
+            reminder = ReminderRecord(
+                id=self.next_id,
+                time=time_str,
+                message=message,
+                phone_number=phone_number,
+                repeat=repeat,  # once, daily, weekly
+                days=days or [],  # for weekly reminders
+                status=Status.ACTIVE,
+                created_at=now_epoch(),
+                last_triggered=None,
+                cron=cron,
+                next_fire=None,
+                tz=timezones.get(phone_number)
+            )
+            
+            self.reminders.append(reminder)
+            self._by_chat.setdefault(phone_number, {})[reminder.id] = None
+            self.index.add(reminder.id, message)
+            origin = tracer.current()
+            if origin:
+                self._origins[reminder.id] = origin
+            self.next_id += 1
+            self._persist()
+            self._notify('upsert', reminder)
+            
+            # Schedule the reminder
+            self._schedule_reminder(reminder)
+            
+            logger.info(f"Added reminder: {time_str} - {message}")
+            return reminder
+    
+    def _next_fire(self, reminder: ReminderRecord, after: float) -> Optional[int]:
+        """UTC epoch of the next occurrence after `after`, in the reminder's own zone"""
+        wall = localize(after, reminder.tz or "")
+        expression = reminder_cron(reminder)
+        if expression:
+            cron = parse_cron(expression)
+            fire_at = cron.next_fire(wall)
+            # In the hour repeated by a DST fall-back, the next wall time can be an earlier instant
+            while fire_at.timestamp() <= after:
+                fire_at = cron.next_fire(fire_at)
+            return int(fire_at.timestamp())
         
-        logger.info(f"Added reminder: {time_str} - {message}")
-        return reminder
+        fire_at = self.parse_time_string(reminder.time or "", reminder.tz or "")
+        if fire_at is None:
+            return None
+        if len(reminder.time) == 5 and fire_at <= wall:
+            # "18:30" after 18:30 means tomorrow
+            fire_at += timedelta(days=1)
+        return int(fire_at.timestamp())
+    
+    def _index_zone(self, reminder: ReminderRecord):
+        zone = reminder.tz or ""
+        reminder_ids = self._zone_index.get(zone)
+        if reminder_ids is None:
+            reminder_ids = self._zone_index[zone] = set()
+            self._arm_transition(zone, time.time())
+        reminder_ids.add(reminder.id)
     
-    def _schedule_reminder(self, reminder: Dict[str, Any]):
-        """Schedule a reminder using the schedule library"""
+    def _unindex_zone(self, reminder: ReminderRecord):
+        reminder_ids = self._zone_index.get(reminder.tz or "")
+        if reminder_ids is not None:
+            reminder_ids.discard(reminder.id)
+    
+    def _arm_transition(self, zone: str, after: float):
+        """Queue a recompute pass for the zone's next DST transition"""
+        transition = next_transition(zone, after)
+        if transition is not None:
+            with self._timer_cond:
+                heapq.heappush(self._dst_timers, (transition, zone))
+                self._timer_cond.notify()
+    
+    def _schedule_reminder(self, reminder: ReminderRecord):
+        """Put the reminder's next occurrence on the timer queue"""
         try:
-            time_str = reminder['time']
-            message = reminder['message']
-            phone_number = reminder['phone_number']
-            repeat = reminder.get('repeat', 'once')
-            
-            if repeat == 'once':
-                # Parse time string (e.g., "18:30" or "2024-01-15 18:30")
-                if len(time_str) == 5:  # HH:MM format
-                    schedule.every().day.at(time_str).do(
-                        self._send_reminder, phone_number, message, reminder['id']
-                    )
-                else:  # Full datetime format
-                    dt = datetime.fromisoformat(time_str)
-                    schedule.every().day.at(dt.strftime("%H:%M")).do(
-                        self._send_reminder, phone_number, message, reminder['id']
-                    )
-            
-            elif repeat == 'daily':
-                schedule.every().day.at(time_str).do(
-                    self._send_reminder, phone_number, message, reminder['id']
-                )
-            
-            elif repeat == 'weekly' and reminder.get('days'):
-                for day in reminder['days']:
-                    day_map = {
-                        'monday': schedule.every().monday,
-                        'tuesday': schedule.every().tuesday,
-                        'wednesday': schedule.every().wednesday,
-                        'thursday': schedule.every().thursday,
-                        'friday': schedule.every().friday,
-                        'saturday': schedule.every().saturday,
-                        'sunday': schedule.every().sunday
-                    }
-                    if day.lower() in day_map:
-                        day_map[day.lower()].at(time_str).do(
-                            self._send_reminder, phone_number, message, reminder['id']
-                        )
-            
-            logger.info(f"Scheduled reminder {reminder['id']} for {time_str}")
+            self._index_zone(reminder)
+            if reminder.next_fire is None:
+                reminder.next_fire = self._next_fire(reminder, time.time())
+                self._persist()
+            if reminder.next_fire is None:
+                logger.warning(f"Reminder {reminder.id} has no next occurrence: {reminder.time}")
+                return
+            
+            with self._timer_cond:
+                heapq.heappush(self._timers, (reminder.next_fire, reminder.id))
+                self._timer_cond.notify()
+            
+            logger.info(f"Scheduled reminder {reminder.id} for {self.format_next_fire(reminder)}")
             
         except Exception as e:
             logger.error(f"Error scheduling reminder: {e}")
     
     def _send_reminder(self, phone_number: str, message: str, reminder_id: int):
-        """Send reminder via WhatsApp"""
+        """Send reminder over the chat's channel; it only counts as triggered once delivered"""
         try:
-            # Send the reminder message
-            result = whatsapp_client.send_text_message(phone_number, f"⏰ Reminder: {message}")
+            reminder = self.reminders.get(reminder_id)
+            # One key per occurrence: a retry, or a re-fire after a restart, reuses the outbox entry
+            key = f"reminder:{reminder_id}:{reminder.last_triggered or 0}"
+            result = message_pipeline.send(phone_number, f"⏰ Reminder: {message}", key=key)
+            
+            if "error" in result:
+                self._retry_reminder(reminder, result)
+                return result
             
             # Update reminder status
             self._update_reminder_triggered(reminder_id)
@@ -131,43 +251,134 @@ class ReminderScheduler:
         except Exception as e:
             logger.error(f"Error sending reminder {reminder_id}: {e}")
     
+    def _retry_reminder(self, reminder: ReminderRecord, result: Dict[str, Any]):
+        """Fire an undelivered reminder again later with backoff, or give up on this occurrence"""
+        with self._lock:
+            if reminder.status != Status.ACTIVE:
+                return  # deleted while the send was in flight
+            reminder.attempts = (reminder.attempts or 0) + 1
+            if retryable(result) and reminder.attempts < REMINDER_MAX_ATTEMPTS:
+                delay = min(REMINDER_RETRY_SECONDS * 2 ** (reminder.attempts - 1), REMINDER_MAX_RETRY_SECONDS)
+                logger.error(f"Reminder {reminder.id} to {reminder.phone_number} not delivered ({result['error']}); "
+                             f"attempt {reminder.attempts}, retrying in {delay}s")
+                reminder.next_fire = now_epoch() + delay
+                self._persist()
+                self._schedule_reminder(reminder)
+                return
+            logger.error(f"Giving up on reminder {reminder.id} to {reminder.phone_number} after "
+                         f"{reminder.attempts} attempts: {result['error']}")
+            self._advance(reminder)
+    
     def _update_reminder_triggered(self, reminder_id: int):
-        """Update reminder last triggered time"""
-        for reminder in self.reminders:
-            if reminder.get('id') == reminder_id:
-                reminder['last_triggered'] = datetime.now().isoformat()
-                if reminder.get('repeat') == 'once':
-                    reminder['status'] = 'completed'
-                self._save_reminders()
-                break
-    
-    def list_reminders(self, status: str = None) -> List[Dict[str, Any]]:
-        """List all reminders, optionally filtered by status"""
+        """Update reminder last triggered time and queue its next occurrence"""
+        with self._lock:
+            reminder = self.reminders.get(reminder_id)
+            if reminder and reminder.status == Status.ACTIVE:
+                reminder.last_triggered = now_epoch()
+                self._advance(reminder)
+    
+    def _advance(self, reminder: ReminderRecord):
+        """Move past the current occurrence: finish a one-off reminder, or queue the next fire"""
+        reminder.attempts = 0
+        if reminder.repeat == Repeat.ONCE:
+            reminder.status = Status.COMPLETED
+            reminder.next_fire = None
+            self._unindex_zone(reminder)
+        else:
+            # Only the next occurrence is ever stored
+            after = max(reminder.last_triggered or 0, reminder.next_fire or 0, now_epoch())
+            reminder.next_fire = self._next_fire(reminder, after)
+        self._persist()
+        self._notify('upsert', reminder)
+        if reminder.status == Status.ACTIVE:
+            self._schedule_reminder(reminder)
+    
+    def list_reminders(self, status: str = None, phone_number: str = None) -> List[ReminderRecord]:
+        """List reminders, optionally filtered by status and chat"""
+        reminders = self.reminders
+        if phone_number is not None:
+            with self._lock:
+                reminders = [r for r in map(self.reminders.get, self._by_chat.get(phone_number, {})) if r]
         if status:
-            return [r for r in self.reminders if r.get('status') == status]
-        return self.reminders
+            return [r for r in reminders if r.status == status]
+        return reminders
     
-    def get_reminder(self, reminder_id: int) -> Optional[Dict[str, Any]]:
+    def get_reminder(self, reminder_id: int) -> Optional[ReminderRecord]:
         """Get a specific reminder by ID"""
-        for reminder in self.reminders:
-            if reminder.get('id') == reminder_id:
-                return reminder
-        return None
+        return self.reminders.get(reminder_id)
+    
+    def expired_records(self, cutoff: float, limit: int) -> List[ReminderRecord]:
+        """Deleted reminders, and ones that fired for the last time before cutoff, for the archive"""
+        expired: Dict[int, ReminderRecord] = {}
+        with self._lock:
+            live = []
+            while self._expiry and self._expiry[0][0] < cutoff and len(expired) < limit:
+                finished_at, reminder_id = heapq.heappop(self._expiry)
+                reminder = self.reminders.get(reminder_id)
+                if reminder and reminder_id not in expired and \
+                        self._finished_at(reminder.status, reminder.last_triggered, reminder.created_at) == finished_at:
+                    expired[reminder_id] = reminder
+                    live.append((finished_at, reminder_id))
+            # They stay queued until evict() removes them (an archive write can fail)
+            for entry in live:
+                heapq.heappush(self._expiry, entry)
+        return list(expired.values())
+    
+    def evict(self, reminder_ids: List[int]) -> List[ReminderRecord]:
+        """Drop archived reminders from the hot set; their stale timer entries are skipped"""
+        with self._lock:
+            evicted = [reminder for reminder in map(self.reminders.get, reminder_ids)
+                       if reminder and reminder.status in (Status.COMPLETED, Status.DELETED)]
+            if not evicted:
+                return []
+            self.reminders.discard(reminder.id for reminder in evicted)
+            for reminder in evicted:
+                del self._by_chat[reminder.phone_number][reminder.id]
+                self.index.remove(reminder.id)
+                self._origins.pop(reminder.id, None)
+            self._persist()
+            for reminder in evicted:
+                self._notify('archive', reminder)
+            return evicted
+    
+    def search_reminders(self, query: str, phone_number: str = None, limit: int = 20) -> SearchResults:
+        """Find reminders whose message matches every word (or word prefix) in query (see SearchResults.truncated)"""
+        accept = None
+        if phone_number is not None:
+            accept = lambda reminder_id: self.reminders.get(reminder_id).phone_number == phone_number
+        with self._lock:
+            found = self.index.search(query, limit, accept)
+            results = SearchResults(self.reminders.get(reminder_id) for reminder_id, _ in found)
+        results.truncated = found.truncated
+        return results
     
     def delete_reminder(self, reminder_id: int) -> bool:
         """Delete a reminder"""
-        reminder = self.get_reminder(reminder_id)
-        if reminder:
-            reminder['status'] = 'deleted'
-            self._save_reminders()
-            logger.info(f"Deleted reminder {reminder_id}: {reminder['message']}")
-            return True
-        return False
+        with self._lock:
+            reminder = self.get_reminder(reminder_id)
+            if reminder:
+                reminder.status = Status.DELETED
+                reminder.next_fire = None  # its timer entry goes stale and is skipped
+                self._unindex_zone(reminder)
+                self._origins.pop(reminder_id, None)
+                self.index.remove(reminder_id)
+                self._persist()
+                self._notify('delete', reminder)
+                logger.info(f"Deleted reminder {reminder_id}: {reminder.message}")
+                return True
+            return False
     
     def start_scheduler(self):
         """Start the reminder scheduler in a separate thread"""
         if not self.running:
             self.running = True
+            # Re-arm stored reminders; ones missed while down fire right away
+            self._timers = []
+            self._dst_timers = []
+            self._zone_index = {}
+            for reminder_id, status in self.reminders.scan('id', 'status'):
+                if status == Status.ACTIVE:
+                    self._schedule_reminder(self.reminders.get(reminder_id))
             self.scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
             self.scheduler_thread.start()
             logger.info("Reminder scheduler started")
@@ -175,17 +386,111 @@ class ReminderScheduler:
     def stop_scheduler(self):
         """Stop the reminder scheduler"""
         self.running = False
+        with self._timer_cond:
+            self._timer_cond.notify()
         if self.scheduler_thread:
             self.scheduler_thread.join()
         logger.info("Reminder scheduler stopped")
     
     def _run_scheduler(self):
-        """Run the scheduler loop"""
+        """Sleep until the earliest timer (or DST transition) is due, then handle it"""
         while self.running:
-            schedule.run_pending()
-            time.sleep(1)
+            with self._timer_cond:
+                next_timer = self._timers[0][0] if self._timers else float('inf')
+                next_dst = self._dst_timers[0][0] if self._dst_timers else float('inf')
+                delay = min(next_timer, next_dst, time.time() + 60) - time.time()
+                if delay > 0:
+                    # New timers and stop() wake us early; re-check the clock every minute
+                    self._timer_cond.wait(delay)
+                    continue
+                if next_dst <= next_timer:
+                    transition, zone = heapq.heappop(self._dst_timers)
+                else:
+                    fire_at, reminder_id = heapq.heappop(self._timers)
+                    zone = None
+            if zone is not None:
+                self.recompute_zone(zone)
+                self._arm_transition(zone, transition)
+            else:
+                self._fire(fire_at, reminder_id)
+    
+    def recompute_zone(self, zone: str) -> int:
+        """Re-derive upcoming fire instants for one zone's recurring reminders.
+        
+        Runs at each DST transition of the zone; other zones are untouched.
+        Returns the number of reminders whose next instant changed.
+        """
+        with self._lock:
+            now = time.time()
+            changed = 0
+            for reminder_id in list(self._zone_index.get(zone, ())):
+                reminder = self.reminders.get(reminder_id)
+                if (not reminder or reminder.status != Status.ACTIVE or not reminder_cron(reminder)
+                        or not reminder.next_fire or reminder.next_fire <= now):
+                    continue
+                next_fire = self._next_fire(reminder, now)
+                if next_fire != reminder.next_fire:
+                    reminder.next_fire = next_fire
+                    self._notify('upsert', reminder)
+                    with self._timer_cond:
+                        heapq.heappush(self._timers, (next_fire, reminder_id))
+                        self._timer_cond.notify()
+                    changed += 1
+            if changed:
+                self._persist()
+            self.stats['dst_passes'] += 1
+            self.stats['dst_recomputed'] += changed
+            logger.info(f"DST pass for {zone or 'local time'}: {changed} reminders moved")
+            return changed
+    
+    def set_timezone(self, chat_id: str, zone: str) -> str:
+        """Change a chat's time zone and move its active reminders to it"""
+        with self._lock:
+            timezones.set(chat_id, zone)
+            now = time.time()
+            for reminder_ids in list(self._zone_index.values()):
+                for reminder_id in list(reminder_ids):
+                    reminder = self.reminders.get(reminder_id)
+                    if not reminder or reminder.phone_number != chat_id or reminder.tz == zone:
+                        continue
+                    self._unindex_zone(reminder)
+                    reminder.tz = zone
+                    # "18:30" keeps meaning 18:30 on the chat's (new) wall clock
+                    reminder.next_fire = self._next_fire(reminder, now)
+                    self._schedule_reminder(reminder)
+                    self._notify('upsert', reminder)
+            self._persist()
+            return zone
+    
+    def format_next_fire(self, reminder: ReminderRecord) -> str:
+        """Next occurrence as wall-clock time in the reminder's zone"""
+        if not reminder.next_fire:
+            return "-"
+        return localize(reminder.next_fire, reminder.tz or "").strftime("%Y-%m-%d %H:%M")
+    
+    def _fire(self, fire_at: int, reminder_id: int):
+        reminder = self.reminders.get(reminder_id)
+        # Entries left behind by deleted or rescheduled reminders are skipped
+        if not reminder or reminder.status != Status.ACTIVE or reminder.next_fire != fire_at:
+            return
+        self.stats['fired'] += 1
+        # A one-off reminder finishes the trace that set it; each repeat starts its own, pointing back
+        origin = self._origins.get(reminder_id)
+        once = reminder.repeat == Repeat.ONCE
+        try:
+            with tracer.span("reminder.fire", parent=origin if once else None, reminder_id=reminder_id,
+                             repeat=reminder.repeat, origin_trace_id=None if once or not origin else origin.trace_id,
+                             late_ms=round((time.time() - fire_at) * 1000)):
+                self._send_reminder(reminder.phone_number, reminder.message, reminder_id)
+        finally:
+            with self._lock:
+                if reminder.status == Status.ACTIVE and reminder.next_fire == fire_at:
+                    # Neither the next occurrence nor a retry got queued (the send blew up); don't lose the reminder
+                    self._retry_reminder(reminder)
+                if reminder.status != Status.ACTIVE:
+                    self._origins.pop(reminder_id, None)
     
-    def format_reminder_list(self, reminders: List[Dict[str, Any]] = None) -> str:
+    def format_reminder_list(self, reminders: List[ReminderRecord] = None) -> str:
         """Format reminders for WhatsApp display"""
         if reminders is None:
             reminders = self.list_reminders('active')
@@ -193,38 +498,40 @@ class ReminderScheduler:
         if not reminders:
             return "⏰ No active reminders found."
         
-        result = "⏰ Your reminders:\n\n"
+        blocks = []
         for reminder in reminders:
-            status_emoji = "✅" if reminder.get('status') == 'completed' else "⏰"
-            repeat_emoji = {
-                'once': '1️⃣',
-                'daily': '🔄',
-                'weekly': '📅'
-            }.get(reminder.get('repeat', 'once'), '1️⃣')
+            status_emoji = "✅" if reminder.status == Status.COMPLETED else "⏰"
+            repeat_emoji = REPEAT_EMOJI.get(reminder.repeat, '1️⃣')
+            lines = [f"{status_emoji} {repeat_emoji} {reminder.id}. {reminder.time} - {reminder.message}"]
             
-            result += f"{status_emoji} {repeat_emoji} {reminder['id']}. {reminder['time']} - {reminder['message']}\n"
+            if reminder.repeat == Repeat.WEEKLY and reminder.days:
+                lines.append(f"   📅 Days: {', '.join(reminder.days)}")
             
-            if reminder.get('repeat') == 'weekly' and reminder.get('days'):
-                result += f"   📅 Days: {', '.join(reminder['days'])}\n"
+            if reminder.next_fire and reminder.status == Status.ACTIVE:
+                lines.append(f"   ⏭️ Next: {self.format_next_fire(reminder)}")
             
-            if reminder.get('last_triggered'):
-                result += f"   🔔 Last triggered: {reminder['last_triggered'][:10]}\n"
+            if reminder.last_triggered:
+                lines.append(f"   🔔 Last triggered: {local_date(reminder.last_triggered)}")
             
-            result += "\n"
+            blocks.append("\n".join(lines))
         
-        return result.strip()
+        return "⏰ Your reminders:\n\n" + "\n\n".join(blocks)
     
-    def parse_time_string(self, time_str: str) -> Optional[datetime]:
-        """Parse various time string formats"""
+    def parse_time_string(self, time_str: str, tz: str = "") -> Optional[datetime]:
+        """Parse various time string formats as wall-clock time in zone tz"""
         try:
+            zone = load_zone(tz)
             # Try HH:MM format (for today)
             if len(time_str) == 5 and ':' in time_str:
                 hour, minute = map(int, time_str.split(':'))
-                now = datetime.now()
+                now = datetime.now(zone) if zone else datetime.now()
                 return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
             
             # Try full datetime format
-            return datetime.fromisoformat(time_str)
+            parsed = datetime.fromisoformat(time_str)
+            if zone and parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=zone)
+            return parsed
             
         except Exception as e:
             logger.error(f"Error parsing time string '{time_str}': {e}")
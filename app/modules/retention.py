@@ -0,0 +1,167 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from app.config.settings import settings
+from app.core.chat_ids import legacy_chat_ids
+from app.modules.archive import RecordArchive
+from app.modules.records import Record, local_date
+from app.modules.todo_manager import todo_manager
+from app.modules.reminder_scheduler import reminder_scheduler
+
+logger = logging.getLogger(__name__)
+
+class RetentionTier:
+    """One hot store (todos, reminders) and the archive its finished records move to"""
+    
+    def __init__(self, name: str, manager, archive: RecordArchive, owner_field: str, hard_deletes: bool):
+        self.name = name
+        self.manager = manager
+        self.archive = archive
+        self.owner_field = owner_field
+        self.hard_deletes = hard_deletes
+        # Hard deletes whose archive write failed, retried by the next pass
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self.stats = {'archived': 0, 'passes': 0}
+
+class RetentionManager:
+    """Moves finished records out of the hot set into compressed archives.
+    
+    Each pass archives what the managers report as expired (completed or
+    deleted longer ago than `days`; deleted reminders right away),
+    `batch_size` records at a time: append to the archive (durable), then
+    evict from the hot set. A crash in between leaves a record in both
+    places, which the next pass archives again and history() shows once.
+    Hard-deleted todos are appended to the archive as they are deleted,
+    before they leave the store. Passes run on a background thread; the
+    eviction step takes the manager's lock like any other change.
+    """
+    
+    def __init__(self, days: float = None, interval: float = None, batch_size: int = None,
+                 archive_dir: str = None):
+        self.days = settings.retention_days if days is None else days
+        self.interval = interval or settings.retention_interval_seconds
+        self.batch_size = batch_size or settings.retention_batch
+        self.archive_dir = archive_dir or settings.archive_dir
+        self.tiers: Dict[str, RetentionTier] = {}
+        self.running = False
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._pass_lock = threading.Lock()
+    
+    def register(self, name: str, manager, owner_field: str, hard_deletes: bool = False) -> RetentionTier:
+        """Cover a manager that implements expired_records(cutoff, limit) and evict(ids)"""
+        archive = RecordArchive(f"{self.archive_dir}/{name}.jsonl.gz", owner_field)
+        tier = RetentionTier(name, manager, archive, owner_field, hard_deletes)
+        # Archived ids stay taken, even after a restart
+        manager.next_id = max(manager.next_id, archive.max_id + 1)
+        manager.add_listener(lambda event, record: self._on_change(tier, event, record))
+        self.tiers[name] = tier
+        return tier
+    
+    def _on_change(self, tier: RetentionTier, event: str, record: Record):
+        # Soft deletes stay in the hot set until a pass picks them up; hard deletes are
+        # archived now, while the record is still in the store
+        if event == 'delete' and tier.hard_deletes:
+            item = {**record.to_dict(), 'status': 'deleted'}
+            try:
+                tier.archive.append([item])
+                tier.stats['archived'] += 1
+            except OSError as e:
+                logger.error(f"Archiving deleted {tier.name} record {record.id} failed: {e}")
+                tier.pending.append(item)
+    
+    def run_pass(self) -> int:
+        """Archive everything currently due, batch by batch; returns how many records moved"""
+        with self._pass_lock:
+            cutoff = time.time() - self.days * 86400
+            moved = 0
+            for tier in self.tiers.values():
+                tier.stats['passes'] += 1
+                while True:
+                    hard_deleted = [tier.pending.popleft() for _ in range(min(self.batch_size, len(tier.pending)))]
+                    expired = tier.manager.expired_records(cutoff, self.batch_size - len(hard_deleted))
+                    batch = hard_deleted + [record.to_dict() for record in expired]
+                    if not batch:
+                        break
+                    try:
+                        tier.archive.append(batch)
+                    except OSError as e:
+                        logger.error(f"Archiving {tier.name} failed: {e}")
+                        tier.pending.extendleft(reversed(hard_deleted))
+                        break
+                    tier.manager.evict([record.id for record in expired])
+                    tier.stats['archived'] += len(batch)
+                    moved += len(batch)
+                    if len(batch) < self.batch_size:
+                        break
+                    time.sleep(0)  # let request threads in between batches
+            if moved:
+                logger.info(f"Archived {moved} finished records")
+            return moved
+    
+    def history(self, name: str, chat_id: str, query: str = "", limit: int = 10) -> List[Dict[str, Any]]:
+        """A chat's archived records, newest first, optionally filtered by words in their text"""
+        tier = self.tiers[name]
+        words = query.lower().split()
+        owners = (chat_id, None)  # None: todos from before todos had owners
+        
+        def accept(item: Dict[str, Any]) -> bool:
+            # Records archived before chat ids carried their channel keep bare ids
+            if legacy_chat_ids.qualify(item.get(tier.owner_field)) not in owners:
+                return False
+            text = (item.get('task') or item.get('message') or '').lower()
+            return all(word in text for word in words)
+        
+        waiting = [item for item in reversed(tier.pending) if accept(item)]
+        return (waiting + tier.archive.history(accept, limit, owners))[:limit]
+    
+    def format_history(self, name: str, items: List[Dict[str, Any]]) -> str:
+        """Format archived todos or reminders for chat display"""
+        if not items:
+            return f"🗄️ No archived {name}."
+        lines = []
+        for item in items:
+            deleted = item.get('status') == 'deleted'
+            text = item.get('task') or item.get('message') or ''
+            finished = item.get('completed_at') or item.get('last_triggered')
+            when = "deleted" if deleted else f"done {local_date(finished)}" if finished else "done"
+            lines.append(f"{'🗑️' if deleted else '✅'} {item['id']}. {text} ({when})")
+        return f"🗄️ Archived {name}:\n\n" + "\n".join(lines)
+    
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._thread = threading.Thread(target=self._run, daemon=True, name="retention")
+            self._thread.start()
+            logger.info(f"Retention started (archive after {self.days:g} days, every {self.interval:g}s)")
+    
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+        # Retries hard deletes whose archive write failed
+        self.run_pass()
+        for tier in self.tiers.values():
+            tier.archive.close()
+    
+    def _run(self):
+        while self.running:
+            try:
+                self.run_pass()
+            except Exception as e:
+                logger.error(f"Retention pass failed: {e}")
+            self._wake.wait(self.interval)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            name: {**tier.stats, 'pending': len(tier.pending), 'archive': tier.archive.get_stats()}
+            for name, tier in self.tiers.items()
+        }
+
+# Global retention manager, covering todos and reminders
+retention_manager = RetentionManager()
+retention_manager.register("todos", todo_manager, "chat_id", hard_deletes=True)
+retention_manager.register("reminders", reminder_scheduler, "phone_number")
@@ -0,0 +1,144 @@
+import re
+import math
+import heapq
+import bisect
+import unicodedata
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Upper bound on vocabulary terms a single prefix may expand to (counting only
+# terms that occur in documents the search accepts)
+MAX_PREFIX_EXPANSION = 64
+
+def normalize(text: str) -> str:
+    """Casefold and strip accents so 'Café' matches 'cafe'"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized word tokens"""
+    return _TOKEN_RE.findall(normalize(text or ""))
+
+class SearchResults(list):
+    """Ranked results; truncated is set when a prefix matched more words than were searched"""
+    truncated = False
+
+class SearchIndex:
+    """Incrementally maintained inverted index over short text fields"""
+    
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = {}
+        self.doc_tokens: Dict[int, Tuple[str, ...]] = {}
+        # Sorted vocabulary, used for prefix lookups with bisect
+        self.vocabulary: List[str] = []
+    
+    def __len__(self) -> int:
+        return len(self.doc_tokens)
+    
+    def add(self, doc_id: int, text: str):
+        """Index a document, replacing any previous text for the same id"""
+        if doc_id in self.doc_tokens:
+            self.remove(doc_id)
+        tokens = tuple(set(tokenize(text)))
+        self.doc_tokens[doc_id] = tokens
+        for token in tokens:
+            docs = self.postings.get(token)
+            if docs is None:
+                self.postings[token] = {doc_id}
+                bisect.insort(self.vocabulary, token)
+            else:
+                docs.add(doc_id)
+    
+    def update(self, doc_id: int, text: str):
+        """Re-index a document after its text changed"""
+        self.add(doc_id, text)
+    
+    def remove(self, doc_id: int):
+        """Drop a document from the index"""
+        for token in self.doc_tokens.pop(doc_id, ()):
+            docs = self.postings[token]
+            docs.discard(doc_id)
+            if not docs:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+    
+    def _expand(self, term: str, accept: Optional[Callable[[int], bool]] = None) -> Tuple[List[str], bool]:
+        """Vocabulary tokens starting with term, the exact match first, and whether the cap cut it short.
+        
+        With accept, tokens that occur in no accepted document are skipped
+        before counting against the cap, so other chats' words don't crowd
+        out the caller's.
+        """
+        matches = []
+        for position in range(bisect.bisect_left(self.vocabulary, term), len(self.vocabulary)):
+            token = self.vocabulary[position]
+            if not token.startswith(term):
+                break
+            if accept is not None and not any(accept(doc_id) for doc_id in self.postings[token]):
+                continue
+            if len(matches) == MAX_PREFIX_EXPANSION:
+                return matches, True
+            matches.append(token)
+        return matches, False
+    
+    def search(self, query: str, limit: int = 20,
+               accept: Optional[Callable[[int], bool]] = None) -> List[Tuple[int, float]]:
+        """Find documents containing every query term (as a word or prefix).
+        
+        Results are ranked by summed inverse document frequency, with exact
+        word matches weighted above prefix matches. ``accept`` filters
+        candidate ids before ranking (e.g. to one chat's items) and before
+        prefixes are capped at MAX_PREFIX_EXPANSION words; ``truncated`` on
+        the result says whether a cap was hit.
+        """
+        results = SearchResults()
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_tokens:
+            return results
+        
+        total_docs = len(self.doc_tokens)
+        expanded = []
+        for term in terms:
+            weighted = []
+            tokens, truncated = self._expand(term, accept)
+            results.truncated = results.truncated or truncated
+            for token in tokens:
+                docs = self.postings[token]
+                idf = math.log(1 + total_docs / len(docs))
+                weighted.append((docs, idf * (2.0 if token == term else 1.0)))
+            if not weighted:
+                return results
+            # Best-scoring expansion first, so membership checks stop early
+            weighted.sort(key=lambda pair: -pair[1])
+            expanded.append(weighted)
+        
+        # Intersect from the most selective term using C-level set operations
+        expanded.sort(key=lambda weighted: sum(len(docs) for docs, _ in weighted))
+        candidates = None
+        for weighted in expanded:
+            if len(weighted) == 1:
+                matching = weighted[0][0]
+            elif candidates is not None and len(candidates) < sum(len(docs) for docs, _ in weighted):
+                matching = {d for d in candidates if any(d in docs for docs, _ in weighted)}
+            else:
+                matching = set().union(*(docs for docs, _ in weighted))
+            candidates = matching if candidates is None else candidates & matching
+            if not candidates:
+                return results
+        
+        if accept is not None:
+            candidates = [doc_id for doc_id in candidates if accept(doc_id)]
+        
+        def score(doc_id: int) -> float:
+            total = 0.0
+            for weighted in expanded:
+                for docs, weight in weighted:
+                    if doc_id in docs:
+                        total += weight
+                        break
+            return total
+        
+        ranked = ((doc_id, score(doc_id)) for doc_id in candidates)
+        results.extend(heapq.nlargest(limit, ranked, key=lambda item: (item[1], -item[0])))
+        return results
@@ -0,0 +1,296 @@
+"""
+Binary snapshot format for todos and reminders
+
+Layout (little endian):
+    
+    header    magic, version, record count, record size and section offsets
+    schema    JSON: record kind plus (field, type) pairs
+    symbols   JSON list of repeated strings (statuses, phone numbers, ...)
+    records   fixed-size structs, one per record
+    index     (id, slot) pairs sorted by id, for O(log n) lookups
+    strings   UTF-8 string table referenced by (offset, length)
+
+Files are opened with mmap and records are decoded only when accessed.
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Type
+from app.modules.records import Record, TodoRecord, ReminderRecord, coerce_enum
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WCHSNAP1"
+VERSION = 1
+HEADER = struct.Struct("<8sHHQIIQQQQQ")
+INDEX_ENTRY = struct.Struct("<qQ")
+
+NULL_INT = -(2 ** 63)
+NULL_U32 = 0xFFFFFFFF
+LIST_SEPARATOR = "\x1f"
+
+RECORD_TYPES: Dict[str, Type[Record]] = {
+    "todo": TodoRecord,
+    "reminder": ReminderRecord,
+}
+
+FIELD_FORMATS = {'int': "q", 'sym': "I", 'str': "QI", 'list': "QI"}
+
+def _record_struct(fields) -> struct.Struct:
+    return struct.Struct("<" + "".join(FIELD_FORMATS[kind] for _, kind in fields))
+
+def kind_of(record_cls: Type[Record]) -> str:
+    for kind, cls in RECORD_TYPES.items():
+        if cls is record_cls:
+            return kind
+    raise ValueError(f"No snapshot kind for {record_cls.__name__}")
+
+def encode_snapshot(record_cls: Type[Record], records: List[Record]) -> bytes:
+    """Serialize records into the snapshot layout"""
+    fields = record_cls.field_types()
+    layout = _record_struct(fields)
+    symbols: Dict[str, int] = {}
+    strings = bytearray()
+    packed = bytearray()
+    index = []
+    
+    for slot, record in enumerate(records):
+        values = []
+        for name, kind in fields:
+            value = getattr(record, name)
+            if kind == 'int':
+                values.append(NULL_INT if value is None else int(value))
+            elif kind == 'sym':
+                if value is None:
+                    values.append(NULL_U32)
+                else:
+                    text = value.value if hasattr(value, 'value') else str(value)
+                    values.append(symbols.setdefault(text, len(symbols)))
+            else:
+                if value is None:
+                    values.extend((0, NULL_U32))
+                    continue
+                if kind == 'list':
+                    value = LIST_SEPARATOR.join(value)
+                data = value.encode('utf-8')
+                values.extend((len(strings), len(data)))
+                strings += data
+        packed += layout.pack(*values)
+        index.append((record.id, slot))
+    
+    index.sort()
+    schema = json.dumps({'kind': kind_of(record_cls), 'fields': fields}).encode('utf-8')
+    symbol_table = json.dumps(list(symbols), ensure_ascii=False).encode('utf-8')
+    
+    schema_offset = HEADER.size
+    symbols_offset = schema_offset + len(schema)
+    records_offset = symbols_offset + len(symbol_table)
+    index_offset = records_offset + len(packed)
+    strings_offset = index_offset + len(index) * INDEX_ENTRY.size
+    header = HEADER.pack(MAGIC, VERSION, 0, len(records), layout.size, len(schema),
+                         schema_offset, symbols_offset, records_offset, index_offset, strings_offset)
+    
+    out = bytearray(header)
+    out += schema
+    out += symbol_table
+    out += packed
+    for entry in index:
+        out += INDEX_ENTRY.pack(*entry)
+    out += strings
+    return bytes(out)
+
+class SnapshotReader:
+    """Read-only, lazily decoded view of a snapshot file"""
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.count, self.record_size, schema_len, schema_offset,
+         symbols_offset, self.records_offset, self.index_offset, self.strings_offset) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} snapshot")
+        
+        schema = json.loads(self._mm[schema_offset:schema_offset + schema_len])
+        self.record_cls = RECORD_TYPES[schema['kind']]
+        self.fields = [tuple(field) for field in schema['fields']]
+        self.symbols = json.loads(self._mm[symbols_offset:self.records_offset])
+        self._layout = _record_struct(self.fields)
+        self._plan, self._missing = self._decode_plan()
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __enter__(self) -> "SnapshotReader":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        self._mm.close()
+        self._file.close()
+    
+    def _decode_plan(self):
+        """Per-field decode steps; symbols are coerced once per file, not per record"""
+        plan = []
+        for name, kind in self.fields:
+            if name not in self.record_cls.FIELDS:
+                name = None  # field dropped from the record type since the file was written
+            symbol_values = None
+            if kind == 'sym' and name is not None:
+                enum = self.record_cls.ENUMS.get(name)
+                symbol_values = [coerce_enum(enum, s) if enum else sys.intern(s) for s in self.symbols]
+            plan.append((name, kind, symbol_values))
+        present = {name for name, _ in self.fields}
+        missing = [(name, self.record_cls.DEFAULTS.get(name)) for name in self.record_cls.FIELDS
+                   if name not in present]
+        return plan, missing
+    
+    def _value(self, values, position: int, kind: str, symbol_values):
+        """Decode one field from a record's unpacked struct values"""
+        if kind == 'int':
+            value = values[position]
+            return None if value == NULL_INT else value
+        if kind == 'sym':
+            code = values[position]
+            return None if code == NULL_U32 or symbol_values is None else symbol_values[code]
+        offset, length = values[position], values[position + 1]
+        if length == NULL_U32:
+            return None
+        value = self._mm[self.strings_offset + offset:self.strings_offset + offset + length].decode('utf-8')
+        if kind == 'list':
+            return tuple(sys.intern(v) for v in value.split(LIST_SEPARATOR)) if value else ()
+        return value
+    
+    def _decode(self, values) -> Record:
+        record = self.record_cls.__new__(self.record_cls)
+        for name, default in self._missing:
+            setattr(record, name, default)
+        
+        mm, base = self._mm, self.strings_offset
+        position = 0
+        for name, kind, symbol_values in self._plan:
+            if kind == 'int':
+                value = values[position]
+                position += 1
+                if value == NULL_INT:
+                    value = None
+            elif kind == 'sym':
+                code = values[position]
+                position += 1
+                value = None if code == NULL_U32 or symbol_values is None else symbol_values[code]
+            else:
+                offset, length = values[position], values[position + 1]
+                position += 2
+                if length == NULL_U32:
+                    value = None
+                else:
+                    value = mm[base + offset:base + offset + length].decode('utf-8')
+                    if kind == 'list':
+                        value = tuple(sys.intern(v) for v in value.split(LIST_SEPARATOR)) if value else ()
+            if name is not None:
+                setattr(record, name, value)
+        return record
+    
+    def __getitem__(self, slot: int) -> Record:
+        """Decode the record stored in a given slot"""
+        if not 0 <= slot < self.count:
+            raise IndexError(slot)
+        offset = self.records_offset + slot * self.record_size
+        return self._decode(self._layout.unpack_from(self._mm, offset))
+    
+    def __iter__(self) -> Iterator[Record]:
+        view = memoryview(self._mm)[self.records_offset:self.index_offset]
+        try:
+            for values in self._layout.iter_unpack(view):
+                yield self._decode(values)
+        finally:
+            view.release()
+    
+    def scan(self, *names: str) -> Iterator[tuple]:
+        """Yield just the named fields of every record, in slot order, without building records"""
+        located = {}
+        position = 0
+        for name, kind, symbol_values in self._plan:
+            if name is not None:
+                located[name] = (position, kind, symbol_values)
+            position += 1 if kind in ('int', 'sym') else 2
+        defaults = {name: default for name, default in self._missing}
+        steps = [located.get(name) for name in names]
+        view = memoryview(self._mm)[self.records_offset:self.index_offset]
+        try:
+            for values in self._layout.iter_unpack(view):
+                yield tuple(self._value(values, *step) if step else defaults.get(name)
+                            for name, step in zip(names, steps))
+        finally:
+            view.release()
+    
+    def slot_of(self, record_id: int) -> Optional[int]:
+        """Find a record's slot by id via the sorted header index"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry_id, slot = INDEX_ENTRY.unpack_from(self._mm, self.index_offset + middle * INDEX_ENTRY.size)
+            if entry_id == record_id:
+                return slot
+            if entry_id < record_id:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+    
+    def get(self, record_id: int) -> Optional[Record]:
+        """Look a record up by id via the sorted header index"""
+        slot = self.slot_of(record_id)
+        return None if slot is None else self[slot]
+
+def write_snapshot(path: str, record_cls: Type[Record], records: List[Record]):
+    """Atomically write records to a snapshot file"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(encode_snapshot(record_cls, records))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def json_to_snapshot(json_path: str, snapshot_path: str, kind: str) -> int:
+    """Convert a todos/reminders JSON file to a snapshot; returns the record count"""
+    record_cls = RECORD_TYPES[kind]
+    with open(json_path, 'r', encoding='utf-8') as f:
+        records = [record_cls.from_dict(item) for item in json.load(f)]
+    write_snapshot(snapshot_path, record_cls, records)
+    logger.info(f"Converted {len(records)} {kind} records to {snapshot_path}")
+    return len(records)
+
+def snapshot_to_json(snapshot_path: str, json_path: str) -> int:
+    """Convert a snapshot back to the JSON file format; returns the record count"""
+    with SnapshotReader(snapshot_path) as reader:
+        items = [record.to_dict() for record in reader]
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(items, f, indent=2, ensure_ascii=False)
+    logger.info(f"Converted {len(items)} records to {json_path}")
+    return len(items)
+
+def main(argv: List[str]) -> int:
+    """python -m app.modules.snapshot to-snapshot <todo|reminder> <in.json> <out.snap>
+    python -m app.modules.snapshot to-json <in.snap> <out.json>"""
+    if len(argv) == 4 and argv[0] == "to-snapshot":
+        count = json_to_snapshot(argv[2], argv[3], argv[1])
+    elif len(argv) == 3 and argv[0] == "to-json":
+        count = snapshot_to_json(argv[1], argv[2])
+    else:
+        print(main.__doc__)
+        return 1
+    print(f"✅ Converted {count} records")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
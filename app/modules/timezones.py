@@ -0,0 +1,89 @@
+import logging
+import threading
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from app.config.settings import settings
+from app.core.chat_ids import legacy_chat_ids
+from app.core.storage import JsonStore
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+TRANSITION_HORIZON_DAYS = 400
+
+@lru_cache(maxsize=None)
+def load_zone(name: str) -> Optional[tzinfo]:
+    """ZoneInfo for a zone name; empty name means the server's local time (None).
+    
+    Cached here because ZoneInfo's own strong cache only keeps a few zones
+    and re-reads tzdata from disk once more are in use.
+    """
+    if not name:
+        return None
+    return ZoneInfo(name)
+
+def localize(epoch: float, zone_name: str) -> datetime:
+    """Wall-clock time of an instant in a zone (naive server-local if no zone)"""
+    zone = load_zone(zone_name)
+    return datetime.fromtimestamp(epoch, zone) if zone else datetime.fromtimestamp(epoch)
+
+def next_transition(zone_name: str, after: float) -> Optional[int]:
+    """Epoch of the zone's next UTC offset change (DST switch), or None"""
+    zone = load_zone(zone_name)
+    if zone is None:
+        return None
+    offset = lambda t: datetime.fromtimestamp(t, zone).utcoffset()
+    base = offset(after)
+    day = int(after)
+    # Walk forward a day at a time, then bisect to the exact second
+    for _ in range(TRANSITION_HORIZON_DAYS):
+        day += DAY
+        if offset(day) != base:
+            break
+    else:
+        return None
+    low, high = day - DAY, day
+    while high - low > 1:
+        middle = (low + high) // 2
+        if offset(middle) == base:
+            low = middle
+        else:
+            high = middle
+    return high
+
+class TimezoneRegistry:
+    """Per-chat IANA time zone, falling back to settings.default_timezone"""
+    
+    def __init__(self, data_file: str = "data/timezones.json"):
+        self.store = JsonStore(Path(data_file), lambda: self.zones)
+        self.zones: Dict[str, str] = self.store.load({})
+        if legacy_chat_ids.qualify_keys(self.zones):
+            self.store.mark_dirty()
+        self._lock = threading.Lock()
+    
+    def get(self, chat_id: str) -> str:
+        """Zone name for a chat ('' means server local time)"""
+        return self.zones.get(chat_id, settings.default_timezone)
+    
+    def set(self, chat_id: str, zone_name: str) -> str:
+        """Set a chat's zone; raises ValueError for unknown zones"""
+        try:
+            load_zone(zone_name)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone: {zone_name}")
+        with self._lock:
+            self.zones[chat_id] = zone_name
+            self.store.mark_dirty()
+        logger.info(f"Chat {chat_id} time zone set to {zone_name}")
+        return zone_name
+    
+    def now(self, chat_id: str) -> datetime:
+        """Current wall-clock time for a chat"""
+        zone = load_zone(self.get(chat_id))
+        return datetime.now(zone) if zone else datetime.now()
+
+# Global time zone registry instance
+timezones = TimezoneRegistry()
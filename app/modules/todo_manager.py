@@ -1,115 +1,248 @@
-import json
-import os
+import heapq
 import logging
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import threading
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from pathlib import Path
+from app.core.chat_ids import legacy_chat_ids
+from app.modules.search_index import SearchIndex, SearchResults
+from app.modules.record_store import RecordSet, open_record_store
+from app.modules.records import TodoRecord, Priority, Status, local_date, now_epoch
 
 logger = logging.getLogger(__name__)
 
+PRIORITY_EMOJI = {
+    Priority.HIGH: '🔴',
+    Priority.MEDIUM: '🟡',
+    Priority.LOW: '🟢'
+}
+
 class TodoManager:
     def __init__(self, data_file: str = "data/todos.json"):
         self.data_file = Path(data_file)
         self.data_file.parent.mkdir(parents=True, exist_ok=True)
+        self.store = open_record_store(self.data_file, TodoRecord, lambda: self.todos)
         self.todos = self._load_todos()
         self.next_id = self._get_next_id()
+        self.index = SearchIndex()
+        self.listeners: List[Callable[[str, TodoRecord], None]] = []
+        # Todo ids per owning chat, in id order (None = created before todos had owners)
+        self._by_chat: Dict[Optional[str], Dict[int, None]] = {}
+        # Per-chat data versions, bumped by every change; response caches key on them
+        self.versions: Dict[Optional[str], int] = {}
+        # Request threads and the retention thread both change todos; every mutation holds this
+        self._lock = threading.RLock()
+        if legacy_chat_ids.qualify_records(self.todos, 'chat_id'):
+            self.store.mark_dirty()
+        # (finished_at, id) of completed todos, oldest first, for the archive; entries for
+        # todos reopened, re-completed or evicted since go stale and are dropped when reached
+        self._expiry: List[Tuple[int, int]] = []
+        # Only the fields the indexes need are read; records are decoded when looked up
+        for todo_id, chat_id, task, status, completed_at, created_at in self.todos.scan(
+                'id', 'chat_id', 'task', 'status', 'completed_at', 'created_at'):
+            self._by_chat.setdefault(chat_id, {})[todo_id] = None
+            self.index.add(todo_id, task or '')
+            finished_at = self._finished_at(status, completed_at, created_at)
+            if finished_at is not None:
+                self._expiry.append((finished_at, todo_id))
+        heapq.heapify(self._expiry)
     
-    def _load_todos(self) -> List[Dict[str, Any]]:
-        """Load todos from JSON file"""
-        try:
-            if self.data_file.exists():
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            else:
-                return []
-        except Exception as e:
-            logger.error(f"Error loading todos: {e}")
-            return []
+    @staticmethod
+    def _finished_at(status, completed_at: Optional[int], created_at: Optional[int]) -> Optional[int]:
+        """When a todo became archivable, or None while it is open"""
+        if status != Status.COMPLETED:
+            return None
+        return completed_at or created_at or 0
+    
+    def _load_todos(self) -> RecordSet:
+        """Load todos from the JSON file (or binary snapshot)"""
+        return self.store.load_records()
     
     def _save_todos(self):
-        """Save todos to JSON file"""
-        try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.todos, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logger.error(f"Error saving todos: {e}")
+        """Write todos to disk now (normally the store flushes in the background)"""
+        self.store.flush()
+    
+    def _persist(self):
+        """Mark todos dirty; the store coalesces writes into one flush"""
+        self.store.mark_dirty()
+    
+    def batch(self):
+        """Group several mutations into a single flush"""
+        return self.store.batch()
+    
+    def add_listener(self, callback: Callable[[str, TodoRecord], None]):
+        """Call callback(event, todo) on every change; event is 'upsert', 'delete' or 'archive'.
+        
+        'delete' is sent before the todo leaves the store, so a listener can save it first.
+        """
+        self.listeners.append(callback)
+    
+    def _notify(self, event: str, todo: TodoRecord):
+        self.versions[todo.chat_id] = self.versions.get(todo.chat_id, 0) + 1
+        if event == 'upsert':
+            finished_at = self._finished_at(todo.status, todo.completed_at, todo.created_at)
+            if finished_at is not None:
+                heapq.heappush(self._expiry, (finished_at, todo.id))
+        for callback in self.listeners:
+            try:
+                callback(event, todo)
+            except Exception as e:
+                logger.error(f"Todo listener failed: {e}")
+    
+    def version_for(self, chat_id: str) -> Tuple[int, int]:
+        """Version of what a chat sees: its own todos plus the unowned ones"""
+        return self.versions.get(chat_id, 0), self.versions.get(None, 0)
     
     def _get_next_id(self) -> int:
         """Get the next available ID"""
-        if not self.todos:
-            return 1
-        return max(todo.get('id', 0) for todo in self.todos) + 1
+        return max((todo_id or 0 for todo_id, in self.todos.scan('id')), default=0) + 1
     
-    def add_todo(self, task: str, priority: str = "medium", due_date: str = None) -> Dict[str, Any]:
+    def add_todo(self, task: str, priority: str = "medium", due_date: str = None,
+                 chat_id: str = None) -> TodoRecord:
         """Add a new todo item"""
-        todo = {
-            'id': self.next_id,
-            'task': task,
-            'priority': priority,
-            'status': 'pending',
-            'created_at': datetime.now().isoformat(),
-            'due_date': due_date,
-            'completed_at': None
-        }
-        
-        self.todos.append(todo)
-        self.next_id += 1
-        self._save_todos()
+        with self._lock:
+            todo = TodoRecord(
+                id=self.next_id,
+                task=task,
+                priority=priority,
+                status=Status.PENDING,
+                created_at=now_epoch(),
+                due_date=due_date,
+                completed_at=None,
+                chat_id=chat_id
+            )
+            
+            self.todos.append(todo)
+            self._by_chat.setdefault(chat_id, {})[todo.id] = None
+            self.index.add(todo.id, task)
+            self.next_id += 1
+            self._persist()
+            self._notify('upsert', todo)
         
         logger.info(f"Added todo: {task}")
         return todo
     
-    def list_todos(self, status: str = None) -> List[Dict[str, Any]]:
-        """List all todos, optionally filtered by status"""
+    def add_todos(self, tasks: List[str], priority: str = "medium", chat_id: str = None) -> List[TodoRecord]:
+        """Add several todo items with a single save"""
+        with self.batch():
+            return [self.add_todo(task, priority, chat_id=chat_id) for task in tasks]
+    
+    def list_todos(self, status: str = None, chat_id: str = None) -> List[TodoRecord]:
+        """List todos, optionally filtered by status and by the chat that owns them"""
+        todos = self.todos
+        if chat_id is not None:
+            # A chat sees its own todos and the ones created before todos had owners
+            with self._lock:
+                todo_ids = list(heapq.merge(self._by_chat.get(chat_id, {}), self._by_chat.get(None, {})))
+            todos = [todo for todo in map(self.todos.get, todo_ids) if todo]
         if status:
-            return [todo for todo in self.todos if todo.get('status') == status]
-        return self.todos
+            return [todo for todo in todos if todo.status == status]
+        return todos
     
-    def get_todo(self, todo_id: int) -> Optional[Dict[str, Any]]:
-        """Get a specific todo by ID"""
-        for todo in self.todos:
-            if todo.get('id') == todo_id:
-                return todo
-        return None
+    def get_todo(self, todo_id: int, chat_id: str = None) -> Optional[TodoRecord]:
+        """Get a specific todo by ID (when chat_id is given, only one that chat can see)"""
+        todo = self.todos.get(todo_id)
+        if todo and chat_id is not None and todo.chat_id not in (chat_id, None):
+            return None
+        return todo
     
-    def complete_todo(self, todo_id: int) -> Optional[Dict[str, Any]]:
+    def complete_todo(self, todo_id: int, chat_id: str = None) -> Optional[TodoRecord]:
         """Mark a todo as completed"""
-        todo = self.get_todo(todo_id)
-        if todo:
-            todo['status'] = 'completed'
-            todo['completed_at'] = datetime.now().isoformat()
-            self._save_todos()
-            logger.info(f"Completed todo {todo_id}: {todo['task']}")
-            return todo
-        return None
-    
-    def delete_todo(self, todo_id: int) -> bool:
+        with self._lock:
+            todo = self.get_todo(todo_id, chat_id)
+            if todo:
+                todo.status = Status.COMPLETED
+                todo.completed_at = now_epoch()
+                self._persist()
+                self._notify('upsert', todo)
+                logger.info(f"Completed todo {todo_id}: {todo.task}")
+                return todo
+            return None
+    
+    def complete_todos(self, todo_ids: List[int], chat_id: str = None) -> List[TodoRecord]:
+        """Mark several todos as completed with a single save"""
+        with self.batch():
+            completed = [self.complete_todo(todo_id, chat_id) for todo_id in todo_ids]
+        return [todo for todo in completed if todo]
+    
+    def delete_todo(self, todo_id: int, chat_id: str = None) -> bool:
         """Delete a todo item"""
-        todo = self.get_todo(todo_id)
-        if todo:
-            self.todos = [t for t in self.todos if t.get('id') != todo_id]
-            self._save_todos()
-            logger.info(f"Deleted todo {todo_id}: {todo['task']}")
-            return True
-        return False
-    
-    def update_todo(self, todo_id: int, **kwargs) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            todo = self.get_todo(todo_id, chat_id)
+            if todo:
+                # Listeners (the archive) see it before it is gone
+                self._notify('delete', todo)
+                self.todos.discard([todo_id])
+                del self._by_chat[todo.chat_id][todo_id]
+                self.index.remove(todo_id)
+                self._persist()
+                logger.info(f"Deleted todo {todo_id}: {todo.task}")
+                return True
+            return False
+    
+    def update_todo(self, todo_id: int, chat_id: str = None, **kwargs) -> Optional[TodoRecord]:
         """Update a todo item"""
-        todo = self.get_todo(todo_id)
-        if todo:
-            for key, value in kwargs.items():
-                if key in ['task', 'priority', 'due_date', 'status']:
-                    todo[key] = value
-            self._save_todos()
-            logger.info(f"Updated todo {todo_id}")
-            return todo
-        return None
+        with self._lock:
+            todo = self.get_todo(todo_id, chat_id)
+            if todo:
+                for key, value in kwargs.items():
+                    if key in ['task', 'priority', 'due_date', 'status']:
+                        todo[key] = value
+                if 'task' in kwargs:
+                    self.index.update(todo_id, todo.task)
+                self._persist()
+                self._notify('upsert', todo)
+                logger.info(f"Updated todo {todo_id}")
+                return todo
+            return None
+    
+    def expired_records(self, cutoff: float, limit: int) -> List[TodoRecord]:
+        """Completed todos finished before cutoff (epoch seconds), for the archive"""
+        expired: Dict[int, TodoRecord] = {}
+        with self._lock:
+            live = []
+            while self._expiry and self._expiry[0][0] < cutoff and len(expired) < limit:
+                finished_at, todo_id = heapq.heappop(self._expiry)
+                todo = self.todos.get(todo_id)
+                if todo and todo_id not in expired and \
+                        self._finished_at(todo.status, todo.completed_at, todo.created_at) == finished_at:
+                    expired[todo_id] = todo
+                    live.append((finished_at, todo_id))
+            # They stay queued until evict() removes them (an archive write can fail)
+            for entry in live:
+                heapq.heappush(self._expiry, entry)
+        return list(expired.values())
+    
+    def evict(self, todo_ids: List[int]) -> List[TodoRecord]:
+        """Drop archived todos from the hot set (ones reopened meanwhile stay)"""
+        with self._lock:
+            evicted = [todo for todo in map(self.todos.get, todo_ids) if todo and todo.status == Status.COMPLETED]
+            if not evicted:
+                return []
+            self.todos.discard(todo.id for todo in evicted)
+            for todo in evicted:
+                del self._by_chat[todo.chat_id][todo.id]
+                self.index.remove(todo.id)
+            self._persist()
+            for todo in evicted:
+                self._notify('archive', todo)
+            return evicted
+    
+    def search_todos(self, query: str, limit: int = 20, chat_id: str = None) -> SearchResults:
+        """Find todos whose task matches every word (or word prefix) in query (see SearchResults.truncated)"""
+        accept = None
+        if chat_id is not None:
+            accept = lambda todo_id: self.todos.get(todo_id).chat_id in (chat_id, None)
+        with self._lock:
+            found = self.index.search(query, limit, accept)
+            results = SearchResults(self.todos.get(todo_id) for todo_id, _ in found)
+        results.truncated = found.truncated
+        return results
     
     def get_todo_summary(self) -> Dict[str, Any]:
         """Get a summary of todos"""
         total = len(self.todos)
-        pending = len([t for t in self.todos if t.get('status') == 'pending'])
-        completed = len([t for t in self.todos if t.get('status') == 'completed'])
+        pending = sum(1 for t in self.todos if t.status == Status.PENDING)
+        completed = sum(1 for t in self.todos if t.status == Status.COMPLETED)
         
         return {
             'total': total,
@@ -118,7 +251,7 @@ class TodoManager:
             'completion_rate': (completed / total * 100) if total > 0 else 0
         }
     
-    def format_todo_list(self, todos: List[Dict[str, Any]] = None) -> str:
+    def format_todo_list(self, todos: List[TodoRecord] = None) -> str:
         """Format todos for WhatsApp display"""
         if todos is None:
             todos = self.list_todos()
@@ -126,26 +259,22 @@ class TodoManager:
         if not todos:
             return "📝 No todos found."
         
-        result = "📝 Your todos:\n\n"
+        blocks = []
         for todo in todos:
-            status_emoji = "✅" if todo.get('status') == 'completed' else "⏳"
-            priority_emoji = {
-                'high': '🔴',
-                'medium': '🟡',
-                'low': '🟢'
-            }.get(todo.get('priority', 'medium'), '🟡')
-            
-            result += f"{status_emoji} {priority_emoji} {todo['id']}. {todo['task']}\n"
+            completed = todo.status == Status.COMPLETED
+            status_emoji = "✅" if completed else "⏳"
+            priority_emoji = PRIORITY_EMOJI.get(todo.priority, '🟡')
+            lines = [f"{status_emoji} {priority_emoji} {todo.id}. {todo.task}"]
             
-            if todo.get('due_date'):
-                result += f"   📅 Due: {todo['due_date']}\n"
+            if todo.due_date:
+                lines.append(f"   📅 Due: {todo.due_date}")
             
-            if todo.get('status') == 'completed' and todo.get('completed_at'):
-                result += f"   ✅ Completed: {todo['completed_at'][:10]}\n"
+            if completed and todo.completed_at:
+                lines.append(f"   ✅ Completed: {local_date(todo.completed_at)}")
             
-            result += "\n"
+            blocks.append("\n".join(lines))
         
-        return result.strip()
+        return "📝 Your todos:\n\n" + "\n\n".join(blocks)
 
 # Global todo manager instance
 todo_manager = TodoManager()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark cron next-fire computation: bitset jumps vs stepping minute by minute
+
+Usage: python benchmarks/bench_cron.py [num_calls]
+"""
+
+import sys
+import os
+import time
+import random
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.modules.cron import parse_cron
+
+EXPRESSIONS = [
+    "*/15 * * * *",
+    "0 9 * * 1-5",
+    "30 10 * * mon#1",
+    "0 0 1 1 *",
+]
+
+def step_minutes(expression, after: datetime) -> datetime:
+    """The naive approach: test every minute until one matches"""
+    t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    while True:
+        weekday = (t.weekday() + 1) % 7
+        nth = (t.day - 1) // 7
+        day_ok = expression.weekdays >> weekday & 1 or expression.nth >> (weekday * 5 + nth) & 1
+        if expression.dow_any:
+            day_ok = expression.days >> t.day & 1
+        if (expression.minutes >> t.minute & 1 and expression.hours >> t.hour & 1
+                and expression.months >> t.month & 1 and day_ok):
+            return t
+        t += timedelta(minutes=1)
+
+def measure(label: str, func, expression, starts) -> float:
+    start = time.perf_counter()
+    for after in starts:
+        func(after)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:26} {elapsed / len(starts) * 1e6:12.1f} µs/call")
+    return elapsed
+
+def main():
+    num_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print("🔁 Cron next-fire benchmark")
+    print(f"{num_calls:,} calls per expression")
+    print("=" * 50)
+    
+    rng = random.Random(7)
+    starts = [datetime(2025, 1, 1) + timedelta(minutes=rng.randrange(525_600)) for _ in range(num_calls)]
+    for text in EXPRESSIONS:
+        expression = parse_cron(text)
+        print(f"'{text}'")
+        measure("Step minute by minute", lambda after: step_minutes(expression, after), expression, starts)
+        measure("Bitset next_fire", expression.next_fire, expression, starts)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark daily digests: rescanning every todo vs incrementally maintained aggregates
+
+Usage: python benchmarks/bench_digest.py [num_todos] [num_chats]
+"""
+
+import sys
+import os
+import time
+import random
+import tempfile
+from datetime import date, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.modules.digest_manager import DigestManager, due_day
+from app.modules.records import TodoRecord, Status, now_epoch
+
+def make_todos(num_todos: int, num_chats: int):
+    rng = random.Random(7)
+    today = date.today()
+    todos = []
+    for i in range(1, num_todos + 1):
+        done = rng.random() < 0.8
+        todos.append(TodoRecord(
+            id=i,
+            task=f"Digest benchmark task {i}",
+            status=Status.COMPLETED if done else Status.PENDING,
+            created_at=now_epoch(),
+            due_date=(today + timedelta(days=rng.randint(-10, 10))).isoformat(),
+            completed_at=now_epoch() if done else None,
+            chat_id=f"chat{rng.randrange(num_chats)}"
+        ))
+    return todos
+
+def naive_digest(todos, chat_id: str, today: date):
+    """What a nightly job without aggregates does: scan every todo"""
+    tomorrow = today + timedelta(days=1)
+    mine = [t for t in todos if t.chat_id == chat_id]
+    pending = [t for t in mine if t.status == Status.PENDING]
+    return {
+        'pending': len(pending),
+        'overdue': [t for t in pending if due_day(t) and due_day(t) < today],
+        'due_tomorrow': [t for t in pending if due_day(t) == tomorrow],
+        'completed_today': [t for t in mine if t.status == Status.COMPLETED
+                            and t.completed_at and date.fromtimestamp(t.completed_at) == today]
+    }
+
+def main():
+    num_todos = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    num_chats = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    print("📊 Daily digest benchmark")
+    print(f"{num_todos:,} todos across {num_chats:,} chats")
+    print("=" * 50)
+    
+    todos = make_todos(num_todos, num_chats)
+    today = date.today()
+    chats = [f"chat{i}" for i in range(100)]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        digests = DigestManager(os.path.join(tmp, "digests.json"))
+        
+        start = time.perf_counter()
+        for todo in todos:
+            digests.on_todo('load', todo)
+        elapsed = time.perf_counter() - start
+        print(f"  {'Seed aggregates (once)':34} {elapsed * 1e3:10.1f} ms")
+        
+        pending = [t for t in todos if t.status == Status.PENDING][:10_000]
+        start = time.perf_counter()
+        for todo in pending:
+            todo.status = Status.COMPLETED
+            todo.completed_at = now_epoch()
+            digests.on_todo('upsert', todo)
+        elapsed = time.perf_counter() - start
+        print(f"  {'Apply one change':34} {elapsed / len(pending) * 1e6:10.2f} µs")
+        
+        start = time.perf_counter()
+        for chat_id in chats:
+            naive_digest(todos, chat_id, today)
+        elapsed = time.perf_counter() - start
+        print(f"  {'Digest by full rescan':34} {elapsed / len(chats) * 1e3:10.2f} ms/chat")
+        
+        start = time.perf_counter()
+        for chat_id in chats:
+            digests.build_digest(chat_id, today)
+        elapsed = time.perf_counter() - start
+        print(f"  {'Digest from aggregates':34} {elapsed / len(chats) * 1e3:10.2f} ms/chat")
+        digests.store.close()
+
+if __name__ == "__main__":
+    main()
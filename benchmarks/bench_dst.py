@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark the DST recompute pass: one zone via the zone index vs rescanning every reminder
+
+Usage: python benchmarks/bench_dst.py [num_reminders]
+"""
+
+import sys
+import os
+import time
+import random
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.modules.reminder_scheduler import ReminderScheduler
+from app.modules.records import ReminderRecord, Repeat, Status, now_epoch
+
+ZONES = [
+    "Europe/Berlin", "Europe/London", "America/New_York", "America/Los_Angeles",
+    "Asia/Tokyo", "Asia/Kolkata", "Australia/Sydney", "America/Sao_Paulo",
+    "Africa/Cairo", "Pacific/Auckland",
+]
+
+def main():
+    num_reminders = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print("🌍 DST recompute benchmark")
+    print(f"{num_reminders:,} recurring reminders across {len(ZONES)} zones")
+    print("=" * 50)
+    
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = ReminderScheduler(os.path.join(tmp, "reminders.json"))
+        now = time.time()
+        for i in range(1, num_reminders + 1):
+            reminder = ReminderRecord(
+                id=i,
+                time=f"{rng.randrange(24):02d}:{rng.randrange(60):02d}",
+                message=f"Reminder {i}",
+                phone_number=f"chat{i % 5000}",
+                repeat=Repeat.DAILY,
+                status=Status.ACTIVE,
+                created_at=now_epoch(),
+                tz=ZONES[i % len(ZONES)]
+            )
+            scheduler.reminders.append(reminder)
+        
+        start = time.perf_counter()
+        for reminder in scheduler.reminders:
+            scheduler._schedule_reminder(reminder)
+        elapsed = time.perf_counter() - start
+        print(f"  {'Arm all reminders (startup)':34} {elapsed * 1e3:10.1f} ms")
+        
+        start = time.perf_counter()
+        for zone in ZONES:
+            scheduler.recompute_zone(zone)
+        elapsed = time.perf_counter() - start
+        print(f"  {'Rescan every zone':34} {elapsed * 1e3:10.1f} ms")
+        
+        start = time.perf_counter()
+        scheduler.recompute_zone("Europe/Berlin")
+        elapsed = time.perf_counter() - start
+        print(f"  {'Zone-indexed pass (Europe/Berlin)':34} {elapsed * 1e3:10.1f} ms")
+        print(f"Stats: {scheduler.stats}")
+        scheduler.store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark emailing a large attachment: MIMEMultipart.as_string() vs streaming to the SMTP socket
+
+Usage: python benchmarks/bench_email_attachment.py [attachment_mb]
+"""
+
+import sys
+import os
+import time
+import smtplib
+import tempfile
+import threading
+import tracemalloc
+import socketserver
+from email.mime.application import MIMEApplication
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.modules.email_sender import EmailSender
+
+class DiscardingSMTP(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept one message; the body is thrown away as it arrives"""
+    
+    def handle(self):
+        reply = lambda line: self.wfile.write(line + b"\r\n")
+        reply(b"220 bench")
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    reply(b"250 queued")
+                continue
+            command = line[:4].upper()
+            if command == b"DATA":
+                in_data = True
+                reply(b"354 go ahead")
+            elif command == b"QUIT":
+                reply(b"221 bye")
+                return
+            else:
+                reply(b"250 ok")
+
+def measure(label: str, send, size_mb: float):
+    tracemalloc.start()
+    start = time.perf_counter()
+    send()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {label:22} {elapsed * 1000:8.0f} ms  peak {peak / 2 ** 20:7.1f} MiB ({peak / 2 ** 20 / size_mb:.1f}x the file)")
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print("📎 Email attachment benchmark")
+    print(f"{size_mb:g} MB attachment to a local SMTP sink")
+    print("=" * 50)
+    
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), DiscardingSMTP)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sender = EmailSender()
+    sender.username = "bench@example.com"
+    sender._connect = lambda: smtplib.SMTP(*server.server_address)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recording.opus")
+        with open(path, 'wb') as f:
+            f.write(os.urandom(int(size_mb * 2 ** 20)))
+        
+        def in_memory():
+            """The old way: read the file, build the whole message, then sendmail its string"""
+            msg = sender._build_message("to@example.com", "Recording", [("Attached", 'plain')])
+            with open(path, 'rb') as f:
+                msg.attach(MIMEApplication(f.read(), Name="recording.opus"))
+            sender._deliver("to@example.com", msg)
+        
+        def streamed():
+            result = sender.send_attachment_email("to@example.com", "Recording", "Attached", path)
+            assert result['success'], result
+        
+        measure("as_string()", in_memory, size_mb)
+        measure("Streamed", streamed, size_mb)
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
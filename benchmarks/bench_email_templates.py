@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk email rendering: compiling per message vs the cached template registry
+
+Usage: python benchmarks/bench_email_templates.py [num_messages]
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment, select_autoescape
+from app.modules.email_sender import EmailSender
+from app.modules.email_templates import EmailTemplateRegistry, html_to_text
+
+TEMPLATE = "notification"
+
+def context_for(i: int) -> dict:
+    return {
+        'name': f"Recipient {i}",
+        'title': f"Weekly update #{i}",
+        'message': "Your tasks & reminders are in <good> shape.",
+        'link': f"https://example.com/u/{i}"
+    }
+
+def render_uncached(registry: EmailTemplateRegistry, num_messages: int):
+    """What a naive sender does: read and compile the template for every message"""
+    env = Environment(autoescape=select_autoescape(default=True))
+    text_env = Environment(autoescape=False)
+    for i in range(num_messages):
+        source = registry._path(TEMPLATE).read_text(encoding='utf-8')
+        context = context_for(i)
+        env.from_string(source).render(context)
+        text_env.from_string(html_to_text(source)).render(context)
+
+def render_cached(registry: EmailTemplateRegistry, num_messages: int):
+    for i in range(num_messages):
+        registry.render(TEMPLATE, context_for(i))
+
+def render_and_build(registry: EmailTemplateRegistry, sender: EmailSender, num_messages: int):
+    """Rendering plus MIME assembly, i.e. everything but the SMTP round trip"""
+    for i in range(num_messages):
+        rendered = registry.render(TEMPLATE, context_for(i))
+        sender._build_message(f"user{i}@example.com", rendered.subject,
+                              [('plain', rendered.text), ('html', rendered.html)],
+                              multipart='alternative').as_bytes()
+
+def measure(label: str, num_messages: int, func, *args):
+    start = time.perf_counter()
+    func(*args, num_messages)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:34} {num_messages / elapsed:10,.0f} msgs/sec")
+
+def main():
+    num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    print("📧 Email template rendering benchmark")
+    print(f"{num_messages:,} messages, template '{TEMPLATE}'")
+    print("=" * 50)
+    
+    registry = EmailTemplateRegistry()
+    sender = EmailSender()
+    measure("Compile per message", num_messages, render_uncached, registry)
+    measure("Cached registry", num_messages, render_cached, registry)
+    measure("Cached registry + MIME build", num_messages, render_and_build, registry, sender)
+    print(f"Registry stats: {registry.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark health probes: a live getMe per request vs the cached health monitor
+
+A local HTTP server stands in for the Telegram API, so the live numbers are
+a lower bound (no TLS, no internet round trip).
+
+Usage: python benchmarks/bench_health.py [num_requests]
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.telegram_client import telegram_client
+from app.core.health import health_monitor
+from app.main import verify_webhook, readyz, healthz
+
+class FakeTelegram(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({"ok": True, "result": {"id": 1, "username": "bench_bot"}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+def measure(label: str, call, repeats: int):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        call()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:28} {elapsed / repeats * 1e6:10.1f} µs/request")
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    print("🩺 Health probe benchmark")
+    print(f"{repeats:,} requests per endpoint")
+    print("=" * 50)
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegram)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    telegram_client.base_url = f"http://127.0.0.1:{server.server_port}/botTOKEN"
+    telegram_client.session.mount("http://", telegram_client.session.get_adapter("https://"))
+    
+    loop = asyncio.new_event_loop()
+    measure("Live getMe (local server)", telegram_client.get_me, min(repeats, 500))
+    health_monitor.refresh()
+    measure("GET /webhook (cached)", lambda: loop.run_until_complete(verify_webhook()), repeats)
+    measure("GET /readyz", lambda: loop.run_until_complete(readyz()), repeats)
+    measure("GET /healthz", lambda: loop.run_until_complete(healthz()), repeats)
+    print(f"Readiness: {health_monitor.readiness()['checks']}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
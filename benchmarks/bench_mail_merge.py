@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark mail merge against a local SMTP sink: login per message vs pooled concurrent sessions
+
+The sink takes SINK_LATENCY seconds to accept each message (like a real
+relay), so the numbers show what session reuse and concurrency buy.
+
+Usage: python benchmarks/bench_mail_merge.py [num_recipients]
+"""
+
+import sys
+import os
+import time
+import smtplib
+import tempfile
+import threading
+import socketserver
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.settings import settings
+from app.modules.email_sender import email_sender
+from app.modules.mail_merge import MailMergeManager, parse_recipients
+
+SINK_LATENCY = 0.005  # seconds per accepted message
+LOGIN_LATENCY = 0.02  # seconds per new session (TLS + AUTH on a real server)
+
+class SinkSMTP(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept messages; counts them and rejects @bounce addresses"""
+    received = 0
+    lock = threading.Lock()
+    
+    def handle(self):
+        reply = lambda line: self.wfile.write(line + b"\r\n")
+        time.sleep(LOGIN_LATENCY)
+        reply(b"220 sink")
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    time.sleep(SINK_LATENCY)
+                    with SinkSMTP.lock:
+                        SinkSMTP.received += 1
+                    reply(b"250 queued")
+                continue
+            command = line[:4].upper()
+            if command == b"DATA":
+                in_data = True
+                reply(b"354 go ahead")
+            elif command == b"RCPT" and b"@bounce" in line:
+                reply(b"550 no such user")
+            elif command == b"QUIT":
+                reply(b"221 bye")
+                return
+            else:
+                reply(b"250 ok")
+
+def wait_for(manager: MailMergeManager, job_id: str) -> dict:
+    while manager.get_job(job_id)['status'] == 'running':
+        time.sleep(0.02)
+    return manager.get_job(job_id)
+
+def main():
+    num_recipients = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    print("📨 Mail merge benchmark")
+    print(f"{num_recipients:,} recipients, sink {SINK_LATENCY * 1000:g} ms/message, "
+          f"{LOGIN_LATENCY * 1000:g} ms/login")
+    print("=" * 50)
+    
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SinkSMTP)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    connect = lambda: smtplib.SMTP(*server.server_address)
+    email_sender._connect = connect
+    email_sender.username = "bench@example.com"
+    
+    csv_text = "email,name\n" + "\n".join(f"user{i}@{'bounce' if i % 50 == 0 else 'example'}.com,User {i}"
+                                          for i in range(num_recipients))
+    recipients = parse_recipients(csv_text)
+    context = {'title': "Release notes", 'message': "Version 2 is live."}
+    
+    # Baseline: what looping over send_template_email does (one login per message, one at a time)
+    start = time.perf_counter()
+    for row in recipients[:100]:
+        email_sender.send_template_email(row['email'], "notification", {**context, **row})
+    elapsed = time.perf_counter() - start
+    print(f"  {'Login per message':24} {100 / elapsed:8.1f} msg/s")
+    
+    settings.mail_merge_rate_limit = 10_000
+    with tempfile.TemporaryDirectory() as tmp:
+        for connections in (1, 4, 8):
+            settings.mail_merge_connections = connections
+            manager = MailMergeManager(data_dir=os.path.join(tmp, f"jobs{connections}"),
+                                       contacts_file=os.path.join(tmp, "contacts.json"), connect=connect)
+            before = SinkSMTP.received
+            start = time.perf_counter()
+            report = wait_for(manager, manager.create_job("notification", recipients, context)['id'])
+            elapsed = time.perf_counter() - start
+            assert report['sent'] == SinkSMTP.received - before
+            print(f"  {f'{connections} pooled session(s)':24} {num_recipients / elapsed:8.1f} msg/s  "
+                  f"(sent {report['sent']}, rejected {report['rejected']}, failed {report['failed']})")
+            manager.store.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark meeting joins: a fresh browser per job vs the warm browser pool
+
+Runs against a local HTML page that mimics Google Meet's pre-join screen,
+so no network or account is needed. Requires `playwright install chromium`.
+
+Usage: python benchmarks/bench_meeting_pool.py [num_jobs]
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.modules.meeting_manager import MeetingManager, BROWSER_ARGS
+
+MEETING_PAGE = """<!doctype html>
+<html><body>
+  <input aria-label="Your name">
+  <button onclick="setTimeout(() => document.getElementById('call').hidden = false, 50)">Join now</button>
+  <div id="call" hidden><button aria-label="Leave call" onclick="this.parentNode.hidden = true">Leave</button></div>
+</body></html>
+"""
+
+def cold_join(url: str) -> float:
+    """Launch a browser, join, hang up and close it: the per-request baseline"""
+    from playwright.sync_api import sync_playwright
+    start = time.perf_counter()
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+        page = browser.new_context().new_page()
+        page.goto(url)
+        page.get_by_role("button", name="Join now").click()
+        page.locator('button[aria-label="Leave call"]').wait_for()
+        elapsed = time.perf_counter() - start
+        browser.close()
+    return elapsed
+
+def pool_joins(url: str, num_jobs: int, size: int):
+    """Time from submit to 'joined' for each job on a warm pool"""
+    joined = {}
+    events = {}
+    
+    def notify(chat_id: str, text: str):
+        if text.startswith("✅"):
+            joined[chat_id] = time.perf_counter()
+            events[chat_id].set()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = MeetingManager(size=size, recycle_after=10, state_file=os.path.join(tmp, "state.json"),
+                                 notify=notify, allow_url=lambda url: True)  # the local page is a file:// URL
+        manager.start()
+        while manager.warm < size:
+            time.sleep(0.05)
+        
+        latencies = []
+        for i in range(num_jobs):
+            chat_id = f"chat{i}"
+            events[chat_id] = threading.Event()
+            start = time.perf_counter()
+            manager.submit(chat_id, url)
+            events[chat_id].wait(timeout=60)
+            latencies.append(joined[chat_id] - start)
+            manager.leave(chat_id)
+        stats = manager.get_stats()
+        manager.stop()
+    return latencies, stats
+
+def main():
+    num_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print("🎥 Meeting browser pool benchmark")
+    print(f"{num_jobs} joins against a local page")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        page = Path(tmp) / "meeting.html"
+        page.write_text(MEETING_PAGE, encoding="utf-8")
+        url = page.as_uri()
+        
+        try:
+            cold = [cold_join(url) for _ in range(min(num_jobs, 5))]
+        except Exception as e:
+            print(f"❌ Chromium is not available ({str(e).splitlines()[0]})")
+            print("   Run: playwright install chromium")
+            return
+        print(f"  {'Fresh browser per job':24} {sum(cold) / len(cold) * 1000:10.0f} ms/join")
+        
+        latencies, stats = pool_joins(url, num_jobs, size=2)
+        print(f"  {'Warm pool':24} {sum(latencies) / len(latencies) * 1000:10.0f} ms/join")
+        print(f"Pool stats: launches={stats['launches']} recycles={stats['recycles']} joined={stats['joined']}")
+
+if __name__ == "__main__":
+    main()
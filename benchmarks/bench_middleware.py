@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark the command middleware chain: per-message loop over stages vs the prebuilt chain
+
+Usage: python benchmarks/bench_middleware.py [num_messages]
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.middleware import CommandRequest, MiddlewareChain
+
+def passthrough(request, call_next):
+    return call_next(request)
+
+def handler(request):
+    return "pong 🏓"
+
+def run_looped(stages, request, timings):
+    """The alternative: walk the stage list for every message, timing each stage as it goes"""
+    def call(index, request):
+        start = time.perf_counter()
+        try:
+            if index == len(stages):
+                return handler(request)
+            return stages[index](request, lambda request: call(index + 1, request))
+        finally:
+            timings[index] += time.perf_counter() - start
+    return call(0, request)
+
+def measure(label: str, func, num_messages: int):
+    start = time.perf_counter()
+    for _ in range(num_messages):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:30} {elapsed / num_messages * 1e6:8.2f} µs/message")
+
+def main():
+    num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print("🧅 Middleware chain benchmark")
+    print(f"{num_messages:,} messages")
+    print("=" * 50)
+    
+    request = CommandRequest("chat", {"command": "ping", "args": [], "full_message": "ping"})
+    for num_stages in (4, 8):
+        stages = [passthrough] * num_stages
+        chain = MiddlewareChain(handler)
+        for i, stage in enumerate(stages):
+            chain.use(stage, f"stage{i}")
+        print(f"{num_stages} stages")
+        timings = [0.0] * (num_stages + 1)
+        measure("Looped per message", lambda: run_looped(stages, request, timings), num_messages)
+        measure("Prebuilt chain", lambda: chain(request), num_messages)
+        stats = chain.get_stats()
+        print(f"  {'Stage self time':30} " + ", ".join(f"{name} {s['self_ms'] / s['calls'] * 1000:.2f} µs"
+                                                      for name, s in list(stats.items())[:3]) + ", ...")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark write amplification of group-commit persistence
+
+Compares the old "rewrite the whole file on every mutation" behaviour with
+JsonStore for a burst of todo additions.
+
+Usage: python benchmarks/bench_persistence.py [existing_items] [mutations]
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.storage import JsonStore
+
+def make_todo(todo_id: int) -> dict:
+    return {
+        'id': todo_id,
+        'task': f"Benchmark task number {todo_id}",
+        'priority': 'medium',
+        'status': 'pending',
+        'created_at': '2025-01-01T12:00:00',
+        'due_date': None,
+        'completed_at': None
+    }
+
+def bench_rewrite_each(path: str, todos: list, mutations: int):
+    """Old behaviour: json.dump the full list after every mutation"""
+    written = 0
+    start = time.perf_counter()
+    for i in range(mutations):
+        todos.append(make_todo(len(todos) + 1))
+        payload = json.dumps(todos, indent=2, ensure_ascii=False).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(payload)
+        written += len(payload)
+    return time.perf_counter() - start, mutations, written
+
+def bench_group_commit(path: str, todos: list, mutations: int, writers: int = 4):
+    """JsonStore: concurrent writers mark dirty, the flusher coalesces"""
+    store = JsonStore(path, lambda: todos)
+    lock = threading.Lock()
+    
+    def writer(count: int):
+        for _ in range(count):
+            with lock:
+                todos.append(make_todo(len(todos) + 1))
+            store.mark_dirty()
+    
+    start = time.perf_counter()
+    threads = [threading.Thread(target=writer, args=(mutations // writers,)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.wait_durable()
+    elapsed = time.perf_counter() - start
+    store.close()
+    stats = store.get_stats()
+    return elapsed, stats['flushes'], stats['bytes_written']
+
+def report(label: str, elapsed: float, flushes: int, written: int, mutations: int, file_size: int):
+    print(f"{label}:")
+    print(f"  time:               {elapsed * 1e3:10.1f} ms")
+    print(f"  flushes:            {flushes:10,}")
+    print(f"  bytes written:      {written:10,}")
+    print(f"  bytes per mutation: {written / mutations:10,.0f}")
+    print(f"  write amplification:{written / file_size:10.1f}x final file size")
+
+def main():
+    existing = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    mutations = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    
+    print("💾 Persistence benchmark")
+    print(f"{existing:,} existing todos, {mutations:,} mutations")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        todos = [make_todo(i) for i in range(1, existing + 1)]
+        path = os.path.join(tmp, "rewrite.json")
+        elapsed, flushes, written = bench_rewrite_each(path, todos, mutations)
+        report("Rewrite on every mutation", elapsed, flushes, written, mutations, os.path.getsize(path))
+        
+        todos = [make_todo(i) for i in range(1, existing + 1)]
+        path = os.path.join(tmp, "store.json")
+        elapsed, flushes, written = bench_group_commit(path, todos, mutations)
+        report("Group commit (JsonStore)", elapsed, flushes, written, mutations, os.path.getsize(path))
+
+if __name__ == "__main__":
+    main()
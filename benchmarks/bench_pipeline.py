@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark the message pipeline's send queue against sending inline
+
+A local HTTP server stands in for the Telegram API with a fixed per-request
+latency; every 50th request is answered with a 429 to exercise retries.
+Per-chat ordering is checked on the server side.
+
+Usage: python benchmarks/bench_pipeline.py [num_messages] [num_chats]
+"""
+
+import sys
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from collections import defaultdict
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.telegram_client import TelegramClient
+from app.core.pipeline import MessagePipeline
+
+LATENCY = 0.005  # seconds per API call
+received = defaultdict(list)
+counter = {'requests': 0}
+lock = threading.Lock()
+
+class FakeTelegram(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(LATENCY)
+        with lock:
+            counter['requests'] += 1
+            limited = counter['requests'] % 50 == 0
+            if not limited:
+                received[data["chat_id"]].append(int(data["text"]))
+        if limited:
+            self.reply(429, {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 0.01}})
+        else:
+            self.reply(200, {"ok": True, "result": {"message_id": counter['requests']}})
+    
+    def reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+def in_order() -> bool:
+    return all(texts == sorted(texts) for texts in received.values())
+
+def main():
+    num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    num_chats = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    logging.disable(logging.ERROR)  # the 429s are expected
+    print("📤 Message pipeline send benchmark")
+    print(f"{num_messages:,} messages to {num_chats} chats, {LATENCY * 1000:.0f} ms per API call")
+    print("=" * 50)
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTelegram)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = TelegramClient()
+    client.base_url = f"http://127.0.0.1:{server.server_port}/botTOKEN"
+    messages = [(str(n % num_chats), str(n)) for n in range(num_messages)]
+    
+    # Before: each reply is sent inline by the request that produced it
+    start = time.perf_counter()
+    for chat_id, text in messages:
+        client.send_text_message(chat_id, text)
+    elapsed = time.perf_counter() - start
+    print(f"  {'Inline':20} {num_messages / elapsed:10,.0f} msgs/sec")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in (4, 16):
+            received.clear()
+            pipeline = MessagePipeline(workers=workers, outbox_file=str(Path(tmp) / f"outbox-{workers}.json"))
+            pipeline.register(client)
+            start = time.perf_counter()
+            futures = [pipeline.send_text(f"tg:{chat_id}", text) for chat_id, text in messages]
+            results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - start
+            pipeline.stop()
+            failed = sum("error" in result for result in results)
+            print(f"  {f'Queue, {workers} workers':20} {num_messages / elapsed:10,.0f} msgs/sec  "
+                  f"failed: {failed}  per-chat order kept: {in_order()}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark the request profiler's overhead and show what a profile looks like
+
+Runs a command through the router bare (profiling disabled: no hook at all),
+under 1-in-N sampling, and with a latency threshold (every request sampled,
+fast ones discarded), then prints the hottest frames of one saved profile.
+
+Usage: python benchmarks/bench_profiler.py [num_requests]
+"""
+
+import sys
+import os
+import time
+import logging
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.command_router import command_router
+from app.core.profiler import RequestProfiler
+
+CHAT_ID = "bench-profiler"
+
+def handle():
+    command_router.handle_message(CHAT_ID, "help")
+
+def measure(label: str, profiler, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        session = profiler.begin() if profiler else None
+        handle()
+        if session is not None:
+            profiler.end(session, "bench")
+    elapsed = time.perf_counter() - start
+    per_request = elapsed / repeats * 1e6
+    print(f"  {label:28} {per_request:10.1f} µs/request")
+    return per_request
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    logging.disable(logging.INFO)
+    print("🔬 Request profiler benchmark")
+    print(f"{repeats:,} requests per mode")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        measure("Disabled (no hook)", None, repeats)
+        measure("1 in 100 sampled", RequestProfiler(tmp, sample_every=100, slow_ms=0, keep=10), repeats)
+        measure("Threshold 50 ms (all sampled)", RequestProfiler(tmp, sample_every=0, slow_ms=50, keep=10), repeats)
+        
+        # One deliberately slow request, as an admin would request it
+        profiler = RequestProfiler(tmp, sample_every=0, slow_ms=0, interval_ms=1, keep=10)
+        session = profiler.begin(requested=True)
+        deadline = time.perf_counter() + 0.2
+        while time.perf_counter() < deadline:
+            handle()
+        name = profiler.end(session, "POST /webhook")
+        
+        lines = profiler.profile_path(name).read_text().splitlines()
+        samples = sum(int(line.rsplit(" ", 1)[1]) for line in lines)
+        print(f"\nProfile {name}: {len(lines)} distinct stacks, {samples} samples")
+        leaves = {}
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            leaf = stack.rsplit(";", 1)[-1]
+            leaves[leaf] = leaves.get(leaf, 0) + int(count)
+        for leaf, count in sorted(leaves.items(), key=lambda item: -item[1])[:5]:
+            print(f"  {count / samples:6.1%}  {leaf}")
+        print(f"Saved profiles: {len(profiler.list_profiles())} (rotation keeps {profiler.keep})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark the recording pipeline: capture speed and memory over a long meeting
+
+A synthetic tone is captured unpaced through the ring buffer into rotating
+chunks and merged at the end; memory should stay flat regardless of length.
+
+Usage: python benchmarks/bench_recording.py [hours]
+"""
+
+import sys
+import os
+import time
+import tempfile
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.settings import settings
+from app.modules.audio_recorder import AudioRecorder, SyntheticSource
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    print("🎙️ Recording pipeline benchmark")
+    print(f"{hours:g} h of {settings.sample_rate} Hz audio, {settings.recording_chunk_seconds:g} s chunks")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = AudioRecorder(directory=tmp, codec="wav")
+        chunks = []
+        recorder.add_chunk_listener(lambda recording, chunk: chunks.append((chunk['start'], chunk['end'])))
+        
+        tracemalloc.start()
+        start = time.perf_counter()
+        recorder.start("bench", SyntheticSource(seconds=hours * 3600))
+        while recorder.get("bench")._capture.is_alive():
+            time.sleep(0.05)
+        captured = time.perf_counter() - start
+        report = recorder.stop("bench")
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        
+        print(f"  {'Capture + chunking':24} {captured:8.2f} s ({report['duration'] / captured:,.0f}x realtime)")
+        print(f"  {'Including final merge':24} {elapsed:8.2f} s")
+        print(f"  {'Chunks':24} {report['chunks']:8,} (listener saw {len(chunks):,})")
+        print(f"  {'Recording size':24} {report['bytes'] / 2 ** 20:8.1f} MiB")
+        print(f"  {'Peak Python memory':24} {peak / 2 ** 20:8.2f} MiB")
+        print(f"  {'Dropped':24} {report['dropped_bytes']:8,} bytes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark memory per item: JSON dicts vs slotted records
+
+Usage: python benchmarks/bench_records.py [num_items]
+"""
+
+import sys
+import os
+import gc
+import json
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.modules.records import TodoRecord, ReminderRecord
+
+def todos_json(num_items: int) -> str:
+    return json.dumps([
+        {
+            'id': i,
+            'task': f"Task {i}",
+            'priority': ('high', 'medium', 'low')[i % 3],
+            'status': 'completed' if i % 4 == 0 else 'pending',
+            'created_at': f"2025-01-{i % 28 + 1:02d}T12:{i % 60:02d}:{i % 59:02d}.{i % 999999:06d}",
+            'due_date': None,
+            'completed_at': f"2025-02-{i % 28 + 1:02d}T09:00:{i % 60:02d}.000001" if i % 4 == 0 else None
+        }
+        for i in range(1, num_items + 1)
+    ])
+
+def reminders_json(num_items: int) -> str:
+    return json.dumps([
+        {
+            'id': i,
+            'time': f"{i % 24:02d}:{i % 60:02d}",
+            'message': f"Reminder {i}",
+            'phone_number': str(100000 + i % 5000),
+            'repeat': ('once', 'daily', 'weekly')[i % 3],
+            'days': ['monday', 'friday'] if i % 3 == 2 else [],
+            'status': 'active',
+            'created_at': f"2025-01-{i % 28 + 1:02d}T12:{i % 60:02d}:{i % 59:02d}.{i % 999999:06d}",
+            'last_triggered': None
+        }
+        for i in range(1, num_items + 1)
+    ])
+
+def measure(build) -> int:
+    """Bytes still allocated by build()'s result after temporaries are freed"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+def compare(label: str, payload: str, record_cls, num_items: int):
+    as_dicts = measure(lambda: json.loads(payload))
+    as_records = measure(lambda: [record_cls.from_dict(d) for d in json.loads(payload)])
+    print(f"{label}:")
+    print(f"  dicts:   {as_dicts / num_items:8.1f} bytes/item")
+    print(f"  records: {as_records / num_items:8.1f} bytes/item")
+    print(f"  saving:  {(1 - as_records / as_dicts) * 100:8.1f}%")
+
+def main():
+    num_items = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print("🧠 Record memory benchmark")
+    print(f"{num_items:,} items")
+    print("=" * 50)
+    compare("Todos", todos_json(num_items), TodoRecord, num_items)
+    compare("Reminders", reminders_json(num_items), ReminderRecord, num_items)
+
+if __name__ == "__main__":
+    main()
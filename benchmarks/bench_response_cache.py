@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark `todo list`: += rendering vs join rendering vs the versioned response cache
+
+Usage: python benchmarks/bench_response_cache.py [todos_per_chat]
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.response_cache import ResponseCache
+from app.modules.todo_manager import TodoManager
+from app.modules.records import local_date
+
+def format_concat(todos) -> str:
+    """The previous renderer: one += per line"""
+    result = "📝 Your todos:\n\n"
+    for todo in todos:
+        status_emoji = "✅" if todo.get('status') == 'completed' else "⏳"
+        priority_emoji = {'high': '🔴', 'medium': '🟡', 'low': '🟢'}.get(todo.get('priority', 'medium'), '🟡')
+        result += f"{status_emoji} {priority_emoji} {todo['id']}. {todo['task']}\n"
+        if todo.get('due_date'):
+            result += f"   📅 Due: {todo['due_date']}\n"
+        if todo.get('status') == 'completed' and todo.get('completed_at'):
+            result += f"   ✅ Completed: {local_date(todo['completed_at'])}\n"
+        result += "\n"
+    return result.strip()
+
+def measure(label: str, func, repeats: int):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:30} {elapsed / repeats * 1e6:10.1f} µs/reply")
+
+def main():
+    todos_per_chat = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeats = 2_000
+    print("🗂️ Response cache benchmark")
+    print(f"`todo list` with {todos_per_chat:,} todos, {repeats:,} replies")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = TodoManager(os.path.join(tmp, "todos.json"))
+        todos = manager.add_todos([f"Benchmark task number {i}" for i in range(todos_per_chat)], chat_id="chat")
+        manager.complete_todos([todo.id for todo in todos[::3]])
+        listing = lambda: manager.format_todo_list(manager.list_todos(chat_id="chat"))
+        assert format_concat(manager.list_todos(chat_id="chat")) == listing()
+        
+        cache = ResponseCache(max_entries=1024)
+        cached = lambda: cache.get_or_render(("chat", "todo", ("list",)), manager.version_for("chat"), listing)
+        
+        measure("+= renderer", lambda: format_concat(manager.list_todos(chat_id="chat")), repeats)
+        measure("join renderer", listing, repeats)
+        measure("Response cache (unchanged)", cached, repeats)
+        print(f"Cache stats: {cache.get_stats()}")
+        manager.store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark retention: shrink a hot set full of long-finished todos
+
+Builds a todo store where most items were completed long ago, times the
+everyday operations (list a chat, save the store), runs one retention pass
+into a gzip archive, then times the same operations on the live-only hot
+set and a `todo history` lookup against the archive.
+
+Usage: python benchmarks/bench_retention.py [num_finished] [num_live]
+"""
+
+import sys
+import os
+import time
+import logging
+import tempfile
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.modules.todo_manager import TodoManager
+from app.modules.retention import RetentionManager
+from app.modules.records import Status
+
+CHATS = 100
+
+def timed(fn, repeats: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+def report(label: str, manager: TodoManager):
+    list_ms = timed(lambda: manager.list_todos(chat_id="tg:7"))
+    
+    def save():
+        manager._persist()
+        manager._save_todos()
+    save_ms = timed(save, repeats=3)
+    size = manager.data_file.stat().st_size
+    print(f"  {label:8} {len(manager.todos):>8,} hot   list {list_ms:7.2f} ms   "
+          f"save {save_ms:8.1f} ms   file {size / 1024:9.1f} KB")
+
+def main():
+    num_finished = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    num_live = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    logging.disable(logging.INFO)
+    print("🗄️ Retention benchmark")
+    print(f"{num_finished:,} finished todos (60 days old), {num_live:,} live, {CHATS} chats")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = TodoManager(str(Path(tmp) / "todos.json"))
+        long_ago = time.time() - 60 * 86400
+        with manager.batch():
+            for n in range(num_finished + num_live):
+                todo = manager.add_todo(f"task {n} for project {n % 37}", chat_id=f"tg:{n % CHATS}")
+                if n < num_finished:
+                    # Finished 60 days ago: backdate, then mark done so the expiry queue sees that date
+                    todo.completed_at = long_ago
+                    manager.update_todo(todo.id, status=Status.COMPLETED)
+        report("Before", manager)
+        
+        retention = RetentionManager(days=30, batch_size=500, archive_dir=str(Path(tmp) / "archive"))
+        tier = retention.register("todos", manager, "chat_id", hard_deletes=True)
+        start = time.perf_counter()
+        moved = retention.run_pass()
+        elapsed = time.perf_counter() - start
+        print(f"\n  Pass archived {moved:,} todos in {elapsed:.2f}s ({moved / elapsed:,.0f} records/s)")
+        archive = tier.archive.get_stats()
+        raw = sum(len(str(item)) for item in tier.archive.iter_records())
+        print(f"  Archive {archive['bytes'] / 1024:,.1f} KB gzip (~{raw / max(archive['bytes'], 1):.1f}x smaller than raw)\n")
+        report("After", manager)
+        
+        history_ms = timed(lambda: retention.history("todos", "tg:7", "project 3"), repeats=3)
+        items = retention.history("todos", "tg:7", "project 3")
+        print(f"\n  History query (tg:7, 'project 3'): {len(items)} items in {history_ms:.1f} ms")
+        retention.stop()
+        manager.store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the todo/reminder inverted index
+
+Usage: python benchmarks/bench_search.py [num_items]
+"""
+
+import sys
+import os
+import time
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.modules.search_index import SearchIndex
+
+WORDS = [
+    "buy", "call", "email", "report", "meeting", "groceries", "invoice", "dentist",
+    "review", "deploy", "budget", "standup", "plan", "write", "fix", "book", "flight",
+    "hotel", "pay", "rent", "birthday", "gift", "prepare", "slides", "update", "client",
+    "project", "design", "draft", "contract", "renew", "insurance", "clean", "garage",
+]
+
+def build_index(num_items: int) -> SearchIndex:
+    """Index synthetic tasks of 3-6 words each"""
+    rng = random.Random(42)
+    index = SearchIndex()
+    start = time.perf_counter()
+    for doc_id in range(1, num_items + 1):
+        words = rng.sample(WORDS, rng.randint(3, 6))
+        index.add(doc_id, " ".join(words) + f" item{doc_id}")
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {num_items:,} items in {elapsed:.2f}s ({num_items / elapsed:,.0f} items/s)")
+    return index
+
+def time_query(index: SearchIndex, query: str, rounds: int = 50):
+    """Report the median latency of a query"""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        results = index.search(query, limit=20)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    median_us = timings[len(timings) // 2] * 1e6
+    print(f"  {query!r:28} {len(results):3} results  median {median_us:10.1f} µs")
+
+def main():
+    num_items = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print("🔍 Search index benchmark")
+    print("=" * 50)
+    index = build_index(num_items)
+    
+    print("Queries:")
+    for query in ["item123", f"item{num_items // 2}", "item99 dentist", "dentist invoice garage",
+                  "dent inv gar renew", "ite"]:
+        time_query(index, query)
+    
+    start = time.perf_counter()
+    for doc_id in range(1, 1001):
+        index.update(doc_id, "renamed task about the dentist")
+    print(f"1,000 updates in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+if __name__ == "__main__":
+    main()
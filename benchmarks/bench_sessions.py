@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark the dialog session store with many concurrently active chats
+
+Usage: python benchmarks/bench_sessions.py [active_chats]
+"""
+
+import sys
+import os
+import time
+import random
+import tempfile
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.sessions import SessionStore
+
+def measure(label: str, func, keys) -> float:
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:28} {elapsed / len(keys) * 1e6:8.2f} µs/op")
+    return elapsed
+
+def main():
+    active = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print("💬 Session store benchmark")
+    print(f"{active:,} active chats")
+    print("=" * 50)
+    
+    rng = random.Random(7)
+    chats = [str(1_000_000 + i) for i in range(active)]
+    lookups = [rng.choice(chats) for _ in range(200_000)]
+    
+    for label, cap in (("Under the cap", active), ("Cap at 1/4 (LRU eviction)", active // 4)):
+        print(label)
+        start = lambda store, chat: store.start(chat, "email", "body", to="someone@example.com",
+                                                subject="Quarterly update")
+        # Memory is measured on a separate fill, since tracemalloc slows the timed one down
+        tracemalloc.start()
+        sized = SessionStore(ttl=600, max_sessions=cap, spill_file="")
+        for chat in chats:
+            start(sized, chat)
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del sized
+        
+        store = SessionStore(ttl=600, max_sessions=cap, spill_file="")
+        measure("start", lambda chat: start(store, chat), chats)
+        measure("get (random chat)", store.get, lookups)
+        stats = store.get_stats()
+        print(f"  {'Held / evicted':28} {stats['active']:8,} / {stats['evicted']:,} "
+              f"({retained / 2 ** 20:.1f} MiB, {retained / stats['active']:.0f} B/session)")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        print("Cap at 1/4, spilling to disk")
+        store = SessionStore(ttl=600, max_sessions=active // 4, spill_file=os.path.join(tmp, "sessions"))
+        measure("start", lambda chat: store.start(chat, "remind", "time", message="Join standup"), chats)
+        measure("get (random chat)", store.get, lookups)
+        stats = store.get_stats()
+        print(f"  {'Spilled / restored':28} {stats['spilled']:8,} / {stats['restored']:,}")
+        store.close()
+
+if __name__ == "__main__":
+    main()
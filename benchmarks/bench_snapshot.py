@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark restart cost: JSON load vs binary mmap snapshot
+
+Usage: python benchmarks/bench_snapshot.py [num_records]
+"""
+
+import sys
+import os
+import gc
+import json
+import time
+import random
+import tempfile
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.settings import settings
+from app.modules.records import TodoRecord
+from app.modules.snapshot import SnapshotReader, json_to_snapshot
+from app.modules.todo_manager import TodoManager
+
+def write_json(path: str, num_records: int):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([
+            {
+                'id': i,
+                'task': f"Restart benchmark task {i}",
+                'priority': ('high', 'medium', 'low')[i % 3],
+                'status': 'completed' if i % 4 == 0 else 'pending',
+                'created_at': f"2025-01-{i % 28 + 1:02d}T12:{i % 60:02d}:{i % 59:02d}",
+                'due_date': None,
+                'completed_at': "2025-02-01T09:00:00" if i % 4 == 0 else None
+            }
+            for i in range(1, num_records + 1)
+        ], f, indent=2)
+
+def load_json(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [TodoRecord.from_dict(item) for item in json.load(f)]
+
+def load_snapshot(path: str):
+    with SnapshotReader(path) as reader:
+        return list(reader)
+
+def lookup_snapshot(path: str, ids):
+    with SnapshotReader(path) as reader:
+        return [reader.get(record_id) for record_id in ids]
+
+def restart(storage_format: str, json_path: str):
+    """What startup does: load the store and build the chat and search indexes"""
+    settings.storage_format = storage_format
+    manager = TodoManager(json_path)
+    manager.store.close()
+    return manager
+
+def measure(label: str, func, *args):
+    """Wall time, then peak Python allocations in a second run"""
+    gc.collect()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    del result
+    gc.collect()
+    
+    tracemalloc.start()
+    result = func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    print(f"  {label:32} {elapsed * 1e3:10.1f} ms   peak {peak / 2 ** 20:8.1f} MiB")
+
+def main():
+    num_records = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print("💽 Snapshot restart benchmark")
+    print(f"{num_records:,} todos")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "todos.json")
+        snap_path = os.path.join(tmp, "todos.snap")
+        write_json(json_path, num_records)
+        json_to_snapshot(json_path, snap_path, "todo")
+        print(f"JSON file:     {os.path.getsize(json_path) / 2 ** 20:8.1f} MiB")
+        print(f"Snapshot file: {os.path.getsize(snap_path) / 2 ** 20:8.1f} MiB")
+        
+        ids = random.Random(7).sample(range(1, num_records + 1), 1000)
+        measure("JSON load (all records)", load_json, json_path)
+        measure("Snapshot load (all records)", load_snapshot, snap_path)
+        measure("Snapshot open + 1,000 lookups", lookup_snapshot, snap_path, ids)
+        measure("TodoManager restart (JSON)", restart, "json", json_path)
+        measure("TodoManager restart (snapshot)", restart, "snapshot", json_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Benchmark the command throttle: admission cost and memory with many distinct chats
+
+Usage: python benchmarks/bench_throttle.py [num_messages]
+"""
+
+import sys
+import os
+import time
+import random
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.throttle import CommandThrottle
+
+def run(throttle: CommandThrottle, messages) -> float:
+    start = time.perf_counter()
+    for chat_id, commands in messages:
+        throttle.admit(chat_id, commands)
+    return time.perf_counter() - start
+
+def main():
+    num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    print("🐢 Command throttle benchmark")
+    print(f"{num_messages:,} messages")
+    print("=" * 50)
+    
+    rng = random.Random(7)
+    for label, num_chats in (("1k chats (hot set)", 1_000), ("every message a new chat", num_messages)):
+        messages = [(str(rng.randrange(num_chats)), ["email"] if rng.random() < 0.1 else ["todo"])
+                    for _ in range(num_messages)]
+        throttle = CommandThrottle(max_buckets=10_000)
+        tracemalloc.start()
+        elapsed = run(throttle, messages)
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        stats = throttle.get_stats()
+        print(f"{label}")
+        print(f"  {'Admit':24} {elapsed / num_messages * 1e6:10.2f} µs/message")
+        print(f"  {'Buckets held':24} {stats['buckets']:10,} ({current / 2 ** 20:.1f} MiB retained)")
+        print(f"  {'Evicted':24} {stats['evicted']:10,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark tracing: span overhead, and one update traced end to end across threads
+
+Local HTTP servers stand in for the Telegram API (5 ms per call) and for an
+OTLP/HTTP collector. Updates run through the message pipeline inside a
+webhook span; the collector then checks that every reply's send and HTTP
+spans (on the send workers) landed in the trace of the update they answer.
+
+Usage: python benchmarks/bench_tracing.py [num_updates]
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import threading
+from collections import defaultdict
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.tracing import Tracer, OtlpExporter
+import app.core.tracing as tracing
+from app.core.telegram_client import TelegramClient
+from app.core.pipeline import MessagePipeline
+from app.core.command_router import command_router
+
+collected = []
+
+class Stub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/v1/traces":
+            for resource in body["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    collected.extend(scope["spans"])
+            payload = {}
+        else:
+            time.sleep(0.005)
+            payload = {"ok": True, "result": {"message_id": 1}}
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, *args):
+        pass
+
+def main():
+    num_updates = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    logging.disable(logging.INFO)
+    print("🧵 Tracing benchmark")
+    print(f"{num_updates:,} updates, 5 ms per Telegram call")
+    print("=" * 50)
+    
+    # Cost of a span on its own
+    bare = Tracer()
+    repeats = 100_000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        with bare.span("root"):
+            with bare.span("child"):
+                pass
+    print(f"  {'Span pair (root + child)':28} {(time.perf_counter() - start) / repeats * 1e6:8.2f} µs")
+    start = time.perf_counter()
+    for _ in range(repeats):
+        with bare.span("outside a trace", new_trace=False):
+            pass
+    print(f"  {'Span outside a trace (no-op)':28} {(time.perf_counter() - start) / repeats * 1e6:8.2f} µs")
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    tracer = Tracer(OtlpExporter(f"{base}/v1/traces", "bench"), flush_interval=0.2)
+    # Modules hold the tracer by name; point them all at the exporting one
+    for module in [m for name, m in sys.modules.items() if name.startswith("app.") and hasattr(m, "tracer")]:
+        module.tracer = tracer
+    tracing.tracer = tracer
+    
+    client = TelegramClient()
+    client.base_url = f"{base}/botTOKEN"
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = MessagePipeline(workers=8, outbox_file=str(Path(tmp) / "outbox.json"))
+        pipeline.register(client)
+        pipeline.route_with(command_router.handle_message, command_router.split_batch)
+        
+        async def handle(n: int):
+            update = {"update_id": n, "message": {"message_id": n, "chat": {"id": 1000 + n},
+                                                  "from": {"id": 1}, "text": "help", "date": 0}}
+            with tracer.span("webhook", channel="telegram", update_id=n):
+                await pipeline.ingest(client.iter_webhook_messages(update))
+        
+        async def run():
+            for n in range(num_updates):
+                await handle(n)
+        
+        start = time.perf_counter()
+        asyncio.run(run())
+        handled = time.perf_counter() - start
+        pipeline.stop()
+        tracer.stop()
+    print(f"  {'Webhook handling':28} {handled / num_updates * 1e6:8.1f} µs/update (sends queued)")
+    
+    by_trace = defaultdict(set)
+    for span in collected:
+        by_trace[span["traceId"]].add(span["name"])
+    complete = sum(1 for names in by_trace.values()
+                   if {"webhook", "message", "route", "command.help", "commit", "send", "http.telegram"} <= names)
+    print(f"  Collector received {len(collected):,} spans in {len(by_trace):,} traces; "
+          f"{complete:,} complete webhook → send traces")
+    print("\nSlowest stages (p95):")
+    stages = tracer.get_stats()['stages']
+    for name, stage in sorted(stages.items(), key=lambda item: -item[1]['p95_ms'])[:6]:
+        print(f"  {name:16} p50 {stage['p50_ms']:7.2f} ms   p95 {stage['p95_ms']:7.2f} ms   max {stage['max_ms']:7.2f} ms")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
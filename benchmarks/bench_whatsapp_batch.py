@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark WhatsApp webhook ingestion with batched (multi-message) deliveries
+
+Usage: python benchmarks/bench_whatsapp_batch.py [num_deliveries]
+"""
+
+import sys
+import os
+import time
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.storage import JsonStore
+from app.core.whatsapp_client import whatsapp_client
+from app.core.pipeline import MessagePipeline
+from app.core.command_router import command_router
+from app.modules.todo_manager import todo_manager
+from app.modules.reminder_scheduler import reminder_scheduler
+from app.modules.broadcast_manager import broadcast_manager
+
+ENTRIES, CHANGES, MESSAGES, STATUSES = 2, 2, 5, 3
+
+def make_delivery(n: int) -> dict:
+    """One Meta webhook POST: entries x changes, each with messages and status updates"""
+    entries = []
+    for e in range(ENTRIES):
+        changes = []
+        for c in range(CHANGES):
+            senders = [f"49170{n:05d}{e}{c}{m}" for m in range(MESSAGES)]
+            changes.append({"field": "messages", "value": {
+                "messaging_product": "whatsapp",
+                "contacts": [{"wa_id": s, "profile": {"name": f"User {s}"}} for s in senders],
+                "messages": [{"from": s, "id": f"wamid.{s}", "timestamp": "1700000000",
+                              "type": "text", "text": {"body": "ping"}} for s in senders],
+                "statuses": [{"id": f"wamid.out{i}", "status": "delivered"} for i in range(STATUSES)]
+            }})
+        entries.append({"id": "WABA", "changes": changes})
+    return {"object": "whatsapp_business_account", "entry": entries}
+
+def first_only(data: dict):
+    """The previous parser: entry[0] / changes[0] / messages[0]"""
+    value = data.get("entry", [{}])[0].get("changes", [{}])[0].get("value", {})
+    messages = value.get("messages", [])
+    return [messages[0]] if messages else []
+
+def main():
+    num_deliveries = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    logging.disable(logging.INFO)
+    per_delivery = ENTRIES * CHANGES * MESSAGES
+    print("📲 WhatsApp batch webhook benchmark")
+    print(f"{num_deliveries:,} deliveries x {per_delivery} messages (+ {ENTRIES * CHANGES * STATUSES} statuses)")
+    print("=" * 50)
+    
+    deliveries = [make_delivery(n) for n in range(num_deliveries)]
+    total = num_deliveries * per_delivery
+    
+    for label, parse in (("First message only", first_only),
+                         ("Every message", lambda d: list(whatsapp_client.iter_webhook_messages(d)))):
+        start = time.perf_counter()
+        seen = sum(len(parse(d)) for d in deliveries)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:20} {seen:8,}/{total:,} messages  {seen / elapsed:12,.0f} msgs/sec parsed")
+    
+    async def ingest(pipeline):
+        replies = 0
+        for delivery in deliveries:
+            replies += await pipeline.ingest(whatsapp_client.iter_webhook_messages(delivery))
+        return replies
+    
+    # Every sender is a new chat; keep them out of the real data/chats.json, channels.json and outbox.json
+    with tempfile.TemporaryDirectory() as tmp:
+        broadcast_manager.store = JsonStore(Path(tmp) / "chats.json", lambda: sorted(broadcast_manager.known_chats))
+        pipeline = MessagePipeline(outbox_file=str(Path(tmp) / "outbox.json"))
+        pipeline.register(whatsapp_client)
+        pipeline.route_with(command_router.handle_message, command_router.split_batch)
+        pipeline.add_inbound_listener(lambda message: broadcast_manager.remember_chat(message.chat_id))
+        pipeline.add_commit_hook(todo_manager.store.durable)
+        pipeline.add_commit_hook(reminder_scheduler.store.durable)
+        pipeline._dispatch = lambda entry: None
+        start = time.perf_counter()
+        replies = asyncio.run(ingest(pipeline))
+        elapsed = time.perf_counter() - start
+        pipeline.stop()
+        broadcast_manager.store.close()
+    print(f"  {'Parse + pipeline':20} {replies:8,} replies   {total / elapsed:12,.0f} msgs/sec (sends excluded)")
+
+if __name__ == "__main__":
+    main()